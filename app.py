@@ -33,13 +33,29 @@ def main():
             # Workflow erstellen mit optionaler Persistenz
             chain = create_shipment_graph(with_checkpointer=use_persistence)
             
-            # Ausführen mit Tracing
+            # Ausführen mit Tracing, Positionen werden angezeigt, sobald sie vollständig sind
+            st.subheader("Positionen")
+            items_placeholder = st.empty()
+            streamed_items = {}
+            response = None
             with st.spinner("Verarbeite Sendungsdaten..."):
-                response = chain.invoke({
-                    "messages": [user_input],
-                    "extracted_data": None,
-                    "message": None
-                })
+                for mode, chunk in chain.stream(
+                    {
+                        "messages": [user_input],
+                        "extracted_data": None,
+                        "message": None
+                    },
+                    config={"configurable": {"stream_items": True}},
+                    stream_mode=["custom", "values"]
+                ):
+                    if mode == "values":
+                        response = chunk
+                    elif chunk.get("event") == "shipment_reset":
+                        streamed_items = {key: item for key, item in streamed_items.items() if key[0] != chunk["segment"]}
+                        items_placeholder.empty()
+                    elif chunk.get("event") == "shipment_item":
+                        streamed_items[(chunk["segment"], chunk["index"])] = chunk["item"]
+                        items_placeholder.json([streamed_items[key] for key in sorted(streamed_items, key=lambda k: (k[0] or 0, k[1]))])
                 
                 # Warten auf Abschluss aller Traces
                 wait_for_all_tracers()
@@ -0,0 +1,545 @@
+"""
+Batch extraction for Shipmentbot.
+
+This file runs the compiled shipment graph over a CSV file of shipment
+inquiries (e.g. data/shipments.csv). Rows are streamed, processed with a
+bounded number of concurrent extractions and written incrementally as JSON
+lines. A run can be resumed after a crash, rows that are already in the
+output file are skipped, degraded results (created while Claude was
+unavailable) and partial results (some segments failed) are processed again. Of a cluster of near-identical rows only
+the first one is extracted, the others reuse its result.
+
+For nightly reprocessing, --message-batch submits the extractions as
+Anthropic message batch jobs instead: no interactive latency, but higher
+throughput at a lower price. The requests use the same prompt, schema and
+post-processing as extract_shipment_data, and the results are stored in the
+result cache, so batch and interactive results are interchangeable.
+
+Usage:
+    python -m graph.batch data/shipments.csv --output results.jsonl --concurrency 8
+    python -m graph.batch data/shipments.csv --output replay.jsonl --cassette replay
+    python -m graph.batch data/shipments.csv --output nightly.jsonl --message-batch
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from graph.config import (
+    BATCH_CONCURRENCY,
+    BATCH_RATE_LIMIT,
+    COMPACTION_ENABLED,
+    DEFAULT_PROMPT_NAME,
+    ERROR_MESSAGES,
+    LLM_CASSETTE_PATH,
+    MESSAGE_BATCH_MAX_REQUESTS,
+    MESSAGE_BATCH_POLL_INTERVAL,
+    MESSAGE_BATCH_TIMEOUT,
+    NEAR_DUPLICATE_ENABLED
+)
+from graph.services.cassette import CASSETTE_MODES
+from graph.services.latency import summarize_latencies
+from graph.services.message_batches import MessageBatchClient
+from graph.services.near_duplicates import NearDuplicateIndex
+from graph.services.scheduler import BULK
+
+
+def iter_csv_rows(input_path: str, column: Optional[str] = None) -> Iterator[Tuple[int, str]]:
+    """
+    Streams the inquiry texts from a CSV file.
+
+    Args:
+        input_path: Path of the CSV file, the first line is the header
+        column: Name of the text column, the first column is used if None
+
+    Returns:
+        An iterator of (row index, text) tuples, the index starts at 0
+    """
+    with open(input_path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        column_index = header.index(column) if column else 0
+        for row_index, row in enumerate(reader):
+            text = row[column_index].strip() if len(row) > column_index else ""
+            yield row_index, text
+
+
+def load_completed_rows(output_path: str) -> Set[int]:
+    """
+    Reads the row indices that were already processed successfully.
+    Failed, degraded and partial rows and rows without extracted data are
+    not completed and are processed again.
+    A partially written last line (e.g. after a crash) is cut off,
+    so that new results can be appended safely.
+
+    Args:
+        output_path: Path of the JSONL output file
+
+    Returns:
+        The set of completed row indices
+    """
+    completed: Set[int] = set()
+    if not os.path.exists(output_path):
+        return completed
+
+    with open(output_path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+            data = data[:data.rfind(b"\n") + 1]
+
+    for line in data.decode("utf-8").splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if (
+            "error" not in record and not record.get("degraded") and not record.get("partial")
+            and record.get("extracted_data") is not None
+        ):
+            completed.add(record["row"])
+    return completed
+
+
+class AsyncRateLimiter:
+    """Spaces out acquisitions to at most `rate` per second."""
+
+    def __init__(self, rate: float):
+        """
+        Args:
+            rate: Maximum number of acquisitions per second, 0 disables the limit
+        """
+        self._interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Waits until the next slot is available."""
+        if not self._interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self._interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+def initial_state(text: str) -> Dict[str, Any]:
+    """
+    Creates the graph input for a single inquiry.
+
+    Args:
+        text: The inquiry text
+
+    Returns:
+        The initial ShipmentState
+    """
+    return {"messages": [text], "extracted_data": None, "message": None}
+
+
+async def run_batch(
+    input_path: str,
+    output_path: str,
+    concurrency: int = BATCH_CONCURRENCY,
+    rate_limit: float = BATCH_RATE_LIMIT,
+    column: Optional[str] = None,
+    resume: bool = True,
+    limit: Optional[int] = None,
+    graph: Any = None
+) -> Dict[str, Any]:
+    """
+    Runs the shipment graph over all rows of a CSV file.
+
+    Args:
+        input_path: Path of the CSV file with the inquiries
+        output_path: Path of the JSONL file for the results
+        concurrency: Maximum number of extractions in flight
+        rate_limit: Maximum number of started extractions per second, 0 for no limit
+        column: Name of the text column, the first column is used if None
+        resume: Whether to skip rows that are already in the output file
+        limit: Maximum number of rows to process in this run
+        graph: The compiled graph, the cached shipment graph is used if None
+
+    Returns:
+        A report with counters, throughput and latency percentiles
+    """
+    if graph is None:
+        from graph.shipment_graph import create_shipment_graph
+        graph = create_shipment_graph()
+
+    completed = load_completed_rows(output_path) if resume else set()
+    limiter = AsyncRateLimiter(rate_limit)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    latencies = []
+    counters = {
+        "processed": 0, "failed": 0, "degraded": 0, "skipped": 0, "near_duplicates": 0, "resumed": len(completed)
+    }
+    # Near-identical rows of this run wait for the result of the first row of their cluster
+    clusters = NearDuplicateIndex() if NEAR_DUPLICATE_ENABLED else None
+
+    async def extract(text: str) -> Dict[str, Any]:
+        # Batch rows yield to interactive requests of the same process
+        result = await graph.ainvoke(initial_state(text), config={"configurable": {"priority": BULK}})
+        if result.get("extracted_data") is None:
+            # The graph reports errors (timeouts, format errors, ...) as a message without data
+            raise RuntimeError(result.get("message") or "No shipment data extracted")
+        return result
+
+    async def worker(out) -> None:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            row_index, text, cluster_result, representative = item
+            if representative is None:
+                await limiter.acquire()
+            started = time.perf_counter()
+            result = None
+            try:
+                if representative is not None:
+                    # A failed representative leaves its followers to their own extraction
+                    result = await asyncio.shield(representative)
+                    if result is not None:
+                        counters["near_duplicates"] += 1
+                    else:
+                        await limiter.acquire()
+                if result is None:
+                    result = await extract(text)
+                record = {
+                    "row": row_index,
+                    "input": text,
+                    "extracted_data": result.get("extracted_data"),
+                    "message": result.get("message")
+                }
+                if result.get("partial"):
+                    # Items of the failed segments are missing, the row counts as failed and is processed again
+                    record["partial"] = True
+                    record["failed_segments"] = result.get("failed_segments")
+                    counters["failed"] += 1
+                else:
+                    if result.get("degraded"):
+                        # Marked for re-processing by the next (resumed) run
+                        record["degraded"] = True
+                        counters["degraded"] += 1
+                    counters["processed"] += 1
+            except Exception as e:
+                result = None
+                record = {"row": row_index, "input": text, "error": str(e)}
+                counters["failed"] += 1
+            finally:
+                if cluster_result is not None and not cluster_result.done():
+                    usable = result is not None and not result.get("degraded") and not result.get("partial")
+                    cluster_result.set_result(result if usable else None)
+            latency = time.perf_counter() - started
+            latencies.append(latency)
+            record["latency_ms"] = round(latency * 1000, 2)
+            # Written in one call without awaiting, so lines never interleave
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+
+    started_at = time.perf_counter()
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as out:
+        workers = [asyncio.create_task(worker(out)) for _ in range(max(1, concurrency))]
+        submitted = 0
+        for row_index, text in iter_csv_rows(input_path, column):
+            if row_index in completed:
+                continue
+            if not text:
+                counters["skipped"] += 1
+                continue
+            if limit is not None and submitted >= limit:
+                break
+            cluster_result = representative = None
+            if clusters is not None:
+                # The index holds the future of the representative's result, bounded like the index itself
+                fingerprint = await asyncio.to_thread(clusters.fingerprint, text)
+                representative = clusters.find(fingerprint)
+                if representative is None:
+                    cluster_result = asyncio.get_running_loop().create_future()
+                    clusters.add(fingerprint, cluster_result)
+            await queue.put((row_index, text, cluster_result, representative))
+            submitted += 1
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    elapsed = time.perf_counter() - started_at
+
+    finished = counters["processed"] + counters["failed"]
+    return {
+        **counters,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rows_per_s": round(finished / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency": summarize_latencies(latencies)
+    }
+
+
+def _custom_id(row_index: int) -> str:
+    return f"row-{row_index}"
+
+
+def _row_of(custom_id: str) -> int:
+    return int(custom_id.split("-", 1)[1])
+
+
+def load_pending_batches(output_path: str) -> List[str]:
+    """
+    Reads the ids of batch jobs that were submitted but not yet written.
+
+    Args:
+        output_path: Path of the JSONL output file
+
+    Returns:
+        The batch ids in submission order
+    """
+    path = output_path + ".batches"
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def run_message_batch(
+    input_path: str,
+    output_path: str,
+    column: Optional[str] = None,
+    resume: bool = True,
+    limit: Optional[int] = None,
+    client: Optional[MessageBatchClient] = None,
+    max_requests: int = MESSAGE_BATCH_MAX_REQUESTS,
+    poll_interval: float = MESSAGE_BATCH_POLL_INTERVAL,
+    timeout: float = MESSAGE_BATCH_TIMEOUT
+) -> Dict[str, Any]:
+    """
+    Extracts all rows of a CSV file with Anthropic message batch jobs.
+    Rows with a cached result are written without a request, of a cluster
+    of near-identical rows only the first one is submitted. The ids of the
+    submitted jobs are kept next to the output file until their results are
+    written, so a resumed run downloads them instead of submitting again.
+
+    Args:
+        input_path: Path of the CSV file with the inquiries
+        output_path: Path of the JSONL file for the results
+        column: Name of the text column, the first column is used if None
+        resume: Whether to skip rows and batch jobs that are already in the output file
+        limit: Maximum number of rows to process in this run
+        client: The batch client, a client for ANTHROPIC_API_URL is created if None
+        max_requests: Maximum number of requests per batch job
+        poll_interval: Seconds between two status checks
+        timeout: Maximum seconds to wait for a batch job
+
+    Returns:
+        A report with counters and throughput
+    """
+    from graph.nodes.input_compactor import compact_text
+    from graph.nodes.shipment_extractor import (
+        load_prompt,
+        build_batch_params,
+        build_batch_response,
+        get_result_cache_key,
+        get_cached_result,
+        store_result,
+        lookup_near_duplicate,
+        remember_near_duplicate
+    )
+
+    prompt_template = load_prompt(DEFAULT_PROMPT_NAME)
+    if prompt_template is None:
+        raise RuntimeError(ERROR_MESSAGES["prompt_not_found"])
+    client = client or MessageBatchClient()
+    completed = load_completed_rows(output_path) if resume else set()
+    pending_batches = load_pending_batches(output_path) if resume else []
+    counters = {
+        "processed": 0, "failed": 0, "cached": 0, "near_duplicates": 0,
+        "skipped": 0, "resumed": len(completed), "batches": 0
+    }
+
+    # Same input as the extractor node sees after compaction, so the result cache keys match
+    pending: Dict[int, Tuple[str, str]] = {}
+    for row_index, text in iter_csv_rows(input_path, column):
+        if row_index in completed:
+            continue
+        if not text:
+            counters["skipped"] += 1
+            continue
+        if limit is not None and len(pending) >= limit:
+            break
+        pending[row_index] = (text, compact_text(text).text if COMPACTION_ENABLED else text)
+
+    started_at = time.perf_counter()
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as out, \
+            open(output_path + ".batches", "a" if resume else "w", encoding="utf-8") as batches_file:
+
+        def write(record: Dict[str, Any]) -> None:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+
+        # Near-identical rows of this run wait for the result of the first row of their cluster
+        clusters = NearDuplicateIndex()
+        followers: Dict[int, List[int]] = {}
+        fingerprints: Dict[int, Any] = {}
+
+        def write_result(row_index: int, result: Dict[str, Any], response: Dict[str, Any]) -> None:
+            text, extraction_input = pending.pop(row_index)
+            if result.get("type") != "succeeded":
+                # Expired, canceled and errored requests are submitted again by the next run
+                write({"row": row_index, "input": text, "error": response["message"]})
+                counters["failed"] += 1
+                return
+            cache_key = get_result_cache_key(extraction_input, prompt_template)
+            store_result(cache_key, response)
+            remember_near_duplicate(fingerprints.get(row_index), cache_key, response, prompt_template)
+            write({
+                "row": row_index,
+                "input": text,
+                "extracted_data": response["extracted_data"],
+                "message": response["message"]
+            })
+            counters["processed"] += 1
+
+        def download(batch_id: str) -> None:
+            client.wait(batch_id, poll_interval, timeout)
+            for custom_id, result in client.results(batch_id):
+                row_index = _row_of(custom_id)
+                if row_index not in pending:
+                    continue
+                response = build_batch_response(result)
+                write_result(row_index, result, response)
+                for follower in followers.pop(row_index, []):
+                    write_result(follower, result, response)
+                    counters["near_duplicates"] += 1
+
+        for batch_id in pending_batches:
+            download(batch_id)
+
+        requests = []
+        for row_index, (text, extraction_input) in list(pending.items()):
+            cache_key = get_result_cache_key(extraction_input, prompt_template)
+            cached = get_cached_result(cache_key)
+            fingerprint = None
+            if cached is None:
+                fingerprint, cached = lookup_near_duplicate(extraction_input, prompt_template, None, cache_key)
+            if cached is not None:
+                pending.pop(row_index)
+                write({"row": row_index, "input": text, **cached})
+                counters["cached"] += 1
+                continue
+            if fingerprint is not None:
+                representative = clusters.find(fingerprint)
+                if representative is not None:
+                    followers.setdefault(representative, []).append(row_index)
+                    continue
+                clusters.add(fingerprint, row_index)
+                fingerprints[row_index] = fingerprint
+            requests.append({"custom_id": _custom_id(row_index), "params": build_batch_params(prompt_template, extraction_input)})
+
+        submitted = []
+        for start in range(0, len(requests), max(1, max_requests)):
+            batch_id = client.submit(requests[start:start + max(1, max_requests)])
+            batches_file.write(batch_id + "\n")
+            batches_file.flush()
+            submitted.append(batch_id)
+        counters["batches"] = len(submitted)
+        for batch_id in submitted:
+            download(batch_id)
+
+        # Rows without a result and the near-duplicates waiting for them are submitted again by the next run
+        for row_index in list(pending):
+            write_result(row_index, {"type": "missing"}, {"message": "No result in the message batch"})
+
+    # Every submitted job has been written, a resumed run only has to submit failed rows again
+    os.remove(output_path + ".batches")
+    elapsed = time.perf_counter() - started_at
+    finished = counters["processed"] + counters["failed"] + counters["cached"]
+    return {
+        **counters,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rows_per_s": round(finished / elapsed, 2) if elapsed > 0 else 0.0
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """
+    Formats a batch report for the console.
+
+    Args:
+        report: The report returned by run_batch
+
+    Returns:
+        A human readable multi-line summary
+    """
+    if "batches" in report:
+        counts = (f"cached: {report['cached']}, near-duplicates: {report['near_duplicates']}, "
+                  f"batch jobs: {report['batches']}")
+    else:
+        counts = f"degraded: {report['degraded']}, near-duplicates: {report['near_duplicates']}"
+    lines = [
+        f"Processed: {report['processed']}, failed: {report['failed']}, {counts}, "
+        f"skipped: {report['skipped']}, resumed: {report['resumed']}",
+        f"Elapsed: {report['elapsed_s']} s, throughput: {report['throughput_rows_per_s']} rows/s"
+    ]
+    latency = report.get("latency")
+    if latency is not None:
+        lines.append(
+            f"Latency p50: {latency['p50_ms']} ms, p95: {latency['p95_ms']} ms, "
+            f"p99: {latency['p99_ms']} ms, max: {latency['max_ms']} ms"
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    """Command line entry point for batch extraction."""
+    parser = argparse.ArgumentParser(description="Batch extraction of shipment data from a CSV file")
+    parser.add_argument("input", help="Path of the CSV file with the inquiries")
+    parser.add_argument("--output", default="results.jsonl", help="Path of the JSONL output file")
+    parser.add_argument("--column", default=None, help="Name of the text column (default: first column)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="Extractions in flight")
+    parser.add_argument("--rate-limit", type=float, default=BATCH_RATE_LIMIT, help="Started rows per second, 0 for no limit")
+    parser.add_argument("--limit", type=int, default=None, help="Maximum number of rows in this run")
+    parser.add_argument("--no-resume", action="store_true", help="Overwrite the output file instead of resuming")
+    parser.add_argument("--cassette", choices=CASSETTE_MODES, default=None,
+                        help="Record or replay LLM responses (default: LLM_CASSETTE_MODE)")
+    parser.add_argument("--cassette-path", default=LLM_CASSETTE_PATH, help="Path of the cassette file")
+    parser.add_argument("--message-batch", action="store_true",
+                        help="Submit the extractions as Anthropic message batch jobs (offline, lower price)")
+    parser.add_argument("--poll-interval", type=float, default=MESSAGE_BATCH_POLL_INTERVAL,
+                        help="Seconds between two status checks of a batch job")
+    args = parser.parse_args()
+
+    if args.message_batch:
+        report = run_message_batch(
+            args.input,
+            args.output,
+            column=args.column,
+            resume=not args.no_resume,
+            limit=args.limit,
+            poll_interval=args.poll_interval
+        )
+    else:
+        if args.cassette is not None:
+            from graph.nodes.shipment_extractor import use_cassette
+            use_cassette(args.cassette, args.cassette_path)
+
+        report = asyncio.run(run_batch(
+            args.input,
+            args.output,
+            concurrency=args.concurrency,
+            rate_limit=args.rate_limit,
+            column=args.column,
+            resume=not args.no_resume,
+            limit=args.limit
+        ))
+    print(format_report(report))
+
+    # Write the aggregated metrics to the sinks selected with METRICS_SINK
+    from graph.services.metrics import metrics
+    metrics.export()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,37 @@ Central configuration for Shipmentbot.
 This file contains all configuration parameters and loads environment variables.
 """
 import os
-from dotenv import load_dotenv
+from typing import Optional
 
-# Load environment variables
-load_dotenv()
+
+def find_env_file(start: str = os.path.dirname(os.path.abspath(__file__))) -> Optional[str]:
+    """
+    Searches for a .env file from the package directory upwards, like dotenv.find_dotenv.
+    
+    Args:
+        start: The directory to start from
+        
+    Returns:
+        The path of the .env file or None
+    """
+    directory = start
+    while True:
+        candidate = os.path.join(directory, ".env")
+        if os.path.isfile(candidate):
+            return candidate
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+
+# Load environment variables, python-dotenv is only imported if there is a .env file
+# (LangGraph Platform workers receive their variables from the environment)
+if os.getenv("SHIPMENTBOT_LOAD_DOTENV", "true").lower() == "true":
+    _env_file = find_env_file()
+    if _env_file is not None:
+        from dotenv import load_dotenv
+        load_dotenv(_env_file)
 
 # LLM configuration
 LLM_MODEL = os.getenv("LLM_MODEL", "claude-3-7-sonnet-20250219")
@@ -15,6 +42,47 @@ LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0"))
 LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "4096"))
 LLM_TIMEOUT = int(os.getenv("LLM_TIMEOUT", "10"))
 
+# Small model tier for short, simple inquiries (LLM_MODEL is the large tier)
+LLM_SMALL_MODEL = os.getenv("LLM_SMALL_MODEL", "claude-3-5-haiku-20241022")
+LLM_SMALL_MAX_TOKENS = int(os.getenv("LLM_SMALL_MAX_TOKENS", "1024"))
+LLM_SMALL_TIMEOUT = int(os.getenv("LLM_SMALL_TIMEOUT", "5"))
+
+# Process-wide limiter for Anthropic calls (token buckets and AIMD concurrency)
+RATE_LIMIT_RPM = float(os.getenv("RATE_LIMIT_RPM", "0"))  # requests per minute, 0 = unlimited
+RATE_LIMIT_TPM = float(os.getenv("RATE_LIMIT_TPM", "0"))  # tokens per minute, 0 = unlimited
+LIMITER_PROMPT_TOKENS = int(os.getenv("LIMITER_PROMPT_TOKENS", "1000"))  # estimated tokens of the static prompt
+LIMITER_INITIAL_CONCURRENCY = int(os.getenv("LIMITER_INITIAL_CONCURRENCY", "16"))
+LIMITER_MIN_CONCURRENCY = int(os.getenv("LIMITER_MIN_CONCURRENCY", "1"))
+LIMITER_MAX_CONCURRENCY = int(os.getenv("LIMITER_MAX_CONCURRENCY", "64"))
+LIMITER_DECREASE_FACTOR = float(os.getenv("LIMITER_DECREASE_FACTOR", "0.5"))  # on 429/overloaded
+
+# Priority scheduling of waiting LLM calls (weighted fair queuing)
+SCHEDULER_WEIGHTS = os.getenv("SCHEDULER_WEIGHTS", "interactive:8,bulk:1")  # class:weight pairs
+SCHEDULER_MAX_WAIT = float(os.getenv("SCHEDULER_MAX_WAIT", "30"))  # seconds before a waiting call is admitted first
+
+# Circuit breaker for Anthropic calls (degraded results while the API is unhealthy)
+BREAKER_ENABLED = os.getenv("BREAKER_ENABLED", "true").lower() == "true"
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))  # share of failed calls that opens the breaker
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "20"))  # recent calls considered
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "5"))  # calls before the breaker can open
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))  # cool-down before trial calls
+BREAKER_HALF_OPEN_CALLS = int(os.getenv("BREAKER_HALF_OPEN_CALLS", "1"))  # concurrent trial calls
+
+# Hedged requests (a backup LLM call when the first one is slower than the percentile)
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "false").lower() == "true"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))  # percentile of recent call latencies
+HEDGE_MAX_RATIO = float(os.getenv("HEDGE_MAX_RATIO", "0.05"))  # maximum share of hedged calls
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.5"))  # seconds
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))  # samples before hedging starts
+HEDGE_WINDOW = int(os.getenv("HEDGE_WINDOW", "500"))  # recent latencies per model
+HEDGE_BUDGET_WINDOW = float(os.getenv("HEDGE_BUDGET_WINDOW", "60"))  # seconds of calls the hedge ratio is measured over
+
+# Model routing configuration (which tier handles a request)
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "true").lower() == "true"
+ROUTER_SMALL_MAX_CHARS = int(os.getenv("ROUTER_SMALL_MAX_CHARS", "500"))
+ROUTER_SMALL_MAX_ITEMS = int(os.getenv("ROUTER_SMALL_MAX_ITEMS", "2"))
+ROUTER_SMALL_MIN_CONFIDENCE = float(os.getenv("ROUTER_SMALL_MIN_CONFIDENCE", "0.25"))  # fast path confidence
+
 # LangSmith configuration
 LANGSMITH_PROJECT = os.getenv("LANGSMITH_PROJECT", "Shipmentbot")
 LANGSMITH_TRACING = os.getenv("LANGSMITH_TRACING", "false").lower() == "true"
@@ -23,11 +91,72 @@ LANGSMITH_ENDPOINT = os.getenv("LANGSMITH_ENDPOINT", "https://eu.smith.langchain
 
 # Prompt configuration
 DEFAULT_PROMPT_NAME = "shipmentbot_shipment"
+PROMPT_CACHE_TTL = int(os.getenv("PROMPT_CACHE_TTL", "300"))  # seconds until background refresh
+PROMPT_CACHE_RETRY = int(os.getenv("PROMPT_CACHE_RETRY", "30"))  # seconds between failed refreshes
+ANTHROPIC_PROMPT_CACHING = os.getenv("ANTHROPIC_PROMPT_CACHING", "true").lower() == "true"  # cache_control on the static prefix
+
+# Fast path configuration (rule-based extraction without LLM)
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+FAST_PATH_MIN_CONFIDENCE = float(os.getenv("FAST_PATH_MIN_CONFIDENCE", "0.9"))
+
+# Input compaction configuration (strips quotes, signatures and boilerplate)
+COMPACTION_ENABLED = os.getenv("COMPACTION_ENABLED", "true").lower() == "true"
+
+# Splitter configuration (parallel extraction of multi-shipment inquiries)
+SPLIT_ENABLED = os.getenv("SPLIT_ENABLED", "true").lower() == "true"
+SPLIT_MAX_SEGMENTS = int(os.getenv("SPLIT_MAX_SEGMENTS", "20"))
+
+# Conversation history configuration (message window of checkpointed threads)
+HISTORY_MAX_MESSAGES = int(os.getenv("HISTORY_MAX_MESSAGES", "5"))  # 0 = keep all
+HISTORY_SUMMARY_MAX_CHARS = int(os.getenv("HISTORY_SUMMARY_MAX_CHARS", "2000"))  # summary of trimmed messages
+FOLLOW_UP_ENABLED = os.getenv("FOLLOW_UP_ENABLED", "true").lower() == "true"
+FOLLOW_UP_MAX_CHARS = int(os.getenv("FOLLOW_UP_MAX_CHARS", "500"))  # longer messages are new inquiries
+FOLLOW_UP_MODE = os.getenv("FOLLOW_UP_MODE", "patch")  # patch (LLM returns only the changes), full
+
+# Result cache configuration
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1024"))  # memory tier size
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", "86400"))  # seconds
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", ".cache/extraction_results.sqlite3")  # "" = memory only
+
+# Near-duplicate configuration (MinHash/LSH index, reuses results of near-identical inquiries)
+NEAR_DUPLICATE_ENABLED = os.getenv("NEAR_DUPLICATE_ENABLED", "true").lower() == "true"
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.8"))  # estimated Jaccard similarity
+NEAR_DUPLICATE_MAX_ENTRIES = int(os.getenv("NEAR_DUPLICATE_MAX_ENTRIES", "10000"))  # LRU bound of the index
+NEAR_DUPLICATE_NUM_PERM = int(os.getenv("NEAR_DUPLICATE_NUM_PERM", "128"))  # MinHash signature length
+NEAR_DUPLICATE_BANDS = int(os.getenv("NEAR_DUPLICATE_BANDS", "32"))  # LSH bands, NUM_PERM must be divisible
+
+# Checkpointer configuration (conversation state of graphs created with a checkpointer)
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "memory")  # memory, sqlite (opt-in)
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", ".cache/checkpoints.sqlite3")  # "" = in-memory SQLite
+CHECKPOINT_MAX_PER_THREAD = int(os.getenv("CHECKPOINT_MAX_PER_THREAD", "20"))  # 0 = unlimited
+CHECKPOINT_TTL = int(os.getenv("CHECKPOINT_TTL", "604800"))  # seconds since the last write of a thread, 0 = never
+CHECKPOINT_COMPACT_AFTER = int(os.getenv("CHECKPOINT_COMPACT_AFTER", "3600"))  # idle seconds until only the latest checkpoint is kept
+CHECKPOINT_BATCH_SIZE = int(os.getenv("CHECKPOINT_BATCH_SIZE", "32"))  # buffered writes per transaction
+CHECKPOINT_FLUSH_INTERVAL = float(os.getenv("CHECKPOINT_FLUSH_INTERVAL", "0.5"))  # max. seconds a write stays buffered
+CHECKPOINT_MAINTENANCE_INTERVAL = int(os.getenv("CHECKPOINT_MAINTENANCE_INTERVAL", "300"))  # seconds between TTL/compaction runs
+
+# LLM cassette configuration (record/replay of LLM responses)
+LLM_CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "off")  # off, record, replay, replay_or_record
+LLM_CASSETTE_PATH = os.getenv("LLM_CASSETTE_PATH", ".cache/llm_cassette.jsonl")
+
+# Metrics configuration
+METRICS_SINK = os.getenv("METRICS_SINK", "none")  # comma-separated: prometheus, jsonl
+METRICS_EXPORT_PATH = os.getenv("METRICS_EXPORT_PATH", "shipmentbot_metrics")  # without extension
+
+# Batch configuration
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))  # extractions in flight
+BATCH_RATE_LIMIT = float(os.getenv("BATCH_RATE_LIMIT", "0"))  # started rows per second, 0 = unlimited
+MESSAGE_BATCH_MAX_REQUESTS = int(os.getenv("MESSAGE_BATCH_MAX_REQUESTS", "10000"))  # requests per submitted batch job
+MESSAGE_BATCH_POLL_INTERVAL = float(os.getenv("MESSAGE_BATCH_POLL_INTERVAL", "60"))  # seconds between status checks
+MESSAGE_BATCH_TIMEOUT = float(os.getenv("MESSAGE_BATCH_TIMEOUT", "86400"))  # Anthropic expires batches after 24 h
 
 # Error messages
 ERROR_MESSAGES = {
     "prompt_not_found": "Error: Could not load the prompt.",
     "format_error": "Error in data format: {}",
     "extraction_error": "Error during extraction: {}",
-    "unknown_error": "Unexpected error: {}"
+    "unknown_error": "Unexpected error: {}",
+    "degraded": "Claude is currently unavailable, the result was created without the LLM and may be incomplete.",
+    "degraded_follow_up": "Claude is currently unavailable, the message could not be applied. The previous result is unchanged."
 } 
\ No newline at end of file
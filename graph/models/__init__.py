@@ -7,11 +7,17 @@ Dieses Paket enthält die Datenmodelle für die Extraktion von Sendungsdaten.
 from graph.models.shipment_models import (
     LoadCarrierType,
     ShipmentItem, 
-    Shipment
+    Shipment,
+    ItemOperation,
+    ItemChange,
+    ShipmentPatch
 )
 
 __all__ = [
     "LoadCarrierType",
     "ShipmentItem", 
-    "Shipment"
+    "Shipment",
+    "ItemOperation",
+    "ItemChange",
+    "ShipmentPatch"
 ] 
\ No newline at end of file
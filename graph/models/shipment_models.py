@@ -3,7 +3,7 @@ Shipment models for structured output.
 
 This file defines the data models for the extraction of shipment data.
 """
-from enum import IntEnum
+from enum import Enum, IntEnum
 from typing import Optional, List
 from pydantic import BaseModel, Field
 
@@ -41,4 +41,29 @@ class Shipment(BaseModel):
     shipment_notes: Optional[str] = Field(None, description="Only very specific notes about the shipment and goods, which are not covered by the other fields.")
     
     # Message to the user
-    message: Optional[str] = Field(None, description="Message to the user, e.g. about missing data or other issues.") 
\ No newline at end of file
+    message: Optional[str] = Field(None, description="Message to the user, e.g. about missing data or other issues.") 
+class ItemOperation(str, Enum):
+    ADD = "add"
+    UPDATE = "update"
+    REMOVE = "remove"
+
+class ItemChange(BaseModel):
+    """A change to a single item of the previous extraction."""
+    
+    operation: ItemOperation = Field(..., description="add a new item, update or remove an existing item")
+    index: Optional[int] = Field(None, description="0-based index of the existing item (required for update and remove)")
+    item: Optional[ShipmentItem] = Field(None, description="The new item (add) or only the changed fields (update), a field set to null is cleared")
+
+class ShipmentPatch(BaseModel):
+    """Changes to a previous extraction, only what the new message changes."""
+    
+    # An unrelated shipment is extracted on its own instead of being merged
+    new_inquiry: bool = Field(False, description="True if the message describes a new, unrelated shipment instead of changing the previous one")
+    
+    item_changes: Optional[List[ItemChange]] = Field(default_factory=list, description="Changes to the items, empty if the items are unchanged")
+    
+    # Replaces the previous notes if set
+    shipment_notes: Optional[str] = Field(None, description="New shipment notes, only if the message changes them")
+    
+    # Message to the user
+    message: Optional[str] = Field(None, description="Message to the user, e.g. about missing data or other issues.")
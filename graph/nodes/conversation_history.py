@@ -0,0 +1,223 @@
+"""
+Conversation history node for LangGraph.
+
+In a checkpointed thread the callers send the growing list of messages with
+every turn, while the extraction only reads the latest one. This node keeps
+the last HISTORY_MAX_MESSAGES messages and folds older ones into a bounded
+summary of their shipment-relevant lines, so that every checkpoint stays
+constant-size. A short message (after compaction, so quoted replies do not
+count) in a thread with a previous extraction is a follow-up: the LLM
+receives the previous Shipment, the summary and the new message instead of
+the whole conversation.
+"""
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from graph.config import (
+    HISTORY_MAX_MESSAGES,
+    HISTORY_SUMMARY_MAX_CHARS,
+    FOLLOW_UP_ENABLED,
+    FOLLOW_UP_MAX_CHARS
+)
+from graph.models.shipment_models import Shipment
+from graph.nodes.input_compactor import has_measure, get_latest_input
+from graph.services.metrics import metrics
+
+
+def summarize_messages(messages: List[str], summary: Optional[str] = None,
+                       max_chars: int = HISTORY_SUMMARY_MAX_CHARS) -> Optional[str]:
+    """
+    Folds trimmed messages into the running summary.
+    Only lines with numbers and units are kept, the oldest lines are dropped
+    once the summary exceeds max_chars.
+
+    Args:
+        messages: The messages removed from the window, oldest first
+        summary: The summary of earlier trimmed messages
+        max_chars: Maximum length of the summary
+
+    Returns:
+        The new summary, None if nothing worth keeping was trimmed
+    """
+    lines = summary.splitlines() if summary else []
+    for message in messages:
+        lines.extend(line.strip() for line in message.splitlines() if has_measure(line))
+    while lines and len("\n".join(lines)) > max_chars:
+        lines.pop(0)
+    return "\n".join(lines) or None
+
+
+def trim_messages(messages: List[str], summary: Optional[str] = None,
+                  max_messages: int = HISTORY_MAX_MESSAGES) -> Tuple[List[str], Optional[str]]:
+    """
+    Keeps the latest messages and summarizes the rest.
+
+    Args:
+        messages: All messages of the thread, oldest first
+        summary: The summary of earlier trimmed messages
+        max_messages: Number of messages to keep, 0 keeps all
+
+    Returns:
+        The kept messages and the updated summary
+    """
+    if max_messages <= 0 or len(messages) <= max_messages:
+        return messages, summary
+    trimmed = messages[:-max_messages]
+    return messages[-max_messages:], summarize_messages(trimmed, summary)
+
+
+def is_follow_up(state: Dict[str, Any]) -> bool:
+    """
+    Returns True if the latest message refines the previous extraction of the thread.
+
+    Args:
+        state: The current state with messages, compacted_input and last_shipment
+
+    Returns:
+        True for short messages in a thread with a previous extraction,
+        the length is measured after compaction
+    """
+    latest = get_latest_input(state)
+    return (
+        FOLLOW_UP_ENABLED
+        and bool(state.get("last_shipment"))
+        and bool(latest)
+        and len(latest) <= FOLLOW_UP_MAX_CHARS
+    )
+
+
+def manage_history(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Trims the message window and detects follow-up messages.
+
+    Args:
+        state: The current state with messages, history_summary and last_shipment
+
+    Returns:
+        An updated state with the trimmed messages, the summary and the follow-up flag
+    """
+    messages = state.get("messages") or []
+    kept, summary = trim_messages(messages, state.get("history_summary"), max_messages=HISTORY_MAX_MESSAGES)
+    if len(kept) < len(messages):
+        metrics.inc("shipmentbot_history_trimmed_messages_total", len(messages) - len(kept))
+    follow_up = is_follow_up({**state, "messages": kept})
+    if follow_up:
+        metrics.inc("shipmentbot_follow_up_total")
+    return {"messages": kept, "history_summary": summary, "follow_up": follow_up}
+
+
+async def amanage_history(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Async variant of manage_history, so that graph.ainvoke needs no thread hop.
+
+    Args:
+        state: The current state with messages, history_summary and last_shipment
+
+    Returns:
+        An updated state with the trimmed messages, the summary and the follow-up flag
+    """
+    return manage_history(state)
+
+
+def route_follow_up(state: Dict[str, Any]) -> str:
+    """
+    Sends follow-up messages directly to the LLM.
+    The fast path and the splitter only see the new message and would
+    replace the previous extraction instead of refining it.
+
+    Args:
+        state: The state after the history node
+
+    Returns:
+        "follow_up" for follow-up messages, otherwise "new_inquiry"
+    """
+    return "follow_up" if state.get("follow_up") else "new_inquiry"
+
+
+def format_history_summary(summary: Optional[str]) -> str:
+    """
+    Formats the summary of trimmed messages for a follow-up input.
+
+    Args:
+        summary: The history_summary of the thread
+
+    Returns:
+        A block with the summary lines, empty without a summary
+    """
+    if not summary:
+        return ""
+    return f"Earlier messages, shipment-relevant lines:\n{summary}\n\n"
+
+
+def build_follow_up_input(previous: Dict[str, Any], message: str, summary: Optional[str] = None) -> str:
+    """
+    Builds the extraction input for a follow-up message.
+
+    Args:
+        previous: The extracted_data of the previous turn
+        message: The new message
+        summary: The history_summary of the thread
+
+    Returns:
+        The previous Shipment as JSON and the summary, followed by the new message
+    """
+    previous_json = json.dumps(
+        Shipment.model_validate(previous).model_dump(mode="json", exclude_none=True),
+        ensure_ascii=False,
+        separators=(",", ":")
+    )
+    return (
+        "Previous extraction (JSON):\n"
+        f"{previous_json}\n\n"
+        + format_history_summary(summary)
+        + "New message. Apply its corrections and additions to the previous extraction "
+        "and return the complete updated shipment. If it describes an unrelated shipment, "
+        "extract only the new message:\n"
+        f"{message}"
+    )
+
+
+def get_extraction_input(state: Dict[str, Any]) -> str:
+    """
+    Returns the text that is sent to the LLM for the current turn.
+
+    Args:
+        state: The current state with messages and possibly follow_up and last_shipment
+
+    Returns:
+        The latest message, prefixed with the previous extraction and the
+        history summary for follow-ups
+    """
+    message = get_latest_input(state)
+    if state.get("follow_up") and state.get("last_shipment"):
+        return build_follow_up_input(state["last_shipment"], message, state.get("history_summary"))
+    return message
+
+
+def remember_extraction(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Stores the result of the turn as the base for follow-up messages.
+    Degraded, partial and failed extractions keep the previous result.
+
+    Args:
+        state: The state after the extraction
+
+    Returns:
+        An updated state with last_shipment, or no update
+    """
+    if state.get("extracted_data") is None or state.get("degraded") or state.get("partial"):
+        return {}
+    return {"last_shipment": state["extracted_data"]}
+
+
+async def aremember_extraction(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Async variant of remember_extraction, so that graph.ainvoke needs no thread hop.
+
+    Args:
+        state: The state after the extraction
+
+    Returns:
+        An updated state with last_shipment, or no update
+    """
+    return remember_extraction(state)
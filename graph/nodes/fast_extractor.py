@@ -0,0 +1,318 @@
+"""
+Fast extractor node for LangGraph.
+
+This node extracts shipment data from simple, formulaic inputs with
+precompiled German/English patterns instead of calling Claude. It reports
+a confidence score, only low-confidence inputs are routed to the
+shipment extractor.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from graph.models.shipment_models import Shipment, ShipmentItem, LoadCarrierType
+from graph.config import FAST_PATH_ENABLED, FAST_PATH_MIN_CONFIDENCE
+from graph.nodes.input_compactor import get_latest_input
+
+# Number with optional thousands separators (12.400) or decimals (15,8)
+_NUMBER = r"\d{1,3}(?:[.,]\d{3})+(?![.,]?\d)|\d+(?:[.,]\d+)?"
+# Weights may also use a space as thousands separator (8 954 kg)
+_WEIGHT_NUMBER = rf"\d{{1,3}}(?:[ \u00a0\u202f]\d{{3}})+(?![.,]?\d)|{_NUMBER}"
+# End of a unit, also directly before a capitalized word ("71 kgMaße")
+_UNIT_END = r"(?:\b|(?=(?-i:[A-ZÄÖÜ])))"
+
+_CARRIER_PATTERN = re.compile(
+    r"(?<![\d.,])(\d+)\s*(?:x\s*)?"
+    r"(euro-?paletten?|europaletten?|epal|paletten?|pallets?|palettes?"
+    r"|plts?|gitterbox(?:en)?|pakete?|packages?|parcels?|kartons?|cartons?|colis|box(?:es)?"
+    r"|dokumente?|documents?|umschl[aä]ge?|envelopes?)\b",
+    re.IGNORECASE
+)
+
+_DIMENSIONS_PATTERN = re.compile(
+    rf"(?<![\d.,])({_NUMBER})\s*(?:cm)?\s*[x×*]\s*({_NUMBER})\s*(?:cm)?\s*[x×*]\s*({_NUMBER})\s*(cm|mm|m)?\b",
+    re.IGNORECASE
+)
+
+# A number right after a dimension ("89*89*96*4 Box") is not a quantity
+_AFTER_DIMENSION_PATTERN = re.compile(r"\d\s*[x×*]\s*$", re.IGNORECASE)
+
+_WEIGHT_PATTERN = re.compile(
+    rf"(?<![\d.,])({_WEIGHT_NUMBER})\s*(kgs?|kilo(?:gramm)?s?|t){_UNIT_END}",
+    re.IGNORECASE
+)
+
+# Label directly in front of a weight, gross weights are totals, chargeable weights are ignored
+_WEIGHT_LABEL_PATTERN = re.compile(
+    r"\b(?:(gross|brutto|gesamt|total)|(chargeable|taxable|volum(?:e|en)?|frachtpflichtig(?:es)?))"
+    r"[\s-]*(?:weight|gewicht|wt)?\.?\s*[:=]?\s*$",
+    re.IGNORECASE
+)
+
+_VOLUME_PATTERN = re.compile(
+    rf"(?<![\d.,])({_NUMBER})\s*(?:cbm|m3|m³|kubikmeter){_UNIT_END}",
+    re.IGNORECASE
+)
+
+_PER_PIECE_PATTERN = re.compile(r"\b(?:je|pro|per|each|jeweils)\b", re.IGNORECASE)
+
+_NOT_STACKABLE_PATTERN = re.compile(
+    r"\b(?:nicht|not|non)[\s-]*(?:stapelbar|stackable|gerbable)\b",
+    re.IGNORECASE
+)
+
+_STACKABLE_PATTERN = re.compile(r"\b(?:stapelbar|stackable|gerbable)\b", re.IGNORECASE)
+
+_GOODS_PATTERN = re.compile(
+    r"\b(?:commodity|wareninhalt|warenbezeichnung|inhalt|goods)\s*:\s*([^,;:\n]+?)\s*(?=\b(?:quantity|(?:gesamt|brutto|gross\s*)?(?:gewicht|weight)|maße|dimension)\b|[,;\n]|$)",
+    re.IGNORECASE
+)
+
+_ANY_NUMBER_PATTERN = re.compile(r"\d+")
+
+# Score contribution of each field, the sum is 1.0
+_FIELD_SCORES = {"load_carrier": 0.25, "quantity": 0.25, "dimensions": 0.25, "weight": 0.25}
+
+# Penalties for signs of a more complex inquiry
+_UNEXPLAINED_NUMBER_PENALTY = 0.15
+_AMBIGUOUS_WEIGHT_PENALTY = 0.2
+
+
+@dataclass
+class FastPathResult:
+    """Result of the rule-based extraction."""
+    shipment: Optional[Shipment]
+    confidence: float
+    missing_fields: List[str] = field(default_factory=list)
+
+
+def _parse_number(value: str) -> float:
+    """
+    Parses a number with German or English separators.
+
+    Args:
+        value: The matched number, e.g. "12.400", "8 954", "15,8" or "60.9"
+
+    Returns:
+        The numeric value
+    """
+    value = re.sub(r"(?<=\d)[ \u00a0\u202f](?=\d{3})", "", value)
+    if re.fullmatch(r"\d{1,3}(?:[.,]\d{3})+", value):
+        return float(re.sub(r"[.,]", "", value))
+    return float(value.replace(",", "."))
+
+
+def _classify_carrier(word: str) -> LoadCarrierType:
+    """
+    Maps a carrier word to a LoadCarrierType.
+
+    Args:
+        word: The matched carrier word
+
+    Returns:
+        The matching LoadCarrierType
+    """
+    word = word.lower()
+    if word.startswith("gitterbox"):
+        return LoadCarrierType.EURO_PALLET_CAGE
+    if word.startswith(("dokument", "document", "umschl", "envelope")):
+        return LoadCarrierType.DOCUMENT
+    if word.startswith(("pal", "plt", "euro", "epal")):
+        return LoadCarrierType.PALLET
+    return LoadCarrierType.PACKAGE
+
+
+def _distinct(matches: List[re.Match]) -> List[Tuple[str, ...]]:
+    return list(dict.fromkeys(tuple(g.lower() if g else g for g in m.groups()) for m in matches))
+
+
+def _find_carriers(text: str) -> List[re.Match]:
+    return [
+        match for match in _CARRIER_PATTERN.finditer(text)
+        if not _AFTER_DIMENSION_PATTERN.search(text, 0, match.start())
+    ]
+
+
+def _weight_label(text: str, match: re.Match) -> Optional[str]:
+    """
+    Reads the label in front of a weight.
+
+    Args:
+        text: The inquiry text
+        match: A match of the weight pattern
+
+    Returns:
+        "gross" for gross or total weights, "chargeable" for chargeable or
+        volume weights, None for unlabelled weights
+    """
+    label = _WEIGHT_LABEL_PATTERN.search(text[max(0, match.start() - 30):match.start()])
+    if label is None:
+        return None
+    return "gross" if label.group(1) else "chargeable"
+
+
+def count_items(text: str) -> int:
+    """
+    Estimates the number of items in an inquiry from the distinct
+    load carrier and dimension mentions.
+
+    Args:
+        text: The inquiry text
+
+    Returns:
+        The estimated item count, 0 if nothing was detected
+    """
+    carriers = _distinct(_find_carriers(text))
+    dimensions = _distinct(list(_DIMENSIONS_PATTERN.finditer(text)))
+    return max(len(carriers), len(dimensions))
+
+
+def extract_with_rules(text: str) -> FastPathResult:
+    """
+    Extracts a single-item shipment with precompiled patterns.
+
+    Args:
+        text: The inquiry text
+
+    Returns:
+        A FastPathResult, the shipment is None if no item could be detected
+    """
+    carriers = _find_carriers(text)
+    dimensions = list(_DIMENSIONS_PATTERN.finditer(text))
+    labelled_weights = [(match, _weight_label(text, match)) for match in _WEIGHT_PATTERN.finditer(text)]
+    # Chargeable weights are derived from the volume, only the actual weight is extracted
+    weights = [match for match, label in labelled_weights if label != "chargeable"]
+    gross_weights = {match.span() for match, label in labelled_weights if label == "gross"}
+
+    # Several items (or several sizes/weights) need the precise extractor
+    if len(_distinct(carriers)) > 1 or len(_distinct(dimensions)) > 1 or len(_distinct(weights)) > 1:
+        return FastPathResult(shipment=None, confidence=0.0)
+    if not carriers:
+        return FastPathResult(shipment=None, confidence=0.0)
+
+    item = ShipmentItem()
+    score = 0.0
+    consumed = [match.span() for match, label in labelled_weights if label == "chargeable"]
+    consumed.extend(match.span() for match in _VOLUME_PATTERN.finditer(text))
+
+    carrier = carriers[0]
+    item.quantity = int(carrier.group(1))
+    item.load_carrier = _classify_carrier(carrier.group(2))
+    score += _FIELD_SCORES["quantity"] + _FIELD_SCORES["load_carrier"]
+    consumed.append(carrier.span())
+
+    if dimensions:
+        match = dimensions[0]
+        factor = {"mm": 0.1, "m": 100.0}.get((match.group(4) or "cm").lower(), 1.0)
+        item.length, item.width, item.height = (
+            int(round(_parse_number(match.group(i)) * factor)) for i in (1, 2, 3)
+        )
+        score += _FIELD_SCORES["dimensions"]
+        consumed.append(match.span())
+
+    if weights:
+        match = weights[0]
+        factor = 1000.0 if match.group(2).lower() == "t" else 1.0
+        weight = _parse_number(match.group(1)) * factor
+        score += _FIELD_SCORES["weight"]
+        consumed.append(match.span())
+        context = text[max(0, match.start() - 30):match.end() + 10]
+        if match.span() in gross_weights:
+            # A gross or total weight is split over the pieces
+            weight /= item.quantity
+        elif item.quantity > 1 and not _PER_PIECE_PATTERN.search(context):
+            # A weight without "je/pro/each" for several pieces may be the total weight
+            score -= _AMBIGUOUS_WEIGHT_PENALTY
+        item.weight = int(round(weight))
+
+    if _NOT_STACKABLE_PATTERN.search(text):
+        item.stackable = False
+    elif _STACKABLE_PATTERN.search(text):
+        item.stackable = True
+
+    goods = _GOODS_PATTERN.search(text)
+    if goods:
+        item.name = goods.group(1).strip()
+
+    # Numbers that none of the patterns explain hint at further details
+    remaining = list(text)
+    for start, end in consumed:
+        remaining[start:end] = " " * (end - start)
+    unexplained = [
+        n for n in _ANY_NUMBER_PATTERN.findall("".join(remaining))
+        if int(n) != item.quantity
+    ]
+    score -= _UNEXPLAINED_NUMBER_PENALTY * len(unexplained)
+
+    missing = [
+        name for name, value in (
+            ("dimensions", item.length),
+            ("weight", item.weight),
+            ("stackable", item.stackable)
+        ) if value is None
+    ]
+    message = "Extracted with the rule-based fast path."
+    if missing:
+        message += f" Missing information: {', '.join(missing)}."
+
+    return FastPathResult(
+        shipment=Shipment(items=[item], message=message),
+        confidence=round(max(0.0, min(1.0, score)), 2),
+        missing_fields=missing
+    )
+
+
+def fast_extract(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Tries the rule-based extraction for the latest message.
+    Only confident results are written to the state, otherwise just the
+    confidence is stored and the graph continues with the shipment extractor.
+
+    Args:
+        state: The current state with messages, extracted_data and message
+
+    Returns:
+        An updated state with the fast path confidence and, if confident, the extracted data
+    """
+    messages = state.get("messages") or []
+    if not FAST_PATH_ENABLED or not messages:
+        return {"fast_path_confidence": 0.0}
+
+    result = extract_with_rules(get_latest_input(state))
+    if result.shipment is None or result.confidence < FAST_PATH_MIN_CONFIDENCE:
+        return {"fast_path_confidence": result.confidence}
+
+    return {
+        "extracted_data": result.shipment.model_dump(),
+        "message": result.shipment.message,
+        "fast_path_confidence": result.confidence
+    }
+
+
+def route_after_fast_extractor(state: Dict[str, Any]) -> str:
+    """
+    Decides whether the fast path result is final.
+
+    Args:
+        state: The state after the fast extractor
+
+    Returns:
+        "done" if the fast path was confident, otherwise "shipment_extractor"
+    """
+    confidence = state.get("fast_path_confidence") or 0.0
+    if FAST_PATH_ENABLED and confidence >= FAST_PATH_MIN_CONFIDENCE:
+        return "done"
+    return "shipment_extractor"
+
+
+async def afast_extract(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Async variant of fast_extract, so that graph.ainvoke needs no thread hop.
+
+    Args:
+        state: The current state with messages, extracted_data and message
+
+    Returns:
+        An updated state with the fast path confidence and, if confident, the extracted data
+    """
+    return fast_extract(state)
@@ -0,0 +1,215 @@
+"""
+Input compactor node for LangGraph.
+
+This node shrinks e-mail inquiries before they are sent to Claude. Quoted
+reply chains, signatures, disclaimers, HTML leftovers and redundant
+whitespace are removed in a single pass over the lines. Every line that
+contains a number with a unit (e.g. "3 Paletten", "120x80 cm", "450 kg")
+is kept, no matter where it appears. The compacted text is stored next to
+the messages, the user's original message is never overwritten.
+"""
+import html
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator
+
+from graph.config import COMPACTION_ENABLED
+from graph.services.metrics import metrics, TOKEN_BUCKETS
+
+# Rough number of characters per token for German/English text
+_CHARS_PER_TOKEN = 4
+
+_HTML_TAG_PATTERN = re.compile(r"</?[a-z][\w-]*(?:\s[^<>\n]*)?/?>", re.IGNORECASE)
+_HTML_BLOCK_PATTERN = re.compile(r"<(style|script|head)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+_HTML_LINE_BREAK_PATTERN = re.compile(r"<\s*(?:br|/p|/div|/li|/tr)\s*/?\s*>", re.IGNORECASE)
+
+# Guard: a number followed by a unit or load carrier, or a dimension like 120x80
+_MEASURE_PATTERN = re.compile(
+    r"\d\s*(?:[x×*]\s*\d"
+    r"|(?:mm|cm|m|ldm|lm|m3|m³|cbm|kgs?|kilo\w*|t|to|tonnen?|tons?|stk|stück|pcs|pieces?|colli"
+    r"|euro-?paletten?|europaletten?|paletten?|pallets?|palettes?|gitterbox\w*|kartons?|cartons?"
+    r"|pakete?|packages?|kisten?|box\w*|colis|fass|fässer|drums?|rollen?|coils?)\b)",
+    re.IGNORECASE
+)
+
+# Lines that start a quoted reply chain, everything below is history
+_QUOTE_HEADER_PATTERNS = [
+    re.compile(r"^-{2,}\s*(?:original message|ursprüngliche nachricht|message d'origine|forwarded message|weitergeleitete nachricht)\s*-{2,}$", re.IGNORECASE),
+    re.compile(r"^_{10,}$"),
+    re.compile(r"^(?:on|am|le)\b.{0,200}\b(?:wrote|schrieb|a écrit)\b.{0,120}:$", re.IGNORECASE),
+    re.compile(r"^(?:from|von|de)\s*:.*@", re.IGNORECASE),
+]
+
+# Lines that start a signature, everything below is signature
+_SIGNATURE_PATTERNS = [
+    re.compile(r"^--\s*$"),
+    re.compile(
+        r"^(?:mit freundlichen grü(?:ß|ss)en|freundliche grü(?:ß|ss)e|viele grü(?:ß|ss)e|beste grü(?:ß|ss)e|lg"
+        r"|best regards|kind regards|regards|best|cheers|sincerely|cordialement|bien cordialement"
+        r"|met vriendelijke groet(?:en)?)\b[\s,.!]*$",
+        re.IGNORECASE
+    ),
+    re.compile(r"^(?:sent from my|von meinem \w+ gesendet|gesendet von)\b", re.IGNORECASE),
+]
+
+# Single boilerplate lines (disclaimers, legal footers, salutations)
+_BOILERPLATE_PATTERN = re.compile(
+    r"(?:confidential|vertraulich|disclaimer|haftungsausschluss|please consider the environment"
+    r"|bitte denken sie an die umwelt|sitz der gesellschaft|geschäftsführer|amtsgericht|registergericht"
+    r"|\bhrb\b|ust-?id|vat (?:no|id)|unsubscribe|abmelden"
+    r"|^(?:sehr geehrte damen und herren|dear sir or madam|hallo zusammen|guten tag|hello|hallo|hi)\b[\s,!]*$)",
+    re.IGNORECASE
+)
+
+_WHITESPACE_PATTERN = re.compile(r"[ \t\u00a0]+")
+
+
+@dataclass
+class CompactionResult:
+    """Compacted text and the estimated token counts before and after."""
+    text: str
+    original_tokens: int
+    compacted_tokens: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.original_tokens - self.compacted_tokens
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the number of tokens of a text without calling the API.
+
+    Args:
+        text: The text
+
+    Returns:
+        The estimated token count
+    """
+    return (len(text) + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN
+
+
+def strip_html(text: str) -> str:
+    """
+    Removes HTML tags and entities, line-breaking tags become newlines.
+
+    Args:
+        text: The text, possibly containing HTML
+
+    Returns:
+        The plain text
+    """
+    if "<" not in text and "&" not in text:
+        return text
+    text = _HTML_BLOCK_PATTERN.sub("", text)
+    text = _HTML_LINE_BREAK_PATTERN.sub("\n", text)
+    text = _HTML_TAG_PATTERN.sub("", text)
+    return html.unescape(text)
+
+
+def has_measure(line: str) -> bool:
+    """Returns True if the line contains a number with a unit and must be kept."""
+    return bool(_MEASURE_PATTERN.search(line))
+
+
+def _compact_lines(lines: Iterable[str]) -> Iterator[str]:
+    section = "body"  # body, quote or signature
+    previous_blank = True
+    for raw_line in lines:
+        line = _WHITESPACE_PATTERN.sub(" ", raw_line).strip()
+        if not line:
+            if not previous_blank and section == "body":
+                previous_blank = True
+                yield ""
+            continue
+
+        guarded = has_measure(line)
+        if any(pattern.search(line) for pattern in _QUOTE_HEADER_PATTERNS):
+            section = "quote"
+        elif section == "body" and any(pattern.search(line) for pattern in _SIGNATURE_PATTERNS):
+            section = "signature"
+        elif section == "body" and not line.startswith(">") and (guarded or not _BOILERPLATE_PATTERN.search(line)):
+            previous_blank = False
+            yield line
+            continue
+
+        # Outside the body only lines with numbers and units survive
+        if guarded:
+            previous_blank = False
+            yield line
+
+
+def compact_text(text: str) -> CompactionResult:
+    """
+    Removes quoted history, signatures, boilerplate and redundant whitespace.
+
+    Args:
+        text: The inquiry text
+
+    Returns:
+        The compacted text with the estimated token savings
+    """
+    compacted = "\n".join(_compact_lines(strip_html(text).splitlines())).strip()
+    if not compacted:
+        # Never send an empty inquiry, the extractor should report what is missing
+        compacted = text.strip()
+    original_tokens = estimate_tokens(text)
+    return CompactionResult(compacted, original_tokens, min(original_tokens, estimate_tokens(compacted)))
+
+
+def get_latest_input(state: Dict[str, Any]) -> str:
+    """
+    Returns the text of the latest message that the nodes extract from.
+
+    Args:
+        state: The current state with messages and possibly compacted_input
+
+    Returns:
+        The compacted latest message, or the message itself without compaction
+    """
+    compacted = state.get("compacted_input")
+    if compacted is not None:
+        return compacted
+    messages = state.get("messages") or []
+    return messages[-1] if messages else ""
+
+
+def compact_input(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compacts the latest message before the extraction.
+
+    Args:
+        state: The current state with messages
+
+    Returns:
+        An updated state with the compacted input and the token savings,
+        the messages are left unchanged
+    """
+    messages = state.get("messages") or []
+    if not COMPACTION_ENABLED or not messages:
+        return {"compacted_input": None}
+
+    result = compact_text(messages[-1])
+    metrics.observe("shipmentbot_compaction_tokens_saved", result.tokens_saved, buckets=TOKEN_BUCKETS)
+    return {
+        "compacted_input": result.text,
+        "compaction": {
+            "original_tokens": result.original_tokens,
+            "compacted_tokens": result.compacted_tokens,
+            "tokens_saved": result.tokens_saved
+        }
+    }
+
+
+async def acompact_input(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Async variant of compact_input, so that graph.ainvoke needs no thread hop.
+
+    Args:
+        state: The current state with messages
+
+    Returns:
+        An updated state with the compacted input and the token savings,
+        the messages are left unchanged
+    """
+    return compact_input(state)
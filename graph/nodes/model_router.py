@@ -0,0 +1,119 @@
+"""
+Model router node for LangGraph.
+
+This node decides per request which model tier the shipment extractor uses.
+Short inquiries with few items that the fast path partially understood go to
+the small tier, everything else to the large tier (LLM_MODEL). The extractor
+escalates to the large tier if the small one returns an invalid or empty
+Shipment.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, NamedTuple, Optional
+
+from graph.config import (
+    LLM_MODEL,
+    LLM_MAX_TOKENS,
+    LLM_TIMEOUT,
+    LLM_SMALL_MODEL,
+    LLM_SMALL_MAX_TOKENS,
+    LLM_SMALL_TIMEOUT,
+    ROUTER_ENABLED,
+    ROUTER_SMALL_MAX_CHARS,
+    ROUTER_SMALL_MAX_ITEMS,
+    ROUTER_SMALL_MIN_CONFIDENCE
+)
+from graph.nodes.fast_extractor import count_items
+from graph.nodes.input_compactor import get_latest_input
+from graph.services.metrics import metrics
+
+
+class ModelTier(NamedTuple):
+    """Model configuration of a routing tier."""
+    name: str
+    model: str
+    max_tokens: int
+    timeout: int
+
+
+SMALL_TIER = ModelTier("small", LLM_SMALL_MODEL, LLM_SMALL_MAX_TOKENS, LLM_SMALL_TIMEOUT)
+LARGE_TIER = ModelTier("large", LLM_MODEL, LLM_MAX_TOKENS, LLM_TIMEOUT)
+
+MODEL_TIERS = {tier.name: tier for tier in (SMALL_TIER, LARGE_TIER)}
+
+# Tier that is used when no routing decision is in the state
+DEFAULT_TIER = LARGE_TIER.name
+
+
+@dataclass
+class RoutingPolicy:
+    """Thresholds an inquiry must meet to be handled by the small tier."""
+    enabled: bool = ROUTER_ENABLED
+    max_chars: int = ROUTER_SMALL_MAX_CHARS
+    max_items: int = ROUTER_SMALL_MAX_ITEMS
+    min_confidence: float = ROUTER_SMALL_MIN_CONFIDENCE
+
+
+def select_tier(text: str, fast_path_confidence: float = 0.0, policy: Optional[RoutingPolicy] = None) -> Dict[str, str]:
+    """
+    Selects the model tier for an inquiry.
+
+    Args:
+        text: The inquiry text
+        fast_path_confidence: Confidence of the rule-based extraction
+        policy: The routing thresholds, the configured policy is used if None
+
+    Returns:
+        A dictionary with the tier name and the reason of the decision
+    """
+    policy = policy or RoutingPolicy()
+    if not policy.enabled:
+        return {"tier": DEFAULT_TIER, "reason": "disabled"}
+    if len(text) > policy.max_chars:
+        return {"tier": LARGE_TIER.name, "reason": "length"}
+    if count_items(text) > policy.max_items:
+        return {"tier": LARGE_TIER.name, "reason": "items"}
+    if fast_path_confidence < policy.min_confidence:
+        return {"tier": LARGE_TIER.name, "reason": "confidence"}
+    return {"tier": SMALL_TIER.name, "reason": "simple"}
+
+
+def needs_escalation(response: Dict[str, Any]) -> bool:
+    """
+    Checks whether a small tier response should be repeated with the large tier.
+
+    Args:
+        response: The response returned by extract_shipment_data
+
+    Returns:
+        True if the Shipment is invalid (error response) or has no items
+    """
+    extracted_data = response.get("extracted_data")
+    return extracted_data is None or not extracted_data.get("items")
+
+
+def route_model(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Stores the model tier for the latest message in the state.
+
+    Args:
+        state: The current state with messages and the fast path confidence
+
+    Returns:
+        An updated state with the selected model tier
+    """
+    decision = select_tier(get_latest_input(state), state.get("fast_path_confidence") or 0.0)
+    metrics.inc("shipmentbot_model_routing_total", tier=decision["tier"], reason=decision["reason"])
+    return {"model_tier": decision["tier"]}
+
+
+async def aroute_model(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Async variant of route_model, so that graph.ainvoke needs no thread hop.
+
+    Args:
+        state: The current state with messages and the fast path confidence
+
+    Returns:
+        An updated state with the selected model tier
+    """
+    return route_model(state)
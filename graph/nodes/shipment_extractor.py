@@ -2,20 +2,27 @@
 Shipment extractor node for LangGraph.
 
 This node extracts structured shipment data from text inputs using Claude.
+The Anthropic SDK, the LangSmith client and the tracer are imported on first
+use, so that importing the graph stays fast (see tests/benchmarks/import_benchmark.py).
 """
 from langchain_core.prompts import PromptTemplate
-from langchain_anthropic import ChatAnthropic
+import asyncio
+import importlib
 import json
 import re
-from langchain_core.tracers import LangChainTracer
+import sys
+import threading
+import time
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import RunnableLambda
 import os
-from langsmith import Client
-from langchain_core.messages import HumanMessage, SystemMessage
-from typing import Dict, Any, List, Optional, Union, Callable
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple, Union, Callable
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type, retry_if_exception
 
 # Import models from the models directory
-from graph.models.shipment_models import Shipment, ShipmentItem, LoadCarrierType
+from graph.models.shipment_models import Shipment, ShipmentItem, LoadCarrierType, ShipmentPatch
 
 # Import central configuration
 from graph.config import (
@@ -28,20 +35,80 @@ from graph.config import (
     LANGSMITH_API_KEY,
     LANGSMITH_ENDPOINT,
     DEFAULT_PROMPT_NAME,
+    ANTHROPIC_PROMPT_CACHING,
+    RESULT_CACHE_ENABLED,
+    NEAR_DUPLICATE_ENABLED,
+    LLM_CASSETTE_MODE,
+    LLM_CASSETTE_PATH,
+    LIMITER_PROMPT_TOKENS,
     ERROR_MESSAGES
 )
+from graph.services.prompt_registry import PromptRegistry, prompt_fingerprint
+from graph.services.chain_pool import ChainPool, ChainKey, LLMKey, key_of, with_chain_key
+from graph.services.result_cache import ResultCache, build_cache_key
+from graph.services.near_duplicates import NearDuplicateIndex, Fingerprint
+from graph.services.cassette import Cassette, CassetteMissError, request_fingerprint
+from graph.services.metrics import metrics, TOKEN_BUCKETS
+from graph.services.hedging import Hedger
+from graph.services.rate_limiter import AdaptiveLimiter, is_overloaded_error
+from graph.services.scheduler import priority_scope, get_priority_from_config
+from graph.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from graph.services.item_stream import ItemEmitter, create_item_emitter
+from graph.nodes.fast_extractor import extract_with_rules
+from graph.nodes.input_compactor import estimate_tokens, get_latest_input
+from graph.nodes.conversation_history import get_extraction_input
+from graph.nodes.shipment_patcher import uses_patch_mode, build_patch_input, apply_shipment_patch
+from graph.nodes.model_router import ModelTier, MODEL_TIERS, DEFAULT_TIER, LARGE_TIER, needs_escalation
 
-# Initialize the LangSmith Client
-client = Client(
-    api_key=os.getenv("LANGSMITH_API_KEY", LANGSMITH_API_KEY),
-    api_url=os.getenv("LANGSMITH_ENDPOINT", LANGSMITH_ENDPOINT)
-)
+if TYPE_CHECKING:
+    from langchain_anthropic import ChatAnthropic
 
+# Heavy dependencies, imported on first access of the module attribute
+_LAZY_IMPORTS = {
+    "ChatAnthropic": ("langchain_anthropic", "ChatAnthropic"),
+    "LangChainTracer": ("langchain_core.tracers", "LangChainTracer"),
+    "Client": ("langsmith", "Client")
+}
 
-def load_prompt(prompt_name: str) -> Optional[PromptTemplate]:
+
+def __getattr__(name: str) -> Any:
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name, attribute = _LAZY_IMPORTS[name]
+    value = getattr(importlib.import_module(module_name), attribute)
+    globals()[name] = value
+    return value
+
+
+def _lazy(name: str) -> Any:
+    # Attribute access on the module, so that patched attributes are honored
+    return getattr(sys.modules[__name__], name)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_langsmith_client():
+    """
+    Returns the LangSmith client, creating it on first use.
+    
+    Returns:
+        The process-wide LangSmith Client
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = _lazy("Client")(
+                api_key=os.getenv("LANGSMITH_API_KEY", LANGSMITH_API_KEY),
+                api_url=os.getenv("LANGSMITH_ENDPOINT", LANGSMITH_ENDPOINT)
+            )
+        return _client
+
+
+def fetch_prompt(prompt_name: str) -> Optional[PromptTemplate]:
     """
-    Loads a prompt from LangSmith or from a local file.
-    Caching is disabled, a fresh prompt is always loaded.
+    Fetches a prompt from LangSmith or from a local file, bypassing the cache.
     
     Args:
         prompt_name: Name of the prompt in LangSmith
@@ -51,7 +118,7 @@ def load_prompt(prompt_name: str) -> Optional[PromptTemplate]:
     """
     try:
         print(f"Loading prompt '{prompt_name}' from LangSmith...")
-        prompt = client.pull_prompt(prompt_name, include_model=False)
+        prompt = get_langsmith_client().pull_prompt(prompt_name, include_model=False)
         print(f"Prompt '{prompt_name}' successfully loaded.")
         return prompt
     except Exception as e:
@@ -68,6 +135,25 @@ def load_prompt(prompt_name: str) -> Optional[PromptTemplate]:
             return None
 
 
+# Process-wide prompt cache, prompts are only pulled again after the TTL
+prompt_registry = PromptRegistry(loader=fetch_prompt)
+
+
+def load_prompt(prompt_name: str) -> Optional[PromptTemplate]:
+    """
+    Loads a prompt through the process-wide prompt registry.
+    The first call pulls the prompt, later calls are served from memory
+    and refreshed in the background once PROMPT_CACHE_TTL has expired.
+    
+    Args:
+        prompt_name: Name of the prompt in LangSmith
+        
+    Returns:
+        A PromptTemplate or None if the prompt could not be loaded
+    """
+    return prompt_registry.get(prompt_name)
+
+
 def create_error_response(error_type: str, details: str = "") -> Dict[str, Any]:
     """
     Creates a standardized error response.
@@ -90,49 +176,424 @@ def create_error_response(error_type: str, details: str = "") -> Dict[str, Any]:
     }
 
 
-def create_extraction_chain(prompt_template):
+def _usage_value(usage: Any, key: str) -> int:
+    value = usage.get(key) if isinstance(usage, dict) else getattr(usage, key, None)
+    return int(value or 0)
+
+
+def extract_token_usage(response: Any) -> Dict[str, int]:
     """
-    Creates the extraction chain with LLM and prompt.
+    Reads the token counts from an LLM result.
     
     Args:
-        prompt_template: The PromptTemplate for the chain
+        response: The LLMResult passed to on_llm_end
         
     Returns:
-        A chain for structured extraction
+        A dictionary with input_tokens and output_tokens
+    """
+    for generations in getattr(response, "generations", []):
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return {
+                    "input_tokens": _usage_value(usage, "input_tokens"),
+                    "output_tokens": _usage_value(usage, "output_tokens")
+                }
+    usage = (getattr(response, "llm_output", None) or {}).get("usage") or {}
+    return {
+        "input_tokens": _usage_value(usage, "input_tokens"),
+        "output_tokens": _usage_value(usage, "output_tokens")
+    }
+
+
+def extract_cache_usage(response: Any) -> Dict[str, int]:
     """
-    # Set up LangSmith tracing
-    callbacks = []
+    Reads the prompt cache token counts from an LLM result.
+    
+    Args:
+        response: The LLMResult passed to on_llm_end
+        
+    Returns:
+        A dictionary with cache_read_tokens and cache_write_tokens
+    """
+    for generations in getattr(response, "generations", []):
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                details = usage.get("input_token_details") if isinstance(usage, dict) else getattr(usage, "input_token_details", None)
+                if details:
+                    return {
+                        "cache_read_tokens": _usage_value(details, "cache_read"),
+                        "cache_write_tokens": _usage_value(details, "cache_creation")
+                    }
+    usage = (getattr(response, "llm_output", None) or {}).get("usage") or {}
+    return {
+        "cache_read_tokens": _usage_value(usage, "cache_read_input_tokens"),
+        "cache_write_tokens": _usage_value(usage, "cache_creation_input_tokens")
+    }
+
+
+class UsageMetricsCallback(BaseCallbackHandler):
+    """Records the token usage of every Anthropic response in the metrics registry."""
+    
+    def __init__(self, model: str):
+        self.model = model
+    
+    def on_llm_end(self, response: Any, **kwargs: Any) -> None:
+        usage = extract_token_usage(response)
+        metrics.observe("shipmentbot_llm_input_tokens", usage["input_tokens"], buckets=TOKEN_BUCKETS, model=self.model)
+        metrics.observe("shipmentbot_llm_output_tokens", usage["output_tokens"], buckets=TOKEN_BUCKETS, model=self.model)
+        cache = extract_cache_usage(response)
+        metrics.observe("shipmentbot_llm_cache_read_tokens", cache["cache_read_tokens"], buckets=TOKEN_BUCKETS, model=self.model)
+        metrics.observe("shipmentbot_llm_cache_write_tokens", cache["cache_write_tokens"], buckets=TOKEN_BUCKETS, model=self.model)
+
+
+def create_llm(
+    model: str = LLM_MODEL,
+    temperature: float = LLM_TEMPERATURE,
+    max_tokens: int = LLM_MAX_TOKENS,
+    timeout: int = LLM_TIMEOUT
+) -> "ChatAnthropic":
+    """
+    Creates a new LLM client with LangSmith tracing if enabled.
+    
+    Args:
+        model: Name of the Anthropic model
+        temperature: Sampling temperature
+        max_tokens: Maximum number of output tokens
+        timeout: Request timeout in seconds
+        
+    Returns:
+        A ChatAnthropic client
+    """
+    # Token usage is always recorded, LangSmith tracing only if enabled
+    callbacks = [UsageMetricsCallback(model)]
     if LANGSMITH_TRACING:
-        callbacks.append(LangChainTracer(
+        callbacks.append(_lazy("LangChainTracer")(
             project_name=LANGSMITH_PROJECT,
             tags=["shipment_extractor"]
         ))
     
+    return _lazy("ChatAnthropic")(
+        model=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        timeout=timeout,
+        callbacks=callbacks
+    )
+
+
+# Structured output models of the extraction chains, keyed by ChainKey.output
+OUTPUT_MODELS = {"shipment": Shipment, "patch": ShipmentPatch}
+
+_INPUT_PLACEHOLDER = "\x00input\x00"
+
+
+def build_cacheable_prompt(prompt_template: PromptTemplate):
+    """
+    Splits the prompt into a static system prefix marked with cache_control
+    and a user message with the variable text. Anthropic caches the tools
+    before the system prompt, so the Shipment tool schema is part of the
+    cached prefix as well.
+    
+    Args:
+        prompt_template: The PromptTemplate with an {input} variable
+        
+    Returns:
+        A runnable that builds the messages, or the unchanged prompt if it
+        has other variables or no static text
+    """
+    if set(prompt_template.input_variables) != {"input"}:
+        return prompt_template
+    before, after = prompt_template.format(input=_INPUT_PLACEHOLDER).split(_INPUT_PLACEHOLDER, 1)
+    # Instructions usually precede the input, otherwise the text after it is the static part
+    static, suffix = (before, after) if before.strip() else (after, "")
+    if not static.strip():
+        return prompt_template
+    system_message = SystemMessage(content=[{"type": "text", "text": static, "cache_control": {"type": "ephemeral"}}])
+    
+    def to_messages(input_data: Dict[str, str]) -> List[Any]:
+        return [system_message, HumanMessage(content=input_data["input"] + suffix)]
+    
+    async def ato_messages(input_data: Dict[str, str]) -> List[Any]:
+        return to_messages(input_data)
+    
+    return RunnableLambda(to_messages, afunc=ato_messages, name="cacheable_prompt")
+
+
+def create_extraction_chain(prompt_template, llm: Optional["ChatAnthropic"] = None, output_model=Shipment):
+    """
+    Creates the extraction chain with LLM and prompt.
+    
+    Args:
+        prompt_template: The PromptTemplate for the chain
+        llm: An existing LLM client to reuse, a new one is created if None
+        output_model: The Pydantic model of the structured output
+        
+    Returns:
+        A chain for structured extraction
+    """
     # If prompt_template is not a PromptTemplate, convert it
     if not isinstance(prompt_template, PromptTemplate):
         prompt_template = PromptTemplate.from_template(str(prompt_template))
     
-    # LLM with Pydantic model for structured output
-    llm = ChatAnthropic(
-        model=LLM_MODEL,
-        temperature=LLM_TEMPERATURE,
-        max_tokens=LLM_MAX_TOKENS,
-        timeout=LLM_TIMEOUT,
-        callbacks=callbacks
-    )
+    if llm is None:
+        llm = create_llm()
     
     # Configure LLM with structured output
-    structured_llm = llm.with_structured_output(Shipment)
+    structured_llm = llm.with_structured_output(output_model)
     
-    # Build chain with pipeline syntax
+    # Build chain with pipeline syntax, the static instructions are sent as a cacheable prefix
+    if ANTHROPIC_PROMPT_CACHING:
+        return build_cacheable_prompt(prompt_template) | structured_llm
     return prompt_template | structured_llm
 
 
-@retry(
+# Process-wide pool, LLM clients (and their HTTP connections) and chains are reused
+chain_pool = ChainPool()
+
+
+def share_api_clients(llm, timeout: int):
+    """
+    Lets an LLM client send its requests through the API clients of the pool,
+    so that all models and timeouts share one keep-alive connection pool.
+    
+    Args:
+        llm: A new ChatAnthropic client
+        timeout: Request timeout in seconds
+        
+    Returns:
+        The LLM client
+    """
+    sync_client, async_client = chain_pool.get_api_clients(lambda: (llm._client, llm._async_client))
+    # ChatAnthropic takes no existing API client, with_options copies a client but keeps its HTTP connections
+    object.__setattr__(llm, "_client", sync_client.with_options(timeout=timeout))
+    object.__setattr__(llm, "_async_client", async_client.with_options(timeout=timeout))
+    return llm
+
+
+def get_extraction_chain(
+    prompt_template,
+    prompt_version: Optional[str] = None,
+    model: str = LLM_MODEL,
+    temperature: float = LLM_TEMPERATURE,
+    max_tokens: int = LLM_MAX_TOKENS,
+    timeout: int = LLM_TIMEOUT,
+    output: str = "shipment"
+):
+    """
+    Returns a pooled extraction chain, building it only on first use.
+    
+    Args:
+        prompt_template: The PromptTemplate for the chain
+        prompt_version: Version reported by the prompt registry, computed if None
+        model: Name of the Anthropic model
+        temperature: Sampling temperature
+        max_tokens: Maximum number of output tokens
+        timeout: Request timeout in seconds
+        output: Structured output of the chain, a key of OUTPUT_MODELS
+        
+    Returns:
+        A chain for structured extraction
+    """
+    key = ChainKey(
+        prompt_version=prompt_version or prompt_fingerprint(prompt_template),
+        model=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        timeout=timeout,
+        output=output
+    )
+    llm = chain_pool.get_llm(
+        key.llm_key(),
+        lambda: share_api_clients(create_llm(model, temperature, max_tokens, timeout), timeout)
+    )
+    return chain_pool.get_chain(
+        key,
+        lambda: with_chain_key(create_extraction_chain(prompt_template, llm, OUTPUT_MODELS[output]), key)
+    )
+
+
+def build_anthropic_tool(model_class) -> Dict[str, Any]:
+    """
+    Converts a Pydantic model into an Anthropic tool definition.
+    
+    Args:
+        model_class: The Pydantic model, e.g. Shipment
+        
+    Returns:
+        A tool with name, description and input_schema, as bound by with_structured_output
+    """
+    function = convert_to_openai_tool(model_class)["function"]
+    return {
+        "name": function["name"],
+        "description": function.get("description", ""),
+        "input_schema": function["parameters"]
+    }
+
+
+def format_anthropic_messages(messages: List[BaseMessage]) -> Tuple[Optional[Any], List[Dict[str, Any]]]:
+    """
+    Converts prompt messages into the system param and messages of the Messages API.
+    
+    Args:
+        messages: The messages of a formatted prompt
+        
+    Returns:
+        The system content (None without a system message) and the user/assistant messages
+    """
+    system = None
+    formatted = []
+    for message in messages:
+        if isinstance(message, SystemMessage):
+            system = message.content
+        else:
+            formatted.append({"role": "assistant" if isinstance(message, AIMessage) else "user", "content": message.content})
+    return system, formatted
+
+
+def build_batch_params(prompt_template, input_text: str, tier: Optional[ModelTier] = None) -> Dict[str, Any]:
+    """
+    Builds the Messages API params of an extraction for a message batch.
+    Prompt, cacheable prefix, Shipment tool and model settings are the same
+    as in the chain used by extract_shipment_data, so batch and interactive
+    results are interchangeable.
+    
+    Args:
+        prompt_template: The prompt returned by load_prompt
+        input_text: The text to extract from
+        tier: The model tier to use, the default tier if None
+        
+    Returns:
+        The params of one batch request
+    """
+    tier = tier or MODEL_TIERS[DEFAULT_TIER]
+    if not isinstance(prompt_template, PromptTemplate):
+        prompt_template = PromptTemplate.from_template(str(prompt_template))
+    prompt = build_cacheable_prompt(prompt_template) if ANTHROPIC_PROMPT_CACHING else prompt_template
+    formatted = prompt.invoke({"input": input_text})
+    system, messages = format_anthropic_messages(
+        formatted if isinstance(formatted, list) else formatted.to_messages()
+    )
+    tool = build_anthropic_tool(Shipment)
+    params = {
+        "model": tier.model,
+        "max_tokens": tier.max_tokens,
+        "temperature": LLM_TEMPERATURE,
+        "messages": messages,
+        # Forced tool call, the same as with_structured_output(Shipment)
+        "tools": [tool],
+        "tool_choice": {"type": "tool", "name": tool["name"]}
+    }
+    if system is not None:
+        params["system"] = system
+    return params
+
+
+# Record/replay store for LLM responses, see LLM_CASSETTE_MODE
+llm_cassette = Cassette(LLM_CASSETTE_PATH, LLM_CASSETTE_MODE, response_model=Shipment)
+
+
+def use_cassette(mode: str, path: str = LLM_CASSETTE_PATH) -> Cassette:
+    """
+    Switches the process-wide LLM cassette, e.g. for regression runs.
+    
+    Args:
+        mode: One of off, record, replay, replay_or_record
+        path: Path of the cassette file
+        
+    Returns:
+        The new cassette
+    """
+    global llm_cassette
+    llm_cassette = Cassette(path, mode, response_model=Shipment)
+    return llm_cassette
+
+
+def get_request_fingerprint(chain, input_data: Dict[str, str]) -> str:
+    """
+    Computes the cassette fingerprint of a chain call.
+    
+    Args:
+        chain: The chain to use
+        input_data: The input data for the chain
+        
+    Returns:
+        A fingerprint covering prompt version, model configuration and input
+    """
+    key = key_of(chain)
+    context = key._asdict() if key else None
+    if context and context["output"] == "shipment":
+        # Keeps the fingerprints of cassettes recorded before patch chains existed
+        del context["output"]
+    return request_fingerprint(context, input_data)
+
+
+def get_response_model(chain):
+    """
+    Returns the structured output model of a chain.
+    
+    Args:
+        chain: The chain to use
+        
+    Returns:
+        The Pydantic model, Shipment for chains without a ChainKey
+    """
+    key = key_of(chain)
+    return OUTPUT_MODELS[key.output] if key else Shipment
+
+
+# Hedges slow LLM calls with a backup call, see HEDGE_ENABLED
+llm_hedger = Hedger()
+
+# Process-wide RPM/TPM and concurrency limit, shared by threads and async tasks
+llm_limiter = AdaptiveLimiter()
+
+# Fails fast while the Anthropic API is unhealthy, see build_degraded_response
+llm_breaker = CircuitBreaker()
+
+
+def estimate_request_tokens(input_data: Dict[str, str]) -> int:
+    """
+    Estimates the tokens a chain call is charged to the TPM bucket.
+    
+    Args:
+        input_data: The input data for the chain
+        
+    Returns:
+        The estimated tokens of prompt and input
+    """
+    return LIMITER_PROMPT_TOKENS + estimate_tokens(input_data.get("input", ""))
+
+
+def get_hedge_key(chain) -> str:
+    """
+    Returns the latency series used to decide when a call is hedged.
+    
+    Args:
+        chain: The chain to use
+        
+    Returns:
+        The model name of a chain with a ChainKey, "default" otherwise
+    """
+    key = key_of(chain)
+    return key.model if key else "default"
+
+
+def _record_retry(retry_state) -> None:
+    metrics.inc("shipmentbot_llm_retries_total", attempt=retry_state.attempt_number)
+
+
+# Retry policy for network issues, shared by the sync and async call paths
+RETRY_POLICY = dict(
     stop=stop_after_attempt(3),
     wait=wait_exponential(multiplier=1, min=2, max=10),
-    retry=retry_if_exception_type((TimeoutError, ConnectionError))
+    retry=retry_if_exception_type((TimeoutError, ConnectionError)) | retry_if_exception(is_overloaded_error),
+    before_sleep=_record_retry
 )
+
+
+@retry(**RETRY_POLICY)
 def invoke_chain_with_retry(chain, input_data: Dict[str, str]) -> Any:
     """
     Executes the chain call with retry logic.
@@ -147,73 +608,769 @@ def invoke_chain_with_retry(chain, input_data: Dict[str, str]) -> Any:
     Raises:
         Various exceptions based on the chain execution
     """
-    return chain.invoke(input_data)
+    # Each attempt (and each hedge) passes the limiter, the cassette only sees the winning response
+    tokens = estimate_request_tokens(input_data)
+    
+    def live_call():
+        return llm_hedger.call(
+            lambda: llm_limiter.call(lambda: chain.invoke(input_data), tokens),
+            get_hedge_key(chain)
+        )
+    
+    if not llm_cassette.enabled:
+        return live_call()
+    return llm_cassette.call(get_request_fingerprint(chain, input_data), live_call, get_response_model(chain))
+
+
+@retry(**RETRY_POLICY)
+async def ainvoke_chain_with_retry(chain, input_data: Dict[str, str]) -> Any:
+    """
+    Executes the chain call asynchronously with retry logic.
+    
+    Args:
+        chain: The chain to use
+        input_data: The input data for the chain
+        
+    Returns:
+        The result of the chain execution
+        
+    Raises:
+        Various exceptions based on the chain execution
+    """
+    # Each attempt (and each hedge) passes the limiter, the cassette only sees the winning response
+    tokens = estimate_request_tokens(input_data)
+    
+    def live_call():
+        return llm_hedger.acall(
+            lambda: llm_limiter.acall(lambda: chain.ainvoke(input_data), tokens),
+            get_hedge_key(chain)
+        )
+    
+    if not llm_cassette.enabled:
+        return await live_call()
+    return await llm_cassette.acall(get_request_fingerprint(chain, input_data), live_call, get_response_model(chain))
 
 
-def extract_shipment_data(chain, input_text: str) -> Dict[str, Any]:
+@retry(**RETRY_POLICY)
+def stream_chain_with_retry(chain, input_data: Dict[str, str], emitter: ItemEmitter) -> Any:
+    """
+    Executes the chain call as a stream and emits each item once it is complete.
+    Streamed calls pass the limiter but are not hedged, a second stream
+    would emit the items twice. A retried attempt first sends a reset event.
+    
+    Args:
+        chain: The chain to use
+        input_data: The input data for the chain
+        emitter: Receives the partial results
+        
+    Returns:
+        The final result of the chain execution
+        
+    Raises:
+        ValueError: If the stream ends without a result
+    """
+    def stream():
+        # Each attempt streams the response again, the items of a failed attempt are discarded
+        emitter.reset()
+        result = None
+        for partial in chain.stream(input_data):
+            if partial is not None:
+                result = partial
+                emitter.feed(partial)
+        if result is None:
+            raise ValueError("The streamed response contained no shipment")
+        return result
+    
+    return llm_limiter.call(stream, estimate_request_tokens(input_data))
+
+
+@retry(**RETRY_POLICY)
+async def astream_chain_with_retry(chain, input_data: Dict[str, str], emitter: ItemEmitter) -> Any:
+    """
+    Async variant of stream_chain_with_retry.
+    
+    Args:
+        chain: The chain to use
+        input_data: The input data for the chain
+        emitter: Receives the partial results
+        
+    Returns:
+        The final result of the chain execution
+        
+    Raises:
+        ValueError: If the stream ends without a result
+    """
+    async def stream():
+        # Each attempt streams the response again, the items of a failed attempt are discarded
+        emitter.reset()
+        result = None
+        async for partial in chain.astream(input_data):
+            if partial is not None:
+                result = partial
+                emitter.feed(partial)
+        if result is None:
+            raise ValueError("The streamed response contained no shipment")
+        return result
+    
+    return await llm_limiter.acall(stream, estimate_request_tokens(input_data))
+
+
+def build_extraction_response(result: Any) -> Dict[str, Any]:
+    """
+    Converts the structured output of the chain into a state update.
+    
+    Args:
+        result: The Shipment returned by the chain
+        
+    Returns:
+        A dictionary with extracted data and the message from the LLM
+    """
+    # Extract the message from the result
+    message = result.message if hasattr(result, "message") else None
+    
+    # Convert to dictionary for further processing
+    extracted_data = result.model_dump()
+    
+    # Successful extraction - we leave validation to the LLM
+    # and take the message directly from the LLM
+    return {
+        "extracted_data": extracted_data,
+        "message": message or "Extraction successful."
+    }
+
+
+def build_extraction_error_response(error: Exception) -> Dict[str, Any]:
+    """
+    Maps an exception raised during extraction to an error response.
+    
+    Args:
+        error: The exception raised by the chain call
+        
+    Returns:
+        A dictionary with extracted_data=None and an error message
+    """
+    if isinstance(error, (ValueError, TypeError)):
+        return create_error_response("format_error", str(error))
+    if isinstance(error, KeyError):
+        return create_error_response("format_error", f"Missing value for {error}")
+    if isinstance(error, TimeoutError):
+        return create_error_response("extraction_error", "Request timeout")
+    if isinstance(error, ConnectionError):
+        return create_error_response("extraction_error", "Connection error during API call")
+    return create_error_response("unknown_error", str(error))
+
+
+def extract_shipment_data(chain, input_text: str, emitter: Optional[ItemEmitter] = None) -> Dict[str, Any]:
     """
     Performs the actual extraction and handles errors.
     
     Args:
         chain: The chain to use
         input_text: The text to extract from
+        emitter: Receives the items while they are generated, None disables streaming
         
     Returns:
         A dictionary with extracted data or error messages
     """
     try:
-        # Execute the chain with retries for network issues
-        result = invoke_chain_with_retry(chain, {"input": input_text})
+        # Execute the chain with retries for network issues, recorded/replayed calls are not streamed
+        with metrics.span("llm_call"):
+            if emitter is not None and not llm_cassette.enabled:
+                result = llm_breaker.call(lambda: stream_chain_with_retry(chain, {"input": input_text}, emitter))
+            else:
+                result = llm_breaker.call(lambda: invoke_chain_with_retry(chain, {"input": input_text}))
+        with metrics.span("model_dump"):
+            return build_extraction_response(result)
+    except (CassetteMissError, CircuitOpenError):
+        # Replay runs must fail loudly, an open breaker is answered with a degraded result
+        raise
+    except Exception as e:
+        return build_extraction_error_response(e)
+
+
+async def aextract_shipment_data(chain, input_text: str, emitter: Optional[ItemEmitter] = None) -> Dict[str, Any]:
+    """
+    Performs the actual extraction asynchronously and handles errors.
+    
+    Args:
+        chain: The chain to use
+        input_text: The text to extract from
+        emitter: Receives the items while they are generated, None disables streaming
         
-        # Extract the message from the result
-        message = result.message if hasattr(result, "message") else None
+    Returns:
+        A dictionary with extracted data or error messages
+    """
+    try:
+        # Execute the chain with retries for network issues, recorded/replayed calls are not streamed
+        with metrics.span("llm_call"):
+            if emitter is not None and not llm_cassette.enabled:
+                result = await llm_breaker.acall(lambda: astream_chain_with_retry(chain, {"input": input_text}, emitter))
+            else:
+                result = await llm_breaker.acall(lambda: ainvoke_chain_with_retry(chain, {"input": input_text}))
+        with metrics.span("model_dump"):
+            return build_extraction_response(result)
+    except (CassetteMissError, CircuitOpenError):
+        # Replay runs must fail loudly, an open breaker is answered with a degraded result
+        raise
+    except Exception as e:
+        return build_extraction_error_response(e)
+
+
+def current_prompt_version(prompt_template) -> str:
+    """
+    Returns the version of the prompt used for the current request.
+    
+    Args:
+        prompt_template: The prompt returned by load_prompt
         
-        # Convert to dictionary for further processing
-        extracted_data = result.model_dump()
+    Returns:
+        The version reported by the prompt registry or a fingerprint of the prompt
+    """
+    return prompt_registry.get_version(DEFAULT_PROMPT_NAME) or prompt_fingerprint(prompt_template)
+
+
+def resolve_tier(state: Dict[str, Any]) -> ModelTier:
+    """
+    Returns the model tier selected by the router for the current request.
+    
+    Args:
+        state: The current state, possibly with model_tier
         
-        # Successful extraction - we leave validation to the LLM
-        # and take the message directly from the LLM
-        return {
-            "extracted_data": extracted_data,
-            "message": message or "Extraction successful."
-        }
+    Returns:
+        The ModelTier, the default tier if the state has no (known) tier
+    """
+    return MODEL_TIERS.get(state.get("model_tier") or DEFAULT_TIER, MODEL_TIERS[DEFAULT_TIER])
+
+
+def get_request_chain(prompt_template, tier: Optional[ModelTier] = None, output: str = "shipment"):
+    """
+    Returns the pooled extraction chain for the current prompt version.
+    
+    Args:
+        prompt_template: The prompt returned by load_prompt
+        tier: The model tier to use, the default tier if None
+        output: Structured output of the chain, a key of OUTPUT_MODELS
+        
+    Returns:
+        A chain for structured extraction
+    """
+    tier = tier or MODEL_TIERS[DEFAULT_TIER]
+    return get_extraction_chain(
+        prompt_template,
+        current_prompt_version(prompt_template),
+        model=tier.model,
+        max_tokens=tier.max_tokens,
+        timeout=tier.timeout,
+        output=output
+    )
+
+
+def _record_tier_latency(tier: ModelTier, started: float) -> None:
+    metrics.observe(
+        "shipmentbot_model_tier_duration_seconds",
+        time.perf_counter() - started,
+        tier=tier.name,
+        model=tier.model
+    )
+
+
+def extract_with_tier(prompt_template, input_text: str, tier: ModelTier,
+                      emitter: Optional[ItemEmitter] = None) -> Dict[str, Any]:
+    """
+    Extracts with the chain of a model tier, escalating to the large tier
+    if the small one returns an invalid or empty Shipment.
+    
+    Args:
+        prompt_template: The prompt returned by load_prompt
+        input_text: The text to extract from
+        tier: The model tier selected by the router
+        emitter: Receives the items while they are generated, None disables streaming
+        
+    Returns:
+        A dictionary with extracted data or error messages
+    """
+    with metrics.span("chain_build"):
+        chain = get_request_chain(prompt_template, tier)
+    started = time.perf_counter()
+    try:
+        response = extract_shipment_data(chain, input_text, emitter)
+    finally:
+        _record_tier_latency(tier, started)
+    
+    if tier.name == LARGE_TIER.name or not needs_escalation(response):
+        return response
+    metrics.inc("shipmentbot_model_escalations_total", from_tier=tier.name, to_tier=LARGE_TIER.name)
+    if emitter is not None:
+        emitter.reset()
+    return extract_with_tier(prompt_template, input_text, LARGE_TIER, emitter)
+
+
+async def aextract_with_tier(prompt_template, input_text: str, tier: ModelTier,
+                       emitter: Optional[ItemEmitter] = None) -> Dict[str, Any]:
+    """
+    Async variant of extract_with_tier.
+    
+    Args:
+        prompt_template: The prompt returned by load_prompt
+        input_text: The text to extract from
+        tier: The model tier selected by the router
+        emitter: Receives the items while they are generated, None disables streaming
+        
+    Returns:
+        A dictionary with extracted data or error messages
+    """
+    with metrics.span("chain_build"):
+        chain = get_request_chain(prompt_template, tier)
+    started = time.perf_counter()
+    try:
+        response = await aextract_shipment_data(chain, input_text, emitter)
+    finally:
+        _record_tier_latency(tier, started)
+    
+    if tier.name == LARGE_TIER.name or not needs_escalation(response):
+        return response
+    metrics.inc("shipmentbot_model_escalations_total", from_tier=tier.name, to_tier=LARGE_TIER.name)
+    if emitter is not None:
+        emitter.reset()
+    return await aextract_with_tier(prompt_template, input_text, LARGE_TIER, emitter)
+
+
+def build_patch_response(previous: Dict[str, Any], patch: Any) -> Optional[Dict[str, Any]]:
+    """
+    Applies the patch returned by the LLM to the previous extraction.
+    
+    Args:
+        previous: The extracted_data of the previous turn
+        patch: The ShipmentPatch returned by the chain
+        
+    Returns:
+        A dictionary with the updated extracted data, None if the patch is invalid
+        or marks a new inquiry
+    """
+    try:
+        shipment = apply_shipment_patch(previous, patch)
     except ValueError as e:
-        return create_error_response("format_error", str(e))
-    except TypeError as e:
-        return create_error_response("format_error", str(e))
-    except KeyError as e:
-        return create_error_response("format_error", f"Missing value for {e}")
-    except TimeoutError:
-        return create_error_response("extraction_error", "Request timeout")
-    except ConnectionError:
-        return create_error_response("extraction_error", "Connection error during API call")
+        print(f"Patch could not be applied, extracting the full shipment: {e}")
+        metrics.inc("shipmentbot_patch_total", result="new_inquiry" if patch.new_inquiry else "invalid")
+        return None
+    metrics.inc("shipmentbot_patch_total", result="applied")
+    return build_extraction_response(shipment)
+
+
+def patch_with_tier(prompt_template, previous: Dict[str, Any], patch_input: str, tier: ModelTier) -> Optional[Dict[str, Any]]:
+    """
+    Extracts only the changes of a follow-up message and applies them locally.
+    
+    Args:
+        prompt_template: The prompt returned by load_prompt
+        previous: The extracted_data of the previous turn
+        patch_input: The input built by build_patch_input
+        tier: The model tier selected by the router
+        
+    Returns:
+        A dictionary with the patched extracted data, None if the patch failed, is invalid
+        or marks a new inquiry
+    """
+    with metrics.span("chain_build"):
+        chain = get_request_chain(prompt_template, tier, output="patch")
+    started = time.perf_counter()
+    try:
+        with metrics.span("llm_call"):
+            patch = llm_breaker.call(lambda: invoke_chain_with_retry(chain, {"input": patch_input}))
+    except (CassetteMissError, CircuitOpenError):
+        raise
     except Exception as e:
-        return create_error_response("unknown_error", str(e))
+        # The full extraction is tried instead, like for an invalid patch
+        print(f"Patch extraction failed, extracting the full shipment: {e}")
+        metrics.inc("shipmentbot_patch_total", result="error")
+        return None
+    finally:
+        _record_tier_latency(tier, started)
+    return build_patch_response(previous, patch)
+
+
+async def apatch_with_tier(prompt_template, previous: Dict[str, Any], patch_input: str, tier: ModelTier) -> Optional[Dict[str, Any]]:
+    """
+    Async variant of patch_with_tier.
+    
+    Args:
+        prompt_template: The prompt returned by load_prompt
+        previous: The extracted_data of the previous turn
+        patch_input: The input built by build_patch_input
+        tier: The model tier selected by the router
+        
+    Returns:
+        A dictionary with the patched extracted data, None if the patch failed, is invalid
+        or marks a new inquiry
+    """
+    with metrics.span("chain_build"):
+        chain = get_request_chain(prompt_template, tier, output="patch")
+    started = time.perf_counter()
+    try:
+        with metrics.span("llm_call"):
+            patch = await llm_breaker.acall(lambda: ainvoke_chain_with_retry(chain, {"input": patch_input}))
+    except (CassetteMissError, CircuitOpenError):
+        raise
+    except Exception as e:
+        # The full extraction is tried instead, like for an invalid patch
+        print(f"Patch extraction failed, extracting the full shipment: {e}")
+        metrics.inc("shipmentbot_patch_total", result="error")
+        return None
+    finally:
+        _record_tier_latency(tier, started)
+    return build_patch_response(previous, patch)
+
+
+def build_batch_response(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Converts a message batch result into the response of extract_shipment_data.
+    
+    Args:
+        result: The result of one batch request, see MessageBatchClient.results
+        
+    Returns:
+        A dictionary with extracted data or error messages
+    """
+    if result.get("type") != "succeeded":
+        error = ((result.get("error") or {}).get("error") or {}).get("message")
+        details = f"Batch request {result.get('type')}" + (f": {error}" if error else "")
+        return create_error_response("extraction_error", details)
+    
+    message = result["message"]
+    usage = message.get("usage") or {}
+    model = message.get("model", "")
+    metrics.observe("shipmentbot_llm_input_tokens", _usage_value(usage, "input_tokens"), buckets=TOKEN_BUCKETS, model=model)
+    metrics.observe("shipmentbot_llm_output_tokens", _usage_value(usage, "output_tokens"), buckets=TOKEN_BUCKETS, model=model)
+    metrics.observe("shipmentbot_llm_cache_read_tokens", _usage_value(usage, "cache_read_input_tokens"), buckets=TOKEN_BUCKETS, model=model)
+    metrics.observe("shipmentbot_llm_cache_write_tokens", _usage_value(usage, "cache_creation_input_tokens"), buckets=TOKEN_BUCKETS, model=model)
+    
+    tool_input = next(
+        (block.get("input") for block in message.get("content") or []
+         if block.get("type") == "tool_use" and block.get("name") == Shipment.__name__),
+        None
+    )
+    if tool_input is None:
+        return create_error_response("format_error", "The batch result contains no Shipment")
+    try:
+        return build_extraction_response(Shipment.model_validate(tool_input))
+    except Exception as e:
+        return build_extraction_error_response(e)
+
 
+# Process-wide cache for extraction results, hits bypass the LLM entirely
+result_cache = ResultCache()
 
-def process_shipment(state: Dict[str, Any]) -> Dict[str, Any]:
+
+def get_result_cache_key(input_text: str, prompt_template, tier: Optional[ModelTier] = None) -> str:
+    """
+    Builds the result cache key for a request.
+    
+    Args:
+        input_text: The text to extract from
+        prompt_template: The prompt returned by load_prompt
+        tier: The model tier selected by the router, the default tier if None
+        
+    Returns:
+        The content-addressed cache key
+    """
+    tier = tier or MODEL_TIERS[DEFAULT_TIER]
+    return build_cache_key(
+        input_text,
+        current_prompt_version(prompt_template),
+        model=tier.model,
+        temperature=LLM_TEMPERATURE,
+        max_tokens=tier.max_tokens
+    )
+
+
+def get_cached_result(cache_key: str) -> Optional[Dict[str, Any]]:
+    """
+    Looks up a previous extraction result.
+    
+    Args:
+        cache_key: The key from get_result_cache_key
+        
+    Returns:
+        The cached response or None on a miss
+    """
+    if not RESULT_CACHE_ENABLED:
+        return None
+    try:
+        cached = result_cache.get(cache_key)
+    except Exception as e:
+        print(f"Result cache lookup failed: {e}")
+        return None
+    if cached is None:
+        return None
+    
+    # Re-validate so that the types (e.g. LoadCarrierType) match a fresh extraction
+    return {
+        "extracted_data": Shipment.model_validate(cached["extracted_data"]).model_dump(),
+        "message": cached["message"]
+    }
+
+
+def store_result(cache_key: str, response: Dict[str, Any]) -> None:
+    """
+    Stores a successful extraction result in the cache.
+    
+    Args:
+        cache_key: The key from get_result_cache_key
+        response: The response returned by extract_shipment_data
+    """
+    if not RESULT_CACHE_ENABLED or response.get("extracted_data") is None:
+        return
+    try:
+        result_cache.set(cache_key, response)
+    except Exception as e:
+        print(f"Result could not be cached: {e}")
+
+
+# Process-wide near-duplicate index, maps similar inputs to the result cache key of their extraction
+near_duplicate_index = NearDuplicateIndex()
+
+
+def get_near_duplicate_scope(prompt_template, tier: Optional[ModelTier] = None) -> str:
+    """
+    Returns the scope of near-duplicate lookups, results are only reused
+    for the same prompt version and model configuration.
+    
+    Args:
+        prompt_template: The prompt returned by load_prompt
+        tier: The model tier selected by the router, the default tier if None
+        
+    Returns:
+        The scope passed to the near-duplicate index
+    """
+    tier = tier or MODEL_TIERS[DEFAULT_TIER]
+    return f"{current_prompt_version(prompt_template)}:{tier.model}:{tier.max_tokens}"
+
+
+def lookup_near_duplicate(input_text: str, prompt_template, tier: Optional[ModelTier],
+                          cache_key: str) -> Tuple[Optional[Fingerprint], Optional[Dict[str, Any]]]:
+    """
+    Looks up the result of a near-identical inquiry with the same numeric tokens.
+    
+    Args:
+        input_text: The text to extract from
+        prompt_template: The prompt returned by load_prompt
+        tier: The model tier selected by the router, the default tier if None
+        cache_key: The exact result cache key of input_text
+        
+    Returns:
+        The fingerprint of input_text (None if disabled) and the reused response or None
+    """
+    if not NEAR_DUPLICATE_ENABLED or not RESULT_CACHE_ENABLED:
+        return None, None
+    with metrics.span("near_duplicate"):
+        fingerprint = near_duplicate_index.fingerprint(input_text)
+        key = near_duplicate_index.find(fingerprint, get_near_duplicate_scope(prompt_template, tier))
+        cached = get_cached_result(key) if key is not None else None
+    if cached is not None:
+        # Repeats of this variant are answered by the exact cache
+        store_result(cache_key, cached)
+    return fingerprint, cached
+
+
+def remember_near_duplicate(fingerprint: Optional[Fingerprint], cache_key: str, response: Dict[str, Any],
+                            prompt_template, tier: Optional[ModelTier] = None) -> None:
+    """
+    Adds a new extraction to the near-duplicate index.
+    
+    Args:
+        fingerprint: The fingerprint returned by lookup_near_duplicate, None skips the index
+        cache_key: The result cache key the response was stored under
+        response: The response returned by extract_shipment_data
+        prompt_template: The prompt returned by load_prompt
+        tier: The model tier selected by the router, the default tier if None
+    """
+    if fingerprint is None or response.get("extracted_data") is None:
+        return
+    near_duplicate_index.add(fingerprint, cache_key, get_near_duplicate_scope(prompt_template, tier))
+
+
+def build_degraded_response(input_text: str, prompt_template,
+                            previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Creates a result without the LLM while the circuit breaker is open.
+    A cached result of any model tier is preferred. A follow-up keeps the
+    previous extraction, otherwise the rule-based extractor is used even
+    below its confidence threshold.
+    
+    Args:
+        input_text: The extraction input of the turn, with the previous extraction for follow-ups
+        prompt_template: The prompt returned by load_prompt
+        previous: The extracted_data of the previous turn for follow-ups, None otherwise
+        
+    Returns:
+        A response flagged with degraded=True, so that it can be re-queued
+    """
+    for tier in MODEL_TIERS.values():
+        cached = get_cached_result(get_result_cache_key(input_text, prompt_template, tier))
+        if cached is not None:
+            metrics.inc("shipmentbot_degraded_total", source="result_cache")
+            return {**cached, "degraded": True}
+    
+    if previous is not None:
+        # The rules only see a correction like "actually 4 pallets" and would replace the whole shipment
+        metrics.inc("shipmentbot_degraded_total", source="previous")
+        return {
+            "extracted_data": previous,
+            "message": ERROR_MESSAGES["degraded_follow_up"],
+            "degraded": True
+        }
+    
+    rules = extract_with_rules(input_text)
+    if rules.shipment is not None:
+        metrics.inc("shipmentbot_degraded_total", source="rules")
+        return {
+            "extracted_data": rules.shipment.model_dump(),
+            "message": ERROR_MESSAGES["degraded"],
+            "degraded": True
+        }
+    
+    metrics.inc("shipmentbot_degraded_total", source="none")
+    response = create_error_response("extraction_error", "Claude is unavailable (circuit breaker open)")
+    response["degraded"] = True
+    return response
+
+
+def process_shipment(state: Dict[str, Any], config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
     Performs a precise extraction of shipment data.
     Uses the Pydantic model for structured output.
     
     Args:
         state: The current state with messages, extracted_data and message
+        config: The graph config, configurable.priority selects the scheduling class,
+            configurable.stream_items emits the items to the custom stream while they are generated
         
     Returns:
         An updated state with extracted data and/or error messages
     """
     try:
-        messages = state["messages"]
-        input_text = messages[-1]
+        input_text = get_latest_input(state)
+        # Follow-ups send the previous Shipment plus the new message, in patch mode only its changes are returned
+        patch_mode = uses_patch_mode(state)
+        if patch_mode:
+            extraction_input = build_patch_input(state["last_shipment"], input_text, state.get("history_summary"))
+        else:
+            extraction_input = get_extraction_input(state)
         
         # Load prompt from LangSmith or local file
-        prompt_template = load_prompt(DEFAULT_PROMPT_NAME)
+        with metrics.span("prompt_load"):
+            prompt_template = load_prompt(DEFAULT_PROMPT_NAME)
         if prompt_template is None:
             return create_error_response("prompt_not_found")
         
-        # Create and execute chain
-        chain = create_extraction_chain(prompt_template)
-        return extract_shipment_data(chain, input_text)
+        # Identical inquiries are answered from the result cache
+        tier = resolve_tier(state)
+        with metrics.span("result_cache"):
+            cache_key = get_result_cache_key(extraction_input, prompt_template, tier)
+            cached = get_cached_result(cache_key)
+        metrics.inc("shipmentbot_result_cache_total", result="hit" if cached is not None else "miss")
+        # Near-identical inquiries (other greeting, reference number, ...) reuse that result, follow-ups never do
+        fingerprint = None
+        if cached is None and not state.get("follow_up"):
+            fingerprint, cached = lookup_near_duplicate(extraction_input, prompt_template, tier, cache_key)
+        emitter = create_item_emitter(config, state.get("segment_index"))
+        if cached is not None:
+            if emitter is not None:
+                emitter.finish(cached["extracted_data"])
+            return cached
+        
+        # Interactive requests are admitted to the LLM ahead of bulk jobs
+        with priority_scope(get_priority_from_config(config)):
+            response = None
+            if patch_mode:
+                response = patch_with_tier(prompt_template, state["last_shipment"], extraction_input, tier)
+            if response is None:
+                response = extract_with_tier(prompt_template, get_extraction_input(state), tier, emitter)
+        if emitter is not None and response.get("extracted_data") is not None:
+            emitter.finish(response["extracted_data"])
+        store_result(cache_key, response)
+        remember_near_duplicate(fingerprint, cache_key, response, prompt_template, tier)
+        return response
+    except CircuitOpenError:
+        return build_degraded_response(
+            extraction_input, prompt_template, state.get("last_shipment") if state.get("follow_up") else None
+        )
+    except CassetteMissError:
+        raise
     except Exception as e:
         # General fallback for unexpected errors
-        return create_error_response("unknown_error", str(e)) 
\ No newline at end of file
+        return create_error_response("unknown_error", str(e))
+
+
+async def aprocess_shipment(state: Dict[str, Any], config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Async variant of process_shipment used by graph.ainvoke and graph.astream.
+    The LLM call is awaited natively, only the very first prompt load
+    (before the registry is warm) runs in a worker thread.
+    
+    Args:
+        state: The current state with messages, extracted_data and message
+        config: The graph config, configurable.priority selects the scheduling class,
+            configurable.stream_items emits the items to the custom stream while they are generated
+        
+    Returns:
+        An updated state with extracted data and/or error messages
+    """
+    try:
+        input_text = get_latest_input(state)
+        # Follow-ups send the previous Shipment plus the new message, in patch mode only its changes are returned
+        patch_mode = uses_patch_mode(state)
+        if patch_mode:
+            extraction_input = build_patch_input(state["last_shipment"], input_text, state.get("history_summary"))
+        else:
+            extraction_input = get_extraction_input(state)
+        
+        # Load prompt from the registry, a cold registry would block the event loop
+        with metrics.span("prompt_load"):
+            if prompt_registry.get_version(DEFAULT_PROMPT_NAME) is None:
+                prompt_template = await asyncio.to_thread(load_prompt, DEFAULT_PROMPT_NAME)
+            else:
+                prompt_template = load_prompt(DEFAULT_PROMPT_NAME)
+        if prompt_template is None:
+            return create_error_response("prompt_not_found")
+        
+        # Identical inquiries are answered from the result cache
+        tier = resolve_tier(state)
+        with metrics.span("result_cache"):
+            cache_key = get_result_cache_key(extraction_input, prompt_template, tier)
+            cached = get_cached_result(cache_key)
+        metrics.inc("shipmentbot_result_cache_total", result="hit" if cached is not None else "miss")
+        # Near-identical inquiries (other greeting, reference number, ...) reuse that result, follow-ups never do
+        fingerprint = None
+        if cached is None and not state.get("follow_up"):
+            # The MinHash signature is CPU-bound, it must not block the event loop
+            fingerprint, cached = await asyncio.to_thread(
+                lookup_near_duplicate, extraction_input, prompt_template, tier, cache_key
+            )
+        emitter = create_item_emitter(config, state.get("segment_index"))
+        if cached is not None:
+            if emitter is not None:
+                emitter.finish(cached["extracted_data"])
+            return cached
+        
+        # Interactive requests are admitted to the LLM ahead of bulk jobs
+        with priority_scope(get_priority_from_config(config)):
+            response = None
+            if patch_mode:
+                response = await apatch_with_tier(prompt_template, state["last_shipment"], extraction_input, tier)
+            if response is None:
+                response = await aextract_with_tier(prompt_template, get_extraction_input(state), tier, emitter)
+        if emitter is not None and response.get("extracted_data") is not None:
+            emitter.finish(response["extracted_data"])
+        store_result(cache_key, response)
+        remember_near_duplicate(fingerprint, cache_key, response, prompt_template, tier)
+        return response
+    except CircuitOpenError:
+        return build_degraded_response(
+            extraction_input, prompt_template, state.get("last_shipment") if state.get("follow_up") else None
+        )
+    except CassetteMissError:
+        raise
+    except Exception as e:
+        # General fallback for unexpected errors
+        return create_error_response("unknown_error", str(e))
@@ -0,0 +1,112 @@
+"""
+Shipment patcher for follow-up messages.
+
+Instead of re-extracting the whole shipment for a correction like "actually
+4 pallets", the LLM returns a ShipmentPatch that adds, updates or removes
+items by index. The patch is applied locally to the previous extraction and
+the result is validated against the Shipment model, so output tokens scale
+with the size of the change. An invalid patch, or one that marks the message
+as a new inquiry, raises ValueError and the caller falls back to a full
+follow-up extraction.
+"""
+import json
+from typing import Any, Dict, List, Optional
+
+from pydantic import ValidationError
+
+from graph.config import FOLLOW_UP_MODE
+from graph.models.shipment_models import Shipment, ShipmentItem, ShipmentPatch, ItemOperation
+from graph.nodes.conversation_history import format_history_summary
+
+
+def uses_patch_mode(state: Dict[str, Any]) -> bool:
+    """
+    Returns True if the current turn is extracted as a patch.
+
+    Args:
+        state: The current state with follow_up and last_shipment
+
+    Returns:
+        True for follow-ups with a previous extraction if FOLLOW_UP_MODE is "patch"
+    """
+    return FOLLOW_UP_MODE == "patch" and bool(state.get("follow_up")) and bool(state.get("last_shipment"))
+
+
+def build_patch_input(previous: Dict[str, Any], message: str, summary: Optional[str] = None) -> str:
+    """
+    Builds the extraction input for a patch of the previous extraction.
+
+    Args:
+        previous: The extracted_data of the previous turn
+        message: The new message
+        summary: The history_summary of the thread
+
+    Returns:
+        The numbered items of the previous Shipment and the summary, followed by the new message
+    """
+    shipment = Shipment.model_validate(previous)
+    lines = [
+        f"{index}: {json.dumps(item.model_dump(mode='json', exclude_none=True), ensure_ascii=False, separators=(',', ':'))}"
+        for index, item in enumerate(shipment.items or [])
+    ]
+    notes = shipment.shipment_notes or "-"
+    return (
+        "Previous extraction, items by 0-based index:\n"
+        + ("\n".join(lines) or "(no items)")
+        + f"\nShipment notes: {notes}\n\n"
+        + format_history_summary(summary)
+        + "New message. Return only the changes it makes to the previous extraction: "
+        "add new items, update existing items by index with only the changed fields "
+        "(set a field to null to clear it), remove items by index. Leave shipment_notes "
+        "empty if they are unchanged. If the message describes a new, unrelated shipment, "
+        "set new_inquiry and return no changes:\n"
+        f"{message}"
+    )
+
+
+def apply_shipment_patch(previous: Dict[str, Any], patch: ShipmentPatch) -> Shipment:
+    """
+    Applies a patch to the previous extraction.
+    Indices refer to the previous items: updates are applied first, then
+    removals, and new items are appended at the end. Updates only change the
+    fields the LLM returned, an explicit null clears a field.
+
+    Args:
+        previous: The extracted_data of the previous turn
+        patch: The patch returned by the LLM
+
+    Returns:
+        The updated and validated Shipment
+
+    Raises:
+        ValueError: If the message is a new inquiry, an index is missing or out of range,
+            or the result is invalid
+    """
+    if patch.new_inquiry:
+        raise ValueError("The message describes a new inquiry")
+    items: List[Dict[str, Any]] = [
+        item.model_dump() for item in Shipment.model_validate(previous).items or []
+    ]
+    removed, added = set(), []
+    for change in patch.item_changes or []:
+        if change.operation == ItemOperation.ADD:
+            if change.item is None:
+                raise ValueError("Patch adds an item without fields")
+            added.append(change.item.model_dump())
+            continue
+        if change.index is None or not 0 <= change.index < len(items):
+            raise ValueError(f"Patch refers to unknown item index {change.index}")
+        if change.operation == ItemOperation.REMOVE:
+            removed.add(change.index)
+        elif change.item is not None:
+            items[change.index].update(change.item.model_dump(exclude_unset=True))
+
+    try:
+        return Shipment(
+            items=[ShipmentItem.model_validate(item) for index, item in enumerate(items) if index not in removed]
+            + [ShipmentItem.model_validate(item) for item in added],
+            shipment_notes=patch.shipment_notes or previous.get("shipment_notes"),
+            message=patch.message
+        )
+    except ValidationError as e:
+        raise ValueError(f"Patched shipment is invalid: {e}") from e
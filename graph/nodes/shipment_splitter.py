@@ -0,0 +1,238 @@
+"""
+Shipment splitter nodes for LangGraph.
+
+These nodes detect independent shipment segments in one inquiry (e.g. several
+"Laderaumbedarf" blocks or bullet lists), fan them out to concurrent extractor
+invocations via LangGraph's Send API and merge the resulting items back into
+one Shipment in the original segment order.
+"""
+import re
+from typing import Any, Dict, List, Optional, Union
+
+from langgraph.types import Send
+
+from graph.models.shipment_models import Shipment
+from graph.config import SPLIT_ENABLED, SPLIT_MAX_SEGMENTS
+from graph.nodes.fast_extractor import fast_extract
+from graph.nodes.input_compactor import get_latest_input
+from graph.nodes.model_router import route_model
+from graph.nodes.shipment_extractor import process_shipment, aprocess_shipment
+
+# Labels that start a new shipment block, e.g. "Laderaumbedarf:", "Box 2 -", "Pos. 3"
+_BLOCK_LABEL_PATTERN = re.compile(
+    r"\b(laderaumbedarf|sendung\s+\d+|position\s+\d+|pos\.?\s*\d+|box\s+\d+|item\s+\d+|colli\s+\d+)\s*[:\-–]",
+    re.IGNORECASE
+)
+
+# Bullet or numbered list lines
+_BULLET_PATTERN = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+(.*\S)", re.MULTILINE)
+
+_DIGIT_PATTERN = re.compile(r"\d")
+
+
+def reduce_segment_results(current: Optional[List[Dict[str, Any]]], update: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Reducer for the segment results of parallel branches.
+    None resets the list, so results of a previous turn in the same thread are dropped.
+
+    Args:
+        current: The results collected so far
+        update: New results of one branch, or None to reset
+
+    Returns:
+        The combined list of segment results
+    """
+    if update is None:
+        return []
+    return (current or []) + list(update)
+
+
+def _split_by_labels(text: str) -> List[str]:
+    matches = list(_BLOCK_LABEL_PATTERN.finditer(text))
+    labels = {re.sub(r"\d+", "#", m.group(1).lower()) for m in matches}
+    if len(matches) < 2 or len(labels) != 1:
+        return []
+    # A preamble with numbers may describe items itself, splitting would lose them
+    if _DIGIT_PATTERN.search(text[:matches[0].start()]):
+        return []
+    bounds = [m.start() for m in matches] + [len(text)]
+    return [text[start:end].strip() for start, end in zip(bounds, bounds[1:])]
+
+
+def _split_by_bullets(text: str) -> List[str]:
+    bullets = list(_BULLET_PATTERN.finditer(text))
+    if len(bullets) < 2 or not all(_DIGIT_PATTERN.search(b.group(1)) for b in bullets):
+        return []
+    # Numbers outside the list may belong to the items, keep the inquiry in one piece
+    remainder = _BULLET_PATTERN.sub("", text)
+    if _DIGIT_PATTERN.search(remainder):
+        return []
+    return [b.group(1).strip() for b in bullets]
+
+
+def split_segments(text: str) -> List[str]:
+    """
+    Detects independent shipment segments in an inquiry.
+
+    Args:
+        text: The inquiry text
+
+    Returns:
+        The segments in their original order, a single-element list if the text is not split
+    """
+    segments = _split_by_labels(text) or _split_by_bullets(text)
+    if len(segments) < 2 or len(segments) > SPLIT_MAX_SEGMENTS:
+        return [text]
+    return segments
+
+
+def split_shipment(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Splits the latest message into segments.
+
+    Args:
+        state: The current state with messages
+
+    Returns:
+        An updated state with the segments and reset segment results
+    """
+    messages = state.get("messages") or []
+    if not SPLIT_ENABLED or not messages:
+        return {"segments": [], "segment_results": None}
+    segments = split_segments(get_latest_input(state))
+    return {"segments": segments if len(segments) > 1 else [], "segment_results": None}
+
+
+async def asplit_shipment(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Async variant of split_shipment, so that graph.ainvoke needs no thread hop.
+
+    Args:
+        state: The current state with messages
+
+    Returns:
+        An updated state with the segments and reset segment results
+    """
+    return split_shipment(state)
+
+
+def route_segments(state: Dict[str, Any]) -> Union[str, List[Send]]:
+    """
+    Fans out one extractor invocation per segment.
+
+    Args:
+        state: The state after split_shipment
+
+    Returns:
+        A list of Send objects for parallel extraction, or "model_router"
+    """
+    segments = state.get("segments") or []
+    if len(segments) < 2:
+        return "model_router"
+    return [
+        Send("segment_extractor", {"segment_index": index, "segment_text": segment})
+        for index, segment in enumerate(segments)
+    ]
+
+
+def _segment_state(segment_text: str, segment_index: int) -> Dict[str, Any]:
+    return {"messages": [segment_text], "extracted_data": None, "message": None, "segment_index": segment_index}
+
+
+def extract_segment(state: Dict[str, Any], config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Extracts a single segment, using the fast path first.
+    Segments the fast path cannot handle get their own model tier.
+
+    Args:
+        state: The Send payload with segment_index and segment_text
+        config: The graph config, passed on to the extractor
+
+    Returns:
+        An update that appends the segment result
+    """
+    segment_state = _segment_state(state["segment_text"], state["segment_index"])
+    result = fast_extract(segment_state)
+    if "extracted_data" not in result:
+        segment_state.update(result)
+        segment_state.update(route_model(segment_state))
+        result = process_shipment(segment_state, config)
+    return {"segment_results": [{"index": state["segment_index"], **result}]}
+
+
+async def aextract_segment(state: Dict[str, Any], config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Async variant of extract_segment.
+
+    Args:
+        state: The Send payload with segment_index and segment_text
+        config: The graph config, passed on to the extractor
+
+    Returns:
+        An update that appends the segment result
+    """
+    segment_state = _segment_state(state["segment_text"], state["segment_index"])
+    result = fast_extract(segment_state)
+    if "extracted_data" not in result:
+        segment_state.update(result)
+        segment_state.update(route_model(segment_state))
+        result = await aprocess_shipment(segment_state, config)
+    return {"segment_results": [{"index": state["segment_index"], **result}]}
+
+
+def merge_segments(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Merges the segment results into one Shipment in segment order.
+
+    Args:
+        state: The state with all segment results
+
+    Returns:
+        An updated state with the merged extracted data and message, marked
+        as partial with the indices of the failed segments if only some
+        segments could be extracted
+    """
+    results = sorted(state.get("segment_results") or [], key=lambda r: r["index"])
+    successful = [r for r in results if r.get("extracted_data") is not None]
+    if not successful:
+        message = results[0].get("message") if results else None
+        return {"extracted_data": None, "message": message, "degraded": any(r.get("degraded") for r in results)}
+    failed_segments = [r["index"] for r in results if r.get("extracted_data") is None]
+
+    items = []
+    notes = []
+    messages = []
+    for result in results:
+        data = result.get("extracted_data")
+        if data is None:
+            messages.append(f"Segment {result['index'] + 1}: {result.get('message')}")
+            continue
+        items.extend(data.get("items") or [])
+        if data.get("shipment_notes") and data["shipment_notes"] not in notes:
+            notes.append(data["shipment_notes"])
+        if result.get("message") and result["message"] not in messages:
+            messages.append(result["message"])
+
+    message = " ".join(messages) or "Extraction successful."
+    shipment = Shipment(items=items, shipment_notes=" ".join(notes) or None, message=message)
+    merged = {"extracted_data": shipment.model_dump(), "message": message}
+    if any(result.get("degraded") for result in results):
+        merged["degraded"] = True
+    if failed_segments:
+        # The items of the failed segments are missing from the shipment
+        merged["partial"] = True
+        merged["failed_segments"] = failed_segments
+    return merged
+
+
+async def amerge_segments(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Async variant of merge_segments.
+
+    Args:
+        state: The state with all segment results
+
+    Returns:
+        An updated state with the merged extracted data and message
+    """
+    return merge_segments(state)
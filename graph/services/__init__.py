@@ -0,0 +1,6 @@
+"""
+Shipmentbot Services Package.
+
+Dieses Paket enthält prozessweite Hilfsdienste (Caches, Pools, Limiter),
+die von den Knoten des LangGraph gemeinsam genutzt werden.
+"""
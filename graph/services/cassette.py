@@ -0,0 +1,193 @@
+"""
+LLM cassettes for Shipmentbot.
+
+This file provides a record/replay store for structured LLM responses. In
+record mode, request fingerprints and responses are appended to a JSON lines
+file. In replay mode, responses are served from that file without any network
+access, which makes regression runs over large corpora reproducible and fast.
+
+Modes:
+    off               Calls the LLM, nothing is recorded
+    record            Calls the LLM and records every response
+    replay            Serves recorded responses, a miss raises CassetteMissError
+    replay_or_record  Serves recorded responses, a miss calls the LLM and records it
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Type
+
+from pydantic import BaseModel
+
+CASSETTE_MODES = ("off", "record", "replay", "replay_or_record")
+
+
+class CassetteMissError(RuntimeError):
+    """Raised in strict replay mode when no response was recorded for a request."""
+
+
+def request_fingerprint(context: Any, input_data: Dict[str, Any]) -> str:
+    """
+    Computes the fingerprint of an LLM request.
+
+    Args:
+        context: Everything besides the input that determines the response (prompt version, model, ...)
+        input_data: The input variables of the chain
+
+    Returns:
+        A hex digest identifying the request
+    """
+    payload = json.dumps({"context": context, "input": input_data}, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """Thread-safe record/replay store backed by a JSON lines file."""
+
+    def __init__(self, path: str, mode: str = "off", response_model: Optional[Type[BaseModel]] = None):
+        """
+        Args:
+            path: Path of the JSON lines file
+            mode: One of CASSETTE_MODES
+            response_model: Pydantic model used to restore replayed responses
+        """
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Unknown cassette mode '{mode}', expected one of {CASSETTE_MODES}")
+        self.path = path
+        self.mode = mode
+        self._response_model = response_model
+        self._responses: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        self._stats = {"replays": 0, "misses": 0, "recordings": 0}
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the cassette takes part in LLM calls."""
+        return self.mode != "off"
+
+    def call(self, fingerprint: str, live_call: Callable[[], Any],
+             response_model: Optional[Type[BaseModel]] = None) -> Any:
+        """
+        Serves a request from the cassette or calls the LLM, depending on the mode.
+
+        Args:
+            fingerprint: The request fingerprint
+            live_call: Performs the real LLM call
+            response_model: Overrides the model used to restore a replayed response
+
+        Returns:
+            The recorded or live response
+
+        Raises:
+            CassetteMissError: In replay mode, if the request was not recorded
+        """
+        replayed = self.replay(fingerprint, response_model)
+        if replayed is not None:
+            return replayed
+        result = live_call()
+        self.record(fingerprint, result)
+        return result
+
+    async def acall(self, fingerprint: str, live_call: Callable[[], Any],
+                    response_model: Optional[Type[BaseModel]] = None) -> Any:
+        """
+        Async variant of call, live_call returns an awaitable.
+
+        Args:
+            fingerprint: The request fingerprint
+            live_call: Performs the real LLM call and returns an awaitable
+            response_model: Overrides the model used to restore a replayed response
+
+        Returns:
+            The recorded or live response
+
+        Raises:
+            CassetteMissError: In replay mode, if the request was not recorded
+        """
+        replayed = self.replay(fingerprint, response_model)
+        if replayed is not None:
+            return replayed
+        result = await live_call()
+        self.record(fingerprint, result)
+        return result
+
+    def replay(self, fingerprint: str, response_model: Optional[Type[BaseModel]] = None) -> Optional[Any]:
+        """
+        Looks up a recorded response.
+
+        Args:
+            fingerprint: The request fingerprint
+            response_model: Overrides the model used to restore the response
+
+        Returns:
+            The recorded response or None if the mode does not replay
+
+        Raises:
+            CassetteMissError: In replay mode, if the request was not recorded
+        """
+        if self.mode not in ("replay", "replay_or_record"):
+            return None
+        with self._lock:
+            payload = self._load().get(fingerprint)
+            if payload is None:
+                self._stats["misses"] += 1
+            else:
+                self._stats["replays"] += 1
+        if payload is None:
+            if self.mode == "replay":
+                raise CassetteMissError(f"No recorded LLM response for request {fingerprint[:12]} in '{self.path}'")
+            return None
+        response_model = response_model or self._response_model
+        if response_model is not None:
+            return response_model.model_validate(payload)
+        return payload
+
+    def record(self, fingerprint: str, result: Any) -> None:
+        """
+        Appends a response to the cassette file.
+
+        Args:
+            fingerprint: The request fingerprint
+            result: The LLM response (a Pydantic model or JSON-serializable value)
+        """
+        if self.mode not in ("record", "replay_or_record"):
+            return
+        payload = result.model_dump(mode="json") if isinstance(result, BaseModel) else result
+        line = json.dumps(
+            {"fingerprint": fingerprint, "recorded_at": round(time.time(), 3), "response": payload},
+            ensure_ascii=False
+        )
+        with self._lock:
+            self._load()[fingerprint] = payload
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self._stats["recordings"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns a snapshot of the cassette counters.
+
+        Returns:
+            A dictionary with replays, misses and recordings
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def _load(self) -> Dict[str, Any]:
+        # Read lazily on first use, later lines win over earlier recordings
+        if self._responses is None:
+            self._responses = {}
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue
+                        self._responses[record["fingerprint"]] = record["response"]
+        return self._responses
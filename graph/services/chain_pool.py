@@ -0,0 +1,157 @@
+"""
+Chain pool for Shipmentbot.
+
+This file provides a process-wide pool of LLM clients and compiled extraction
+chains. LLM clients are shared per model configuration, and all of them use
+the same Anthropic API clients, so that every model and timeout reuses one
+keep-alive HTTP connection pool. Chains are additionally keyed by the prompt
+version and are only rebuilt when the prompt registry reports a new version.
+Each chain carries its ChainKey in its config metadata, so the key is known
+even after the chain was evicted from the pool.
+"""
+import threading
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+# Metadata entry of a chain's config that holds its ChainKey
+CHAIN_KEY_METADATA = "chain_key"
+
+
+class LLMKey(NamedTuple):
+    """Configuration that identifies a shared LLM client."""
+    model: str
+    temperature: float
+    max_tokens: int
+    timeout: int
+
+
+class ChainKey(NamedTuple):
+    """Configuration that identifies a compiled extraction chain."""
+    prompt_version: str
+    model: str
+    temperature: float
+    max_tokens: int
+    timeout: int
+    output: str = "shipment"  # structured output of the chain, "shipment" or "patch"
+
+    def llm_key(self) -> LLMKey:
+        """Returns the key of the LLM client used by this chain."""
+        return LLMKey(self.model, self.temperature, self.max_tokens, self.timeout)
+
+
+def with_chain_key(chain: Any, key: ChainKey) -> Any:
+    """
+    Attaches the configuration of a chain to the chain itself.
+
+    Args:
+        chain: A runnable chain
+        key: The configuration the chain was built for
+
+    Returns:
+        The chain bound to a config whose metadata holds the key
+    """
+    return chain.with_config(metadata={CHAIN_KEY_METADATA: key._asdict()})
+
+
+def key_of(chain: Any) -> Optional[ChainKey]:
+    """
+    Returns the configuration a chain was built for.
+
+    Args:
+        chain: A chain returned by with_chain_key
+
+    Returns:
+        The ChainKey or None if the chain carries no key
+    """
+    config = getattr(chain, "config", None)
+    metadata = config.get("metadata") if isinstance(config, dict) else None
+    fields = metadata.get(CHAIN_KEY_METADATA) if isinstance(metadata, dict) else None
+    return ChainKey(**fields) if fields else None
+
+
+class ChainPool:
+    """Thread-safe pool of LLM clients and chains, each built only once."""
+
+    def __init__(self):
+        self._llms: Dict[LLMKey, Any] = {}
+        self._chains: Dict[ChainKey, Any] = {}
+        self._api_clients: Optional[Tuple[Any, Any]] = None
+        self._lock = threading.Lock()
+        self._stats = {"llm_builds": 0, "chain_builds": 0, "chain_hits": 0}
+
+    def get_api_clients(self, factory: Callable[[], Tuple[Any, Any]]) -> Tuple[Any, Any]:
+        """
+        Returns the sync and async API clients shared by all LLM clients.
+
+        Args:
+            factory: Builds the pair of clients if it does not exist yet
+
+        Returns:
+            The shared sync and async API clients
+        """
+        with self._lock:
+            if self._api_clients is None:
+                self._api_clients = factory()
+            return self._api_clients
+
+    def get_llm(self, key: LLMKey, factory: Callable[[], Any]) -> Any:
+        """
+        Returns the shared LLM client for a configuration.
+
+        Args:
+            key: The LLM configuration
+            factory: Builds the client if it does not exist yet
+
+        Returns:
+            The shared LLM client
+        """
+        with self._lock:
+            llm = self._llms.get(key)
+            if llm is None:
+                llm = factory()
+                self._llms[key] = llm
+                self._stats["llm_builds"] += 1
+            return llm
+
+    def get_chain(self, key: ChainKey, factory: Callable[[], Any]) -> Any:
+        """
+        Returns the compiled chain for a configuration.
+        Building a chain for a new prompt version evicts the chains of older
+        versions with the same LLM configuration and output.
+
+        Args:
+            key: The chain configuration including the prompt version
+            factory: Builds the chain if it does not exist yet
+
+        Returns:
+            The compiled chain
+        """
+        with self._lock:
+            chain = self._chains.get(key)
+            if chain is not None:
+                self._stats["chain_hits"] += 1
+                return chain
+
+            chain = factory()
+            unversioned = key._replace(prompt_version="")
+            for stale_key in [k for k in self._chains if k._replace(prompt_version="") == unversioned]:
+                del self._chains[stale_key]
+            self._chains[key] = chain
+            self._stats["chain_builds"] += 1
+            return chain
+
+    def clear(self) -> None:
+        """Removes all pooled clients and chains."""
+        with self._lock:
+            self._llms.clear()
+            self._chains.clear()
+            self._api_clients = None
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns a snapshot of the pool counters.
+
+        Returns:
+            A dictionary with build and hit counters and the pool sizes
+        """
+        with self._lock:
+            return dict(self._stats, llms=len(self._llms), chains=len(self._chains))
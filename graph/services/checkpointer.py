@@ -0,0 +1,551 @@
+"""
+Persistent checkpointer for Shipmentbot.
+
+This file provides a SQLite-backed LangGraph checkpoint saver that can
+replace MemorySaver for long-running processes (CHECKPOINT_BACKEND=sqlite). The database runs in WAL mode and
+writes are buffered and committed in batches, so that a graph run costs one
+transaction instead of one per super-step. The history is bounded: each
+thread keeps only its latest checkpoints, idle threads are compacted to
+their latest checkpoint and threads without writes for the TTL are deleted.
+"""
+import atexit
+import os
+import random
+import sqlite3
+import threading
+import time
+import weakref
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+from graph.config import (
+    CHECKPOINT_BACKEND,
+    CHECKPOINT_PATH,
+    CHECKPOINT_MAX_PER_THREAD,
+    CHECKPOINT_TTL,
+    CHECKPOINT_COMPACT_AFTER,
+    CHECKPOINT_BATCH_SIZE,
+    CHECKPOINT_FLUSH_INTERVAL,
+    CHECKPOINT_MAINTENANCE_INTERVAL
+)
+from graph.services.metrics import metrics
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS checkpoints ("
+    "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL DEFAULT '', checkpoint_id TEXT NOT NULL, "
+    "parent_checkpoint_id TEXT, type TEXT, checkpoint BLOB, metadata_type TEXT, metadata BLOB, "
+    "created_at REAL NOT NULL, PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id))",
+    "CREATE TABLE IF NOT EXISTS writes ("
+    "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL DEFAULT '', checkpoint_id TEXT NOT NULL, "
+    "task_id TEXT NOT NULL, idx INTEGER NOT NULL, channel TEXT NOT NULL, type TEXT, value BLOB, "
+    "task_path TEXT NOT NULL DEFAULT '', PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx))",
+    "CREATE INDEX IF NOT EXISTS checkpoints_created_at ON checkpoints (thread_id, created_at)"
+)
+
+# Buffered operations: (sql, parameters, thread key)
+_Operation = Tuple[str, tuple, Tuple[str, str]]
+
+_BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+# Open savers, their buffered writes are committed when the interpreter exits
+_open_savers: "weakref.WeakSet[SqliteCheckpointSaver]" = weakref.WeakSet()
+
+
+@atexit.register
+def _close_open_savers() -> None:
+    for saver in list(_open_savers):
+        saver.close()
+
+
+class SqliteCheckpointSaver(BaseCheckpointSaver[str]):
+    """Bounded LangGraph checkpoint saver on SQLite with batched writes."""
+
+    def __init__(
+        self,
+        db_path: Optional[str] = CHECKPOINT_PATH,
+        max_checkpoints_per_thread: int = CHECKPOINT_MAX_PER_THREAD,
+        ttl: float = CHECKPOINT_TTL,
+        compact_after: float = CHECKPOINT_COMPACT_AFTER,
+        batch_size: int = CHECKPOINT_BATCH_SIZE,
+        flush_interval: float = CHECKPOINT_FLUSH_INTERVAL,
+        maintenance_interval: float = CHECKPOINT_MAINTENANCE_INTERVAL,
+        clock: Callable[[], float] = time.time,
+        **kwargs: Any
+    ):
+        """
+        Args:
+            db_path: Path of the SQLite file, None or "" uses an in-memory database
+            max_checkpoints_per_thread: Checkpoints kept per thread and namespace, 0 keeps all
+            ttl: Seconds after the last write until a thread is deleted, 0 keeps threads forever
+            compact_after: Idle seconds after which a thread keeps only its latest checkpoint, 0 disables compaction
+            batch_size: Number of buffered writes that triggers a commit
+            flush_interval: Maximum seconds a write stays buffered
+            maintenance_interval: Seconds between automatic TTL eviction and compaction runs
+            clock: Time source, replaceable in tests
+            **kwargs: Passed on to BaseCheckpointSaver (e.g. serde)
+        """
+        super().__init__(**kwargs)
+        self.db_path = db_path or None
+        self.max_checkpoints_per_thread = max_checkpoints_per_thread
+        self.ttl = ttl
+        self.compact_after = compact_after
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.maintenance_interval = maintenance_interval
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._pending: List[_Operation] = []
+        self._flush_timer: Optional[threading.Timer] = None
+        self._last_maintenance = clock()
+        self._connection = self._connect()
+        _open_savers.add(self)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.db_path is not None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.db_path or ":memory:", check_same_thread=False, isolation_level=None)
+        # auto_vacuum only takes effect before the first table is created
+        connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        connection.execute("PRAGMA journal_mode=WAL")
+        # WAL makes NORMAL crash-safe, only the last commits may be lost on power failure
+        connection.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            connection.execute(statement)
+        return connection
+
+    # Writes
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        """
+        Buffers a checkpoint, it is committed with the next batch.
+
+        Args:
+            config: The config of the parent checkpoint
+            checkpoint: The checkpoint to save
+            metadata: Metadata of the checkpoint
+            new_versions: Channel versions written in this step (unused, checkpoints are stored whole)
+
+        Returns:
+            The config of the saved checkpoint
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_type, checkpoint_blob = self.serde.dumps_typed(checkpoint)
+        metadata_type, metadata_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        self._enqueue((
+            "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+            "type, checkpoint, metadata_type, metadata, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                checkpoint_type, checkpoint_blob, metadata_type, metadata_blob, self._clock()
+            ),
+            (thread_id, checkpoint_ns)
+        ))
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"]
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ""
+    ) -> None:
+        """
+        Buffers the intermediate writes of a task.
+
+        Args:
+            config: The config of the checkpoint the writes belong to
+            writes: (channel, value) pairs
+            task_id: Identifier of the task creating the writes
+            task_path: Path of the task creating the writes
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        operations = []
+        for idx, (channel, value) in enumerate(writes):
+            idx = WRITES_IDX_MAP.get(channel, idx)
+            # Like MemorySaver: regular writes are not overwritten, special channels (negative idx) are
+            verb = "INSERT OR REPLACE" if idx < 0 else "INSERT OR IGNORE"
+            value_type, value_blob = self.serde.dumps_typed(value)
+            operations.append((
+                f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, "
+                "type, value, task_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, value_type, value_blob, task_path),
+                (thread_id, checkpoint_ns)
+            ))
+        self._enqueue(*operations)
+
+    def _enqueue(self, *operations: _Operation) -> None:
+        with self._lock:
+            self._pending.extend(operations)
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+            elif self._flush_timer is None and self._pending:
+                # Bounds the time a write stays buffered when no further writes follow
+                self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush(self) -> int:
+        """
+        Commits all buffered writes in one transaction and applies the
+        per-thread retention limit to the affected threads.
+
+        Returns:
+            The number of committed operations
+        """
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._pending or self._connection is None:
+                return 0
+            operations, self._pending = self._pending, []
+            connection = self._connection
+            connection.execute("BEGIN")
+            try:
+                for sql, parameters, _ in operations:
+                    connection.execute(sql, parameters)
+                trimmed = sum(
+                    self._trim_thread(thread_id, checkpoint_ns)
+                    for thread_id, checkpoint_ns in dict.fromkeys(key for _, _, key in operations)
+                )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            metrics.inc("shipmentbot_checkpoint_flushes_total")
+            metrics.observe("shipmentbot_checkpoint_batch_size", len(operations), buckets=_BATCH_SIZE_BUCKETS)
+            if trimmed:
+                metrics.inc("shipmentbot_checkpoints_evicted_total", trimmed, reason="retention")
+            if self.maintenance_interval and self._clock() - self._last_maintenance >= self.maintenance_interval:
+                self.maintain()
+            return len(operations)
+
+    def _trim_thread(self, thread_id: str, checkpoint_ns: str, keep: Optional[int] = None) -> int:
+        """Deletes all but the latest `keep` checkpoints of a thread. Caller holds the lock."""
+        keep = self.max_checkpoints_per_thread if keep is None else keep
+        if keep <= 0:
+            return 0
+        # Checkpoint ids are time-ordered (uuid6), so the id order is the write order
+        stale = [row[0] for row in self._connection.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+            (thread_id, checkpoint_ns, keep)
+        )]
+        for checkpoint_id in stale:
+            key = (thread_id, checkpoint_ns, checkpoint_id)
+            self._connection.execute(
+                "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", key
+            )
+            self._connection.execute(
+                "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", key
+            )
+        return len(stale)
+
+    # Reads
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """
+        Loads a checkpoint, the latest of the thread if the config has no checkpoint_id.
+
+        Args:
+            config: The config identifying the thread and optionally the checkpoint
+
+        Returns:
+            The checkpoint tuple or None if there is no matching checkpoint
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        sql = "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, " \
+              "metadata_type, metadata FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+        if checkpoint_id:
+            rows = self._query(sql + " AND checkpoint_id = ?", (thread_id, checkpoint_ns, checkpoint_id))
+        else:
+            rows = self._query(sql + " ORDER BY checkpoint_id DESC LIMIT 1", (thread_id, checkpoint_ns))
+        if not rows:
+            return None
+        return self._to_tuple(rows[0], self.serde.loads_typed((rows[0][6], rows[0][7])))
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> Iterator[CheckpointTuple]:
+        """
+        Lists checkpoints, newest first.
+
+        Args:
+            config: Restricts the result to a thread (and namespace or checkpoint), None lists all threads
+            filter: Metadata key/value pairs a checkpoint must match
+            before: Only checkpoints created before this checkpoint
+            limit: Maximum number of checkpoints
+
+        Yields:
+            The matching checkpoint tuples
+        """
+        clauses, parameters = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            parameters.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                clauses.append("checkpoint_ns = ?")
+                parameters.append(config["configurable"]["checkpoint_ns"])
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                parameters.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            parameters.append(before_id)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._query(
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+            f"metadata_type, metadata FROM checkpoints{where} ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC",
+            tuple(parameters)
+        )
+        for row in rows:
+            if limit is not None and limit <= 0:
+                break
+            metadata = self.serde.loads_typed((row[6], row[7]))
+            # Metadata is stored serialized, so the filter is applied after loading
+            if filter and not all(metadata.get(key) == value for key, value in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+            yield self._to_tuple(row, metadata)
+
+    def _query(self, sql: str, parameters: tuple) -> List[tuple]:
+        with self._lock:
+            # Reads must see buffered writes
+            self.flush()
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def _to_tuple(self, row: tuple, metadata: CheckpointMetadata) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, checkpoint_type, checkpoint_blob = row[:6]
+        writes = self._query(
+            "SELECT task_id, channel, type, value, task_path, idx FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, checkpoint_id)
+        )
+        writes.sort(key=lambda write: writes_sort_key(write[4], write[0], write[5]))
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id
+                }
+            },
+            checkpoint=self.serde.loads_typed((checkpoint_type, checkpoint_blob)),
+            metadata=metadata,
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((value_type, value)))
+                for task_id, channel, value_type, value, _, _ in writes
+            ]
+        )
+
+    # Retention
+
+    def delete_thread(self, thread_id: str) -> None:
+        """
+        Deletes all checkpoints and writes of a thread, including buffered ones.
+
+        Args:
+            thread_id: The thread to delete
+        """
+        with self._lock:
+            self._pending = [operation for operation in self._pending if operation[2][0] != thread_id]
+            self._delete_threads([thread_id])
+
+    def _delete_threads(self, thread_ids: Sequence[str]) -> None:
+        for thread_id in thread_ids:
+            self._connection.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            self._connection.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+
+    def evict_expired(self) -> int:
+        """
+        Deletes threads whose last checkpoint is older than the TTL.
+
+        Returns:
+            The number of deleted threads
+        """
+        if self.ttl <= 0:
+            return 0
+        with self._lock:
+            self.flush()
+            expired = [row[0] for row in self._connection.execute(
+                "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(created_at) <= ?",
+                (self._clock() - self.ttl,)
+            )]
+            self._delete_threads(expired)
+        if expired:
+            metrics.inc("shipmentbot_checkpoints_evicted_total", len(expired), reason="ttl")
+        return len(expired)
+
+    def compact(self) -> int:
+        """
+        Reduces idle threads to their latest checkpoint and returns the
+        freed pages to the file system.
+
+        Returns:
+            The number of deleted checkpoints
+        """
+        with self._lock:
+            self.flush()
+            removed = 0
+            if self.compact_after > 0:
+                idle = self._connection.execute(
+                    "SELECT thread_id, checkpoint_ns FROM checkpoints GROUP BY thread_id, checkpoint_ns "
+                    "HAVING COUNT(*) > 1 AND MAX(created_at) <= ?",
+                    (self._clock() - self.compact_after,)
+                ).fetchall()
+                if idle:
+                    self._connection.execute("BEGIN")
+                    removed = sum(self._trim_thread(thread_id, checkpoint_ns, keep=1) for thread_id, checkpoint_ns in idle)
+                    self._connection.execute("COMMIT")
+            self._connection.execute("PRAGMA incremental_vacuum")
+            if self.db_path is not None:
+                self._connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        if removed:
+            metrics.inc("shipmentbot_checkpoints_evicted_total", removed, reason="compaction")
+        return removed
+
+    def maintain(self) -> Dict[str, int]:
+        """
+        Runs TTL eviction and compaction, called periodically by flush.
+
+        Returns:
+            A dictionary with the number of expired threads and compacted checkpoints
+        """
+        with self._lock:
+            self._last_maintenance = self._clock()
+            return {"expired_threads": self.evict_expired(), "compacted_checkpoints": self.compact()}
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns a snapshot of the stored history.
+
+        Returns:
+            A dictionary with the number of threads, checkpoints, writes and buffered operations
+        """
+        with self._lock:
+            self.flush()
+            threads, checkpoints = self._connection.execute(
+                "SELECT COUNT(DISTINCT thread_id), COUNT(*) FROM checkpoints"
+            ).fetchone()
+            writes = self._connection.execute("SELECT COUNT(*) FROM writes").fetchone()[0]
+            return {"threads": threads, "checkpoints": checkpoints, "writes": writes, "pending": len(self._pending)}
+
+    def close(self) -> None:
+        """Commits buffered writes and closes the database."""
+        with self._lock:
+            if self._connection is None:
+                return
+            self.flush()
+            self._connection.close()
+            self._connection = None
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        """Returns the next channel version, in the same format as MemorySaver."""
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # Async variants, SQLite calls are short and writes are buffered, so they run inline like MemorySaver
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self.get_tuple(config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> AsyncIterator[CheckpointTuple]:
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ""
+    ) -> None:
+        self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self.delete_thread(thread_id)
+
+
+def create_checkpointer(backend: str = CHECKPOINT_BACKEND) -> BaseCheckpointSaver:
+    """
+    Creates the configured checkpointer.
+
+    Args:
+        backend: "sqlite" for the persistent saver, "memory" (the default) for MemorySaver
+
+    Returns:
+        A LangGraph checkpoint saver
+    """
+    if backend.lower() == "sqlite":
+        return SqliteCheckpointSaver()
+    return MemorySaver()
@@ -0,0 +1,231 @@
+"""
+Circuit breaker for Anthropic calls.
+
+This file stops sending requests to an unhealthy API. The breaker opens when
+the failure rate of the recent calls exceeds a threshold, calls then fail
+fast with CircuitOpenError instead of waiting through timeouts and retries.
+After a cool-down a limited number of trial calls is let through (half-open),
+a successful trial closes the breaker again.
+"""
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from graph.config import (
+    BREAKER_ENABLED,
+    BREAKER_FAILURE_RATE,
+    BREAKER_WINDOW,
+    BREAKER_MIN_CALLS,
+    BREAKER_OPEN_SECONDS,
+    BREAKER_HALF_OPEN_CALLS
+)
+from graph.services.metrics import metrics
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Gauge values of shipmentbot_circuit_state
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the API while the breaker is open."""
+
+
+def is_failure(error: BaseException) -> bool:
+    """
+    Decides whether an exception indicates an unhealthy API.
+    Errors in the response content (e.g. validation errors) do not count.
+
+    Args:
+        error: The exception raised by the call
+
+    Returns:
+        True for timeouts, connection errors, 429 and 5xx responses
+    """
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    # The SDK is imported with the first LLM client, no SDK error can exist before
+    anthropic = sys.modules.get("anthropic")
+    if anthropic is not None and isinstance(error, anthropic.APIConnectionError):
+        return True
+    status_code = getattr(error, "status_code", None)
+    return isinstance(status_code, int) and (status_code == 429 or status_code >= 500)
+
+
+class CircuitBreaker:
+    """Thread-safe circuit breaker based on the failure rate of a sliding window."""
+
+    def __init__(
+        self,
+        enabled: bool = BREAKER_ENABLED,
+        failure_rate: float = BREAKER_FAILURE_RATE,
+        window: int = BREAKER_WINDOW,
+        min_calls: int = BREAKER_MIN_CALLS,
+        open_seconds: float = BREAKER_OPEN_SECONDS,
+        half_open_calls: int = BREAKER_HALF_OPEN_CALLS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            enabled: Whether the breaker can open at all
+            failure_rate: Share of failed calls in the window that opens the breaker
+            window: Number of recent calls considered
+            min_calls: Minimum number of calls in the window before the breaker can open
+            open_seconds: Cool-down before trial calls are let through
+            half_open_calls: Number of concurrent trial calls in the half-open state
+            clock: Time source, replaceable in tests
+        """
+        self.enabled = enabled
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_calls = max(1, half_open_calls)
+        self._clock = clock
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trials = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Returns the current state, an expired open state reports half_open."""
+        with self._lock:
+            if self._state == OPEN and self._clock() - self._opened_at >= self.open_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def _transition(self, state: str) -> None:
+        if state == self._state:
+            return
+        print(f"Circuit breaker: {self._state} -> {state}")
+        self._state = state
+        if state == OPEN:
+            self._opened_at = self._clock()
+        if state == CLOSED:
+            self._outcomes.clear()
+        metrics.inc("shipmentbot_circuit_transitions_total", state=state)
+        metrics.set_gauge("shipmentbot_circuit_state", _STATE_VALUES[state])
+
+    def before_call(self) -> bool:
+        """
+        Admits a call or rejects it while the breaker is open.
+
+        Returns:
+            True if the call is a half-open trial
+
+        Raises:
+            CircuitOpenError: If the breaker is open
+        """
+        if not self.enabled:
+            return False
+        with self._lock:
+            if self._state == OPEN and self._clock() - self._opened_at >= self.open_seconds:
+                self._transition(HALF_OPEN)
+                self._trials = 0
+            if self._state == CLOSED:
+                return False
+            if self._state == HALF_OPEN and self._trials < self.half_open_calls:
+                self._trials += 1
+                return True
+        metrics.inc("shipmentbot_circuit_rejections_total")
+        raise CircuitOpenError("Anthropic API unavailable, circuit breaker is open")
+
+    def after_call(self, trial: bool, error: Optional[BaseException] = None) -> None:
+        """
+        Records the outcome of an admitted call.
+
+        Args:
+            trial: The value returned by before_call
+            error: The exception of the call, None on success
+        """
+        if not self.enabled:
+            return
+        failed = error is not None and is_failure(error)
+        with self._lock:
+            if trial:
+                self._trials -= 1
+                if self._state == HALF_OPEN:
+                    if failed:
+                        self._transition(OPEN)
+                    elif error is None or isinstance(error, Exception):
+                        # Any answer of the API, even an invalid one, shows that it is reachable again
+                        self._transition(CLOSED)
+                return
+            if self._state != CLOSED:
+                return
+            self._outcomes.append(failed)
+            failures = sum(self._outcomes)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+                self._transition(OPEN)
+
+    def call(self, func: Callable[[], Any]) -> Any:
+        """
+        Executes a blocking call through the breaker.
+
+        Args:
+            func: The API call
+
+        Returns:
+            The result of func
+
+        Raises:
+            CircuitOpenError: If the breaker is open
+        """
+        trial = self.before_call()
+        try:
+            result = func()
+        except BaseException as e:
+            self.after_call(trial, e)
+            raise
+        self.after_call(trial)
+        return result
+
+    async def acall(self, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Async variant of call.
+
+        Args:
+            func: Returns the awaitable of the API call
+
+        Returns:
+            The result of the awaitable
+
+        Raises:
+            CircuitOpenError: If the breaker is open
+        """
+        trial = self.before_call()
+        try:
+            result = await func()
+        except BaseException as e:
+            self.after_call(trial, e)
+            raise
+        self.after_call(trial)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns a snapshot of the breaker.
+
+        Returns:
+            A dictionary with state, calls in the window and failure rate
+        """
+        state = self.state
+        with self._lock:
+            calls = len(self._outcomes)
+            return {
+                "state": state,
+                "calls": calls,
+                "failure_rate": round(sum(self._outcomes) / calls, 3) if calls else 0.0
+            }
+
+    def reset(self) -> None:
+        """Closes the breaker and forgets all outcomes."""
+        with self._lock:
+            self._transition(CLOSED)
+            self._outcomes.clear()
+            self._trials = 0
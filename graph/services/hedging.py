@@ -0,0 +1,261 @@
+"""
+Hedged requests for Shipmentbot.
+
+This file cuts the tail latency of LLM calls. If a call is still running
+after a configurable latency percentile of recent calls, a second identical
+call is started, the first response wins and the other one is cancelled.
+The share of hedged calls within a sliding time window is capped, so that
+hedging does not double the spend during an incident.
+"""
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from graph.config import (
+    HEDGE_BUDGET_WINDOW,
+    HEDGE_ENABLED,
+    HEDGE_PERCENTILE,
+    HEDGE_MAX_RATIO,
+    HEDGE_MIN_DELAY,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_WINDOW,
+    LIMITER_MAX_CONCURRENCY
+)
+from graph.services.latency import percentile
+from graph.services.metrics import metrics
+
+
+class Hedger:
+    """Starts a backup call when the first one is slower than the latency percentile."""
+
+    def __init__(
+        self,
+        enabled: bool = HEDGE_ENABLED,
+        latency_percentile: float = HEDGE_PERCENTILE,
+        max_ratio: float = HEDGE_MAX_RATIO,
+        min_delay: float = HEDGE_MIN_DELAY,
+        min_samples: int = HEDGE_MIN_SAMPLES,
+        window: int = HEDGE_WINDOW,
+        budget_window: float = HEDGE_BUDGET_WINDOW,
+        max_workers: int = LIMITER_MAX_CONCURRENCY,
+        clock: Callable[[], float] = time.perf_counter
+    ):
+        """
+        Args:
+            enabled: Whether calls are hedged at all
+            latency_percentile: Percentile (0-100) of recent latencies after which the backup call starts
+            max_ratio: Maximum share of calls within budget_window that may be hedged, e.g. 0.05 for 5 %
+            min_delay: Lower bound of the hedge delay in seconds
+            min_samples: Number of latency samples required before hedging starts
+            window: Number of recent latencies per key used for the percentile
+            budget_window: Seconds of recent calls the hedge ratio is measured over
+            max_workers: Threads of the pool running sync calls, as many as LLM calls may run at once
+            clock: Time source, replaceable in tests
+        """
+        self.enabled = enabled
+        self.latency_percentile = latency_percentile
+        self.max_ratio = max_ratio
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.window = window
+        self.budget_window = budget_window
+        self.max_workers = max_workers
+        self._clock = clock
+        self._latencies: Dict[str, Deque[float]] = {}
+        # Start times of recent calls and hedges, older entries leave the budget window
+        self._recent_calls: Deque[float] = deque()
+        self._recent_hedges: Deque[float] = deque()
+        self._lock = threading.Lock()
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "budget_exhausted": 0}
+
+    def hedge_delay(self, key: str = "default") -> Optional[float]:
+        """
+        Returns the time after which a backup call is started.
+
+        Args:
+            key: Latency series, e.g. the model name
+
+        Returns:
+            The delay in seconds or None if hedging is disabled or there are too few samples
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            samples = list(self._latencies.get(key, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return max(self.min_delay, percentile(samples, self.latency_percentile))
+
+    def record_latency(self, latency: float, key: str = "default") -> None:
+        """Adds a latency sample in seconds to the series of a key."""
+        with self._lock:
+            series = self._latencies.get(key)
+            if series is None:
+                series = self._latencies[key] = deque(maxlen=self.window)
+            series.append(latency)
+
+    def _expire(self, now: float) -> None:
+        horizon = now - self.budget_window
+        for series in (self._recent_calls, self._recent_hedges):
+            while series and series[0] < horizon:
+                series.popleft()
+
+    def _start_call(self) -> None:
+        with self._lock:
+            self._stats["calls"] += 1
+            self._recent_calls.append(self._clock())
+
+    def _acquire_hedge(self) -> bool:
+        with self._lock:
+            now = self._clock()
+            self._expire(now)
+            # Only recent calls count, a long quiet history does not fund a burst of hedges
+            if len(self._recent_hedges) + 1 > self.max_ratio * len(self._recent_calls):
+                self._stats["budget_exhausted"] += 1
+                metrics.inc("shipmentbot_llm_hedges_total", outcome="budget_exhausted")
+                return False
+            self._stats["hedged"] += 1
+            self._recent_hedges.append(now)
+        metrics.inc("shipmentbot_llm_hedges_total", outcome="issued")
+        return True
+
+    def _record_winner(self, hedge_won: bool) -> None:
+        if hedge_won:
+            with self._lock:
+                self._stats["hedge_wins"] += 1
+        metrics.inc("shipmentbot_llm_hedges_total", outcome="hedge_won" if hedge_won else "primary_won")
+
+    def _get_executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="hedge"
+                )
+            return self._executor
+
+    def call(self, func: Callable[[], Any], key: str = "default") -> Any:
+        """
+        Executes a blocking call, hedged if it is slower than the percentile.
+        Hedged calls run on a pool of max_workers threads, the delay is measured
+        from the start of the call, not from its submission. A running thread
+        cannot be interrupted, the result of the losing call is discarded.
+
+        Args:
+            func: The call, must be safe to execute twice
+            key: Latency series, e.g. the model name
+
+        Returns:
+            The result of the first successful call
+        """
+        delay = self.hedge_delay(key)
+        self._start_call()
+        started = self._clock()
+        if delay is None:
+            result = func()
+            self.record_latency(self._clock() - started, key)
+            return result
+
+        executor = self._get_executor()
+        running = threading.Event()
+
+        def run_primary():
+            running.set()
+            return func()
+
+        # Context variables (e.g. the LangSmith run tree) are passed on to the worker threads
+        primary = executor.submit(contextvars.copy_context().run, run_primary)
+        # The delay starts when the primary runs, time queued for a pool thread does not count
+        running.wait()
+        started = self._clock()
+        # Waiting instead of primary.result(timeout=...), a TimeoutError raised by the call itself is not a slow call
+        done, _ = concurrent.futures.wait([primary], timeout=delay)
+        if done or not self._acquire_hedge():
+            result = primary.result()
+            self.record_latency(self._clock() - started, key)
+            return result
+
+        futures = [primary, executor.submit(contextvars.copy_context().run, func)]
+        pending = set(futures)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    self.record_latency(self._clock() - started, key)
+                    self._record_winner(future is futures[1])
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    async def acall(self, func: Callable[[], Awaitable[Any]], key: str = "default") -> Any:
+        """
+        Async variant of call, the losing call is cancelled.
+
+        Args:
+            func: Returns a new awaitable for each call, must be safe to execute twice
+            key: Latency series, e.g. the model name
+
+        Returns:
+            The result of the first successful call
+        """
+        delay = self.hedge_delay(key)
+        self._start_call()
+        started = self._clock()
+        if delay is None:
+            result = await func()
+            self.record_latency(self._clock() - started, key)
+            return result
+
+        primary = asyncio.ensure_future(func())
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+        except asyncio.CancelledError:
+            primary.cancel()
+            raise
+        if done or not self._acquire_hedge():
+            result = await primary
+            self.record_latency(self._clock() - started, key)
+            return result
+
+        tasks = [primary, asyncio.ensure_future(func())]
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.record_latency(self._clock() - started, key)
+                        self._record_winner(task is tasks[1])
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns a snapshot of the hedge counters.
+
+        Returns:
+            A dictionary with calls, hedged calls, hedge wins and the hedge ratio
+        """
+        with self._lock:
+            calls = self._stats["calls"]
+            return dict(self._stats, hedge_ratio=round(self._stats["hedged"] / calls, 4) if calls else 0.0)
+
+    def reset(self) -> None:
+        """Discards all latency samples and counters."""
+        with self._lock:
+            self._latencies.clear()
+            self._recent_calls.clear()
+            self._recent_hedges.clear()
+            self._stats = {key: 0 for key in self._stats}
@@ -0,0 +1,121 @@
+"""
+Item streaming for Shipmentbot.
+
+This file emits the items of a Shipment to the LangGraph custom stream while
+the structured output is still being generated. The chain yields growing
+partial Shipments; every item except the last one is complete as soon as the
+next item has started, so it is validated and emitted right away. The last
+item is emitted when the stream ends. Callers opt in per request with
+config={"configurable": {"stream_items": True}} and read the events with
+graph.stream(..., stream_mode="custom").
+
+Events:
+    {"event": "shipment_item", "segment": 0, "index": 2, "item": {...}}
+    {"event": "shipment_reset", "segment": 0}  (the extraction is repeated, e.g. on escalation)
+"""
+from typing import Any, Callable, Dict, Optional
+
+from langgraph.config import get_stream_writer
+from pydantic import ValidationError
+
+from graph.models.shipment_models import ShipmentItem
+from graph.services.metrics import metrics
+
+
+def _items_of(shipment: Any) -> list:
+    items = shipment.get("items") if isinstance(shipment, dict) else getattr(shipment, "items", None)
+    return list(items or [])
+
+
+class ItemEmitter:
+    """Emits the complete items of partial Shipments exactly once, in order."""
+
+    def __init__(self, writer: Callable[[Dict[str, Any]], None], segment: Optional[int] = None):
+        """
+        Args:
+            writer: The LangGraph stream writer
+            segment: Index of the segment for split inquiries, None otherwise
+        """
+        self._writer = writer
+        self._segment = segment
+        self._emitted = 0
+
+    @property
+    def emitted(self) -> int:
+        """Number of items emitted since the last reset."""
+        return self._emitted
+
+    def feed(self, partial: Any) -> None:
+        """
+        Emits the items of a partial Shipment that can no longer change.
+
+        Args:
+            partial: A partial Shipment (model or dict) from the streaming chain
+        """
+        self._emit(_items_of(partial)[:-1])
+
+    def finish(self, shipment: Any) -> None:
+        """
+        Emits the remaining items of the final Shipment.
+
+        Args:
+            shipment: The complete Shipment (model or dict)
+        """
+        self._emit(_items_of(shipment))
+
+    def reset(self) -> None:
+        """Tells the consumer to discard the emitted items, the extraction is repeated."""
+        if self._emitted:
+            self._writer({"event": "shipment_reset", "segment": self._segment})
+        self._emitted = 0
+
+    def _emit(self, items: list) -> None:
+        for index in range(self._emitted, len(items)):
+            try:
+                item = ShipmentItem.model_validate(items[index])
+            except ValidationError:
+                # An invalid item stops the stream here, the final result still contains everything
+                return
+            self._writer({
+                "event": "shipment_item",
+                "segment": self._segment,
+                "index": index,
+                "item": item.model_dump(mode="json")
+            })
+            metrics.inc("shipmentbot_streamed_items_total")
+            self._emitted = index + 1
+
+
+def wants_item_stream(config: Optional[Dict[str, Any]]) -> bool:
+    """
+    Reads the streaming hint from a LangGraph/LangChain config.
+
+    Args:
+        config: The RunnableConfig passed to the node, may be None
+
+    Returns:
+        True if the caller asked for streamed items
+    """
+    configurable = (config or {}).get("configurable") or {}
+    return bool(configurable.get("stream_items"))
+
+
+def create_item_emitter(config: Optional[Dict[str, Any]], segment: Optional[int] = None) -> Optional[ItemEmitter]:
+    """
+    Creates an emitter for the current graph run if the caller asked for streamed items.
+
+    Args:
+        config: The RunnableConfig passed to the node, may be None
+        segment: Index of the segment for split inquiries, None otherwise
+
+    Returns:
+        An ItemEmitter, None outside a graph run or without stream_items
+    """
+    if not wants_item_stream(config):
+        return None
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        # Called outside a graph run, e.g. directly in tests or batch helpers
+        return None
+    return ItemEmitter(writer, segment)
@@ -0,0 +1,48 @@
+"""
+Latency statistics for Shipmentbot.
+
+This file contains small helpers to summarize latency samples.
+"""
+import math
+from typing import Dict, Iterable, List
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Computes a percentile with the nearest-rank method.
+
+    Args:
+        values: The samples, need not be sorted
+        q: The percentile between 0 and 100
+
+    Returns:
+        The percentile value, 0.0 for an empty list
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize_latencies(values: Iterable[float]) -> Dict[str, float]:
+    """
+    Summarizes latency samples.
+
+    Args:
+        values: Latency samples in seconds
+
+    Returns:
+        A dictionary with count, mean, p50, p95, p99 and max in milliseconds
+    """
+    samples = list(values)
+    if not samples:
+        return {"count": 0, "mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    return {
+        "count": len(samples),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 2),
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p95_ms": round(percentile(samples, 95) * 1000, 2),
+        "p99_ms": round(percentile(samples, 99) * 1000, 2),
+        "max_ms": round(max(samples) * 1000, 2)
+    }
@@ -0,0 +1,126 @@
+"""
+Message Batches client for Shipmentbot.
+
+This file wraps the Anthropic Message Batches API for bulk offline
+extraction: many Messages API requests are submitted as one batch job, which
+is processed asynchronously at a lower price. The job is polled until it has
+ended and its results are downloaded as (custom_id, result) pairs. Results
+are plain dictionaries in the format of the API, so callers do not depend on
+the SDK types. The Anthropic SDK is imported on first use.
+"""
+import os
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from graph.config import MESSAGE_BATCH_POLL_INTERVAL, MESSAGE_BATCH_TIMEOUT
+from graph.services.metrics import metrics
+
+ENDED = "ended"
+
+
+class MessageBatchTimeoutError(TimeoutError):
+    """Raised when a batch job has not ended within the timeout."""
+
+
+class MessageBatchClient:
+    """Submits, polls and downloads message batch jobs."""
+
+    def __init__(self, client: Any = None, api_key: Optional[str] = None, base_url: Optional[str] = None):
+        """
+        Args:
+            client: An existing anthropic.Anthropic client, created on first use if None
+            api_key: API key for the new client, ANTHROPIC_API_KEY if None
+            base_url: Base URL for the new client, e.g. a local stand-in server
+        """
+        self._client = client
+        self._api_key = api_key
+        self._base_url = base_url
+
+    @property
+    def batches(self) -> Any:
+        if self._client is None:
+            import anthropic
+            # ANTHROPIC_API_URL is honored like in ChatAnthropic
+            self._client = anthropic.Anthropic(
+                api_key=self._api_key,
+                base_url=self._base_url or os.getenv("ANTHROPIC_API_URL")
+            )
+        return self._client.messages.batches
+
+    def submit(self, requests: List[Dict[str, Any]]) -> str:
+        """
+        Submits a batch job.
+
+        Args:
+            requests: Dictionaries with custom_id and the Messages API params
+
+        Returns:
+            The id of the batch job
+        """
+        batch = self.batches.create(requests=requests)
+        metrics.inc("shipmentbot_message_batches_total", event="submitted")
+        metrics.inc("shipmentbot_message_batch_requests_total", len(requests))
+        return batch.id
+
+    def status(self, batch_id: str) -> Dict[str, Any]:
+        """
+        Reads the processing status of a batch job.
+
+        Args:
+            batch_id: The id returned by submit
+
+        Returns:
+            A dictionary with processing_status and request_counts
+        """
+        batch = self.batches.retrieve(batch_id)
+        return {
+            "processing_status": batch.processing_status,
+            "request_counts": batch.request_counts.model_dump()
+        }
+
+    def wait(
+        self,
+        batch_id: str,
+        poll_interval: float = MESSAGE_BATCH_POLL_INTERVAL,
+        timeout: float = MESSAGE_BATCH_TIMEOUT,
+        sleep: Callable[[float], None] = time.sleep
+    ) -> Dict[str, Any]:
+        """
+        Polls a batch job until it has ended.
+
+        Args:
+            batch_id: The id returned by submit
+            poll_interval: Seconds between two status checks
+            timeout: Maximum seconds to wait
+            sleep: The sleep function, replaced in tests
+
+        Returns:
+            The final status
+
+        Raises:
+            MessageBatchTimeoutError: If the job has not ended within the timeout
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            status = self.status(batch_id)
+            if status["processing_status"] == ENDED:
+                metrics.inc("shipmentbot_message_batches_total", event="ended")
+                return status
+            if time.monotonic() + poll_interval > deadline:
+                raise MessageBatchTimeoutError(f"Message batch {batch_id} has not ended after {timeout} s")
+            sleep(poll_interval)
+
+    def results(self, batch_id: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Downloads the results of an ended batch job, in any order.
+
+        Args:
+            batch_id: The id returned by submit
+
+        Returns:
+            An iterator of (custom_id, result) tuples, the result type is
+            succeeded (with the message), errored, canceled or expired
+        """
+        for entry in self.batches.results(batch_id):
+            metrics.inc("shipmentbot_message_batch_results_total", result=entry.result.type)
+            yield entry.custom_id, entry.result.model_dump(mode="json")
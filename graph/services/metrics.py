@@ -0,0 +1,329 @@
+"""
+In-process metrics for Shipmentbot.
+
+This file provides counters and histograms for timing spans, token counts and
+retries, without requiring LangSmith. Metrics can be exported through
+pluggable sinks, e.g. as Prometheus text format or as JSON lines.
+"""
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from graph.config import METRICS_SINK, METRICS_EXPORT_PATH
+
+# Default histogram buckets for durations in seconds
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Histogram buckets for token counts
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+class Histogram:
+    """Cumulative histogram with fixed buckets."""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Records a single value."""
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns count, sum, mean and the cumulative bucket counts."""
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+            "buckets": {str(bound): count for bound, count in zip(self.buckets, self.counts)}
+        }
+
+
+class MetricsSink:
+    """Base class for metric exporters."""
+
+    def on_observation(self, event: Dict[str, Any]) -> None:
+        """Called for every single observation, e.g. to stream events."""
+
+    def export(self, registry: "MetricsRegistry") -> None:
+        """Called by MetricsRegistry.export to write the aggregated metrics."""
+
+
+class JsonLinesSink(MetricsSink):
+    """Appends every observation as one JSON line to a file."""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Path of the JSON lines file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+    def on_observation(self, event: Dict[str, Any]) -> None:
+        line = json.dumps(event, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+class PrometheusTextSink(MetricsSink):
+    """Writes the aggregated metrics in Prometheus text format (e.g. for the node exporter textfile collector)."""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Path of the .prom file, written atomically
+        """
+        self.path = path
+
+    def export(self, registry: "MetricsRegistry") -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(registry.render_prometheus())
+        os.replace(tmp_path, self.path)
+
+
+class MetricsRegistry:
+    """Thread-safe registry of counters and histograms."""
+
+    def __init__(self, sinks: Optional[List[MetricsSink]] = None):
+        """
+        Args:
+            sinks: Exporters that receive observations and exports
+        """
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._sinks: List[MetricsSink] = list(sinks or [])
+        self._lock = threading.Lock()
+
+    def add_sink(self, sink: MetricsSink) -> None:
+        """Registers an additional exporter."""
+        with self._lock:
+            self._sinks.append(sink)
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        """
+        Increments a counter.
+
+        Args:
+            name: Name of the counter, should end with _total
+            value: Amount to add
+            **labels: Label values
+        """
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = _label_key(labels)
+            series[key] = series.get(key, 0.0) + value
+        self._notify({"type": "counter", "name": name, "value": value, "labels": labels})
+
+    def set_gauge(self, name: str, value: float, **labels: Any) -> None:
+        """
+        Sets a gauge to the current value.
+
+        Args:
+            name: Name of the gauge
+            value: The current value
+            **labels: Label values
+        """
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS, **labels: Any) -> None:
+        """
+        Records a value in a histogram.
+
+        Args:
+            name: Name of the histogram
+            value: The observed value
+            buckets: Bucket bounds, only used when the series is created
+            **labels: Label values
+        """
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            key = _label_key(labels)
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+        self._notify({"type": "histogram", "name": name, "value": value, "labels": labels})
+
+    @contextmanager
+    def span(self, stage: str, **labels: Any) -> Iterator[None]:
+        """
+        Times a block and records it in shipmentbot_stage_duration_seconds.
+
+        Args:
+            stage: Name of the stage, e.g. prompt_load or llm_call
+            **labels: Additional label values
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("shipmentbot_stage_duration_seconds", time.perf_counter() - started, stage=stage, **labels)
+
+    def counter_value(self, name: str, **labels: Any) -> float:
+        """Returns the current value of a counter series (0 if unknown)."""
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0.0)
+
+    def histogram(self, name: str, **labels: Any) -> Optional[Dict[str, Any]]:
+        """Returns the snapshot of a histogram series or None if unknown."""
+        with self._lock:
+            histogram = self._histograms.get(name, {}).get(_label_key(labels))
+            return histogram.snapshot() if histogram else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Returns all metrics as a JSON-serializable dictionary.
+
+        Returns:
+            A dictionary with counters, gauges and histograms per series
+        """
+        with self._lock:
+            return {
+                "counters": {
+                    name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                    for name, series in self._counters.items()
+                },
+                "gauges": {
+                    name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                    for name, series in self._gauges.items()
+                },
+                "histograms": {
+                    name: [{"labels": dict(key), **histogram.snapshot()} for key, histogram in series.items()]
+                    for name, series in self._histograms.items()
+                }
+            }
+
+    def render_prometheus(self) -> str:
+        """
+        Renders all metrics in the Prometheus text exposition format.
+
+        Returns:
+            The metrics as text
+        """
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                lines.extend(f"{name}{_format_labels(key)} {value}" for key, value in series.items())
+            for name, series in sorted(self._gauges.items()):
+                lines.append(f"# TYPE {name} gauge")
+                lines.extend(f"{name}{_format_labels(key)} {value}" for key, value in series.items())
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in series.items():
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', str(bound)))} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self) -> None:
+        """Passes the aggregated metrics to all sinks."""
+        for sink in list(self._sinks):
+            try:
+                sink.export(self)
+            except Exception as e:
+                print(f"Metrics export failed: {e}")
+
+    def reset(self) -> None:
+        """Discards all recorded values (sinks are kept)."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def _notify(self, event: Dict[str, Any]) -> None:
+        if not self._sinks:
+            return
+        event = dict(event, timestamp=round(time.time(), 3))
+        for sink in list(self._sinks):
+            try:
+                sink.on_observation(event)
+            except Exception as e:
+                print(f"Metrics sink failed: {e}")
+
+
+def timed_node(node_name: str, func: Callable) -> Callable:
+    """
+    Wraps a graph node (sync or async) so that each call is recorded
+    in shipmentbot_node_duration_seconds.
+
+    Args:
+        node_name: Name of the node in the graph
+        func: The node implementation
+
+    Returns:
+        The wrapped node implementation
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                metrics.observe("shipmentbot_node_duration_seconds", time.perf_counter() - started, node=node_name)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            metrics.observe("shipmentbot_node_duration_seconds", time.perf_counter() - started, node=node_name)
+    return wrapper
+
+
+def create_sinks_from_config(sink_names: str = METRICS_SINK, export_path: str = METRICS_EXPORT_PATH) -> List[MetricsSink]:
+    """
+    Creates the sinks selected with METRICS_SINK.
+
+    Args:
+        sink_names: Comma-separated list of "prometheus" and/or "jsonl", empty or "none" for no sink
+        export_path: Base path of the export files (without extension)
+
+    Returns:
+        The configured sinks
+    """
+    sinks: List[MetricsSink] = []
+    for sink_name in (name.strip().lower() for name in sink_names.split(",")):
+        if sink_name == "prometheus":
+            sinks.append(PrometheusTextSink(f"{export_path}.prom"))
+        elif sink_name == "jsonl":
+            sinks.append(JsonLinesSink(f"{export_path}.jsonl"))
+    return sinks
+
+
+# Process-wide metrics registry
+metrics = MetricsRegistry(sinks=create_sinks_from_config())
@@ -0,0 +1,260 @@
+"""
+Near-duplicate index for Shipmentbot.
+
+The same tender often arrives several times with small differences such as
+greeting lines, reference numbers or forwarded headers, which the exact
+result cache misses. This file keeps a MinHash signature of every extracted
+input in a banded LSH index: similar texts share at least one band bucket,
+so a lookup only compares a few candidates. Digits are normalized before
+shingling, so reference numbers do not lower the similarity. A match is only
+reused if all numeric tokens of both texts are exactly the same, only numbers
+of recognised reference or ID labels (e.g. "Referenz 4711-2024", "Anfrage Nr.
+99812", "#12345") are left out. Words such as "Angebot" or "Order" only count
+as a label with a Nr/No/#/: marker, and a value followed by a unit is always
+compared. The index is an LRU bounded by max_entries.
+"""
+import hashlib
+import heapq
+import re
+import struct
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from graph.config import (
+    NEAR_DUPLICATE_THRESHOLD,
+    NEAR_DUPLICATE_MAX_ENTRIES,
+    NEAR_DUPLICATE_NUM_PERM,
+    NEAR_DUPLICATE_BANDS
+)
+from graph.services.metrics import metrics
+
+# Length of the character shingles
+SHINGLE_SIZE = 5
+
+# Long texts are sampled to the shingles with the smallest hash (bottom-k), so the cost is bounded
+MAX_SHINGLES = 256
+
+_NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)?")
+# Labels that only name a reference, e.g. "Referenz 4711-2024", "Kundennummer 88123"
+_REFERENCE_LABELS = (
+    r"ref(?:erenz)?|reference|ref\.?-?nr|referenznummer|auftrags-?nr|auftragsnummer|anfrage-?nr|anfragenummer"
+    r"|bestell-?nr|bestellnummer|vorgangs-?nr|vorgangsnummer|kunden-?nr|kundennummer|angebots-?nr"
+    r"|angebotsnummer|ticket|rfq"
+)
+# Words that are followed by a quantity as often as by a reference ("Angebot 1200 kg", "Order 2400 kg")
+_AMBIGUOUS_LABELS = r"auftrag|anfrage|angebot|bestellung|vorgang|order|quote|id"
+# A value followed by a unit or a dimension separator is a measure, not a reference
+_MEASURE_AHEAD = (
+    r"\d+(?:[.,]\d+)?\s*(?:(?:kgs?|t|to|tonnen|st(?:ü|ue)ck|stk|pcs|pieces|m|cm|mm|m3|cbm|ldm)\b|[x×*]\s*\d)"
+)
+# A reference label and its value, e.g. "Ref.-Nr.: 4711-2024", "Auftrag Nr. 123456", "#99812".
+# Ambiguous words only count as a label with a Nr/No/#/: marker in front of the value.
+_REFERENCE_PATTERN = re.compile(
+    rf"(?:\b(?:{_REFERENCE_LABELS})\b\.?(?:\s*(?:nr|no|number|nummer)\b\.?)?\s*[:#]?"
+    rf"|\b(?:{_AMBIGUOUS_LABELS})\b\.?\s*(?:(?:nr|no|number|nummer)\b\.?\s*[:#]?|[:#])"
+    rf"|#)"
+    rf"\s*(?!{_MEASURE_AHEAD})[a-z]{{0,4}}[-/]?\d[\w/-]{{3,}}",  # at least 4 characters, "order 3 pallets" keeps its 3
+    re.IGNORECASE
+)
+_DIGITS_PATTERN = re.compile(r"\d+")
+_NON_WORD_PATTERN = re.compile(r"[^\w]+")
+
+
+class Fingerprint(NamedTuple):
+    """MinHash signature and numeric tokens of a text."""
+    signature: Tuple[int, ...]
+    numbers: Tuple[str, ...]
+
+
+class _Entry(NamedTuple):
+    scope: str
+    fingerprint: Fingerprint
+    value: Any
+
+
+def normalize_for_shingles(text: str) -> str:
+    """
+    Normalizes a text for the similarity comparison.
+
+    Args:
+        text: The inquiry text
+
+    Returns:
+        The lower-cased text with every digit run replaced by 0 and
+        punctuation collapsed into single spaces
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    return " ".join(_NON_WORD_PATTERN.sub(" ", _DIGITS_PATTERN.sub("0", text)).split())
+
+
+def numeric_tokens(text: str) -> Tuple[str, ...]:
+    """
+    Collects all numbers of a text except the values of reference or ID labels.
+
+    Args:
+        text: The inquiry text
+
+    Returns:
+        The numbers in order, with unified decimal separators
+    """
+    text = _REFERENCE_PATTERN.sub(" ", unicodedata.normalize("NFKC", text))
+    return tuple(number.replace(",", ".") for number in _NUMBER_PATTERN.findall(text))
+
+
+def _shingle_hash(shingle: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle, digest_size=8).digest(), "big")
+
+
+def _shingles(text: str) -> List[bytes]:
+    normalized = normalize_for_shingles(text)
+    shingles = {
+        normalized[i:i + SHINGLE_SIZE].encode("utf-8")
+        for i in range(max(1, len(normalized) - SHINGLE_SIZE + 1))
+    }
+    if len(shingles) > MAX_SHINGLES:
+        return heapq.nsmallest(MAX_SHINGLES, shingles, key=_shingle_hash)
+    return list(shingles)
+
+
+def estimate_similarity(first: Fingerprint, second: Fingerprint) -> float:
+    """
+    Estimates the Jaccard similarity of two texts from their signatures.
+
+    Args:
+        first: Fingerprint of the first text
+        second: Fingerprint of the second text
+
+    Returns:
+        The share of equal MinHash values between 0 and 1
+    """
+    equal = sum(1 for a, b in zip(first.signature, second.signature) if a == b)
+    return equal / len(first.signature)
+
+
+class NearDuplicateIndex:
+    """Bounded MinHash/LSH index that maps near-identical texts to a stored value."""
+
+    def __init__(
+        self,
+        threshold: float = NEAR_DUPLICATE_THRESHOLD,
+        max_entries: int = NEAR_DUPLICATE_MAX_ENTRIES,
+        num_perm: int = NEAR_DUPLICATE_NUM_PERM,
+        bands: int = NEAR_DUPLICATE_BANDS,
+        seed: int = 1
+    ):
+        """
+        Args:
+            threshold: Minimum estimated Jaccard similarity of a match
+            max_entries: Maximum number of texts, the least recently used ones are evicted
+            num_perm: Number of MinHash hash functions (signature length)
+            bands: Number of LSH bands, num_perm must be divisible by bands
+            seed: Seed of the hash functions, signatures are only comparable with the same seed
+        """
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self._threshold = threshold
+        self._max_entries = max_entries
+        self._rows = num_perm // bands
+        self._bands = bands
+        # One SHAKE digest per shingle yields all num_perm 32-bit hash values at once
+        self._salt = seed.to_bytes(8, "big")
+        self._digest_size = 4 * num_perm
+        self._unpack = struct.Struct(f"<{num_perm}I").unpack
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], Set[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def fingerprint(self, text: str) -> Fingerprint:
+        """
+        Computes the MinHash signature and the numeric tokens of a text.
+
+        Args:
+            text: The inquiry text
+
+        Returns:
+            The Fingerprint used by find and add
+        """
+        rows = (
+            self._unpack(hashlib.shake_128(self._salt + shingle).digest(self._digest_size))
+            for shingle in _shingles(text)
+        )
+        # The minimum per hash function, computed column-wise in C
+        signature = tuple(map(min, zip(*rows)))
+        return Fingerprint(signature, numeric_tokens(text))
+
+    def _band_keys(self, signature: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+        return [(band, signature[band * self._rows:(band + 1) * self._rows]) for band in range(self._bands)]
+
+    def find(self, fingerprint: Fingerprint, scope: str = "") -> Optional[Any]:
+        """
+        Returns the value of the most similar text with the same numeric tokens.
+
+        Args:
+            fingerprint: The Fingerprint of the new text
+            scope: Only texts added with the same scope (e.g. prompt version and model) match
+
+        Returns:
+            The stored value or None
+        """
+        with self._lock:
+            candidates = set()
+            for key in self._band_keys(fingerprint.signature):
+                candidates.update(self._buckets.get(key, ()))
+            best_id, best_similarity, numbers_differ = None, self._threshold, False
+            for entry_id in candidates:
+                entry = self._entries[entry_id]
+                if entry.scope != scope:
+                    continue
+                similarity = estimate_similarity(fingerprint, entry.fingerprint)
+                if similarity < best_similarity:
+                    continue
+                if entry.fingerprint.numbers != fingerprint.numbers:
+                    numbers_differ = True
+                    continue
+                best_id, best_similarity = entry_id, similarity
+            if best_id is None:
+                metrics.inc("shipmentbot_near_duplicate_total", result="numbers_differ" if numbers_differ else "miss")
+                return None
+            self._entries.move_to_end(best_id)
+            metrics.inc("shipmentbot_near_duplicate_total", result="hit")
+            return self._entries[best_id].value
+
+    def add(self, fingerprint: Fingerprint, value: Any, scope: str = "") -> None:
+        """
+        Adds a text, evicting the least recently used texts beyond max_entries.
+
+        Args:
+            fingerprint: The Fingerprint of the text
+            value: The value returned for near-duplicates, e.g. a result cache key
+            scope: The scope passed to find
+        """
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _Entry(scope, fingerprint, value)
+            for key in self._band_keys(fingerprint.signature):
+                self._buckets.setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self._max_entries:
+                self._evict()
+
+    def _evict(self) -> None:
+        entry_id, entry = self._entries.popitem(last=False)
+        for key in self._band_keys(entry.fingerprint.signature):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def clear(self) -> None:
+        """Removes all texts."""
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
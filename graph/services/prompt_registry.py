@@ -0,0 +1,203 @@
+"""
+Prompt registry for Shipmentbot.
+
+This file provides a process-wide cache for prompts pulled from LangSmith.
+Prompts are loaded once, served from memory and refreshed in the background
+when their TTL has expired. If a refresh fails, the stale prompt keeps being
+served (stale-while-revalidate).
+"""
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from graph.config import PROMPT_CACHE_TTL, PROMPT_CACHE_RETRY
+
+
+def prompt_fingerprint(prompt: Any) -> str:
+    """
+    Computes a stable version identifier for a prompt.
+
+    Args:
+        prompt: The prompt object (e.g. a PromptTemplate)
+
+    Returns:
+        A short hex digest that changes whenever the prompt content changes
+    """
+    try:
+        serialized = json.dumps(prompt.to_json(), sort_keys=True, default=str)
+    except Exception:
+        serialized = repr(prompt)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()[:12]
+
+
+@dataclass
+class _PromptEntry:
+    prompt: Any
+    version: str
+    next_refresh_at: float
+    refreshing: bool = False
+
+
+class PromptRegistry:
+    """Thread-safe in-memory prompt cache with TTL and background refresh."""
+
+    def __init__(
+        self,
+        loader: Callable[[str], Optional[Any]],
+        ttl: float = PROMPT_CACHE_TTL,
+        retry_interval: float = PROMPT_CACHE_RETRY,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            loader: Function that fetches a prompt by name, returns None on failure
+            ttl: Seconds after which a cached prompt is refreshed in the background
+            retry_interval: Seconds to wait before retrying a failed refresh
+            clock: Time source, injectable for tests
+        """
+        self._loader = loader
+        self._ttl = ttl
+        self._retry_interval = retry_interval
+        self._clock = clock
+        self._entries: Dict[str, _PromptEntry] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "stale_hits": 0,
+            "refreshes": 0,
+            "refresh_failures": 0
+        }
+
+    def get(self, prompt_name: str) -> Optional[Any]:
+        """
+        Returns the cached prompt, loading it synchronously on the first call.
+
+        Args:
+            prompt_name: Name of the prompt in LangSmith
+
+        Returns:
+            The prompt or None if it could not be loaded at all
+        """
+        with self._lock:
+            entry = self._entries.get(prompt_name)
+            if entry is not None:
+                self._stats["hits"] += 1
+                if self._clock() >= entry.next_refresh_at:
+                    self._stats["stale_hits"] += 1
+                    if not entry.refreshing:
+                        entry.refreshing = True
+                        threading.Thread(
+                            target=self._refresh,
+                            args=(prompt_name,),
+                            name=f"prompt-refresh-{prompt_name}",
+                            daemon=True
+                        ).start()
+                return entry.prompt
+            self._stats["misses"] += 1
+            load_lock = self._load_locks.setdefault(prompt_name, threading.Lock())
+
+        # Only one thread loads a missing prompt, the others wait for its result
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(prompt_name)
+            if entry is not None:
+                return entry.prompt
+            prompt = self._loader(prompt_name)
+            if prompt is not None:
+                self._store(prompt_name, prompt)
+            return prompt
+
+    def get_version(self, prompt_name: str) -> Optional[str]:
+        """
+        Returns the version of the cached prompt without triggering a load.
+
+        Args:
+            prompt_name: Name of the prompt
+
+        Returns:
+            The version identifier or None if the prompt is not cached
+        """
+        with self._lock:
+            entry = self._entries.get(prompt_name)
+            return entry.version if entry is not None else None
+
+    def put(self, prompt_name: str, prompt: Any) -> None:
+        """
+        Stores a prompt directly, e.g. to warm the cache or for offline runs.
+
+        Args:
+            prompt_name: Name of the prompt
+            prompt: The prompt object
+        """
+        self._store(prompt_name, prompt)
+
+    def refresh(self, prompt_name: str) -> bool:
+        """
+        Refreshes a prompt synchronously.
+
+        Args:
+            prompt_name: Name of the prompt
+
+        Returns:
+            True if a fresh prompt was loaded, False if the stale one is kept
+        """
+        return self._refresh(prompt_name)
+
+    def invalidate(self, prompt_name: Optional[str] = None) -> None:
+        """
+        Removes one or all prompts from the cache.
+
+        Args:
+            prompt_name: Name of the prompt, or None to clear the whole cache
+        """
+        with self._lock:
+            if prompt_name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(prompt_name, None)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns a snapshot of the cache counters.
+
+        Returns:
+            A dictionary with hits, misses, stale_hits, refreshes and refresh_failures
+        """
+        with self._lock:
+            return dict(self._stats, cached_prompts=len(self._entries))
+
+    def _refresh(self, prompt_name: str) -> bool:
+        try:
+            prompt = self._loader(prompt_name)
+        except Exception as e:
+            print(f"Prompt refresh for '{prompt_name}' failed: {e}")
+            prompt = None
+
+        if prompt is not None:
+            self._store(prompt_name, prompt)
+            with self._lock:
+                self._stats["refreshes"] += 1
+            return True
+
+        # Keep serving the stale prompt and retry later
+        with self._lock:
+            self._stats["refresh_failures"] += 1
+            entry = self._entries.get(prompt_name)
+            if entry is not None:
+                entry.refreshing = False
+                entry.next_refresh_at = self._clock() + min(self._retry_interval, self._ttl)
+        return False
+
+    def _store(self, prompt_name: str, prompt: Any) -> None:
+        version = prompt_fingerprint(prompt)
+        with self._lock:
+            self._entries[prompt_name] = _PromptEntry(
+                prompt=prompt,
+                version=version,
+                next_refresh_at=self._clock() + self._ttl
+            )
@@ -0,0 +1,295 @@
+"""
+Process-wide limiter for Anthropic calls.
+
+This file combines a requests-per-minute and a tokens-per-minute token bucket
+with AIMD-style adaptive concurrency: the concurrency limit grows by one per
+window of successful calls and is cut multiplicatively on 429/overloaded
+responses. A retry-after header pauses all calls until it has passed. The
+limiter is shared by threads and async tasks of one process, waiting calls
+are admitted in the order of the priority scheduler.
+"""
+import asyncio
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+from graph.config import (
+    RATE_LIMIT_RPM,
+    RATE_LIMIT_TPM,
+    LIMITER_INITIAL_CONCURRENCY,
+    LIMITER_MIN_CONCURRENCY,
+    LIMITER_MAX_CONCURRENCY,
+    LIMITER_DECREASE_FACTOR
+)
+from graph.services.metrics import metrics
+from graph.services.scheduler import WeightedFairQueue, Ticket, current_priority
+
+# Status codes of rate limit (429) and overloaded (529) responses
+OVERLOAD_STATUS_CODES = (429, 529)
+
+# Poll interval of async waiters blocked by the concurrency limit or queued behind others
+_ASYNC_POLL_INTERVAL = 0.01
+
+# Upper bound of a sync wait, so that starving calls are promoted in time
+_SYNC_POLL_INTERVAL = 0.05
+
+
+def classify_error(error: BaseException) -> Tuple[bool, Optional[float]]:
+    """
+    Detects rate limit and overloaded errors of the Anthropic SDK.
+
+    Args:
+        error: The exception raised by the LLM call
+
+    Returns:
+        A tuple (overloaded, retry_after in seconds or None)
+    """
+    status_code = getattr(error, "status_code", None)
+    if status_code not in OVERLOAD_STATUS_CODES:
+        return False, None
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms") is not None:
+            return True, float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after") is not None:
+            return True, float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return True, None
+
+
+def is_overloaded_error(error: BaseException) -> bool:
+    """Returns True for 429/529 responses, used by the retry policy."""
+    return classify_error(error)[0]
+
+
+class TokenBucket:
+    """Token bucket that refills continuously, not thread-safe on its own."""
+
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            per_minute: Capacity and refill per minute, 0 disables the bucket
+            clock: Time source, replaceable in tests
+        """
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self._clock = clock
+        self.tokens = self.capacity
+        self._updated = clock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Returns the seconds until `amount` tokens are available (0 if available now)."""
+        if not self.enabled:
+            return 0.0
+        self._refill()
+        # Requests larger than the bucket only wait for a full bucket
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        """Removes tokens, wait_time must have returned 0 before."""
+        if self.enabled:
+            self.tokens -= min(amount, self.capacity)
+
+
+class AdaptiveLimiter:
+    """Thread- and asyncio-safe RPM/TPM limiter with AIMD concurrency."""
+
+    def __init__(
+        self,
+        rpm: float = RATE_LIMIT_RPM,
+        tpm: float = RATE_LIMIT_TPM,
+        initial_concurrency: int = LIMITER_INITIAL_CONCURRENCY,
+        min_concurrency: int = LIMITER_MIN_CONCURRENCY,
+        max_concurrency: int = LIMITER_MAX_CONCURRENCY,
+        decrease_factor: float = LIMITER_DECREASE_FACTOR,
+        queue: Optional[WeightedFairQueue] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            rpm: Requests per minute, 0 for no limit
+            tpm: Tokens per minute, 0 for no limit
+            initial_concurrency: Concurrency limit at start
+            min_concurrency: Lower bound of the concurrency limit
+            max_concurrency: Upper bound of the concurrency limit
+            decrease_factor: Factor applied to the limit on 429/overloaded responses
+            queue: Admission order of waiting calls, weighted fair queuing by default
+            clock: Time source, replaceable in tests
+        """
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        self.decrease_factor = decrease_factor
+        self.limit = float(min(max(initial_concurrency, self.min_concurrency), self.max_concurrency))
+        self._requests = TokenBucket(rpm, clock)
+        self._tokens = TokenBucket(tpm, clock)
+        self._clock = clock
+        self._blocked_until = 0.0
+        self._in_flight = 0
+        self._queue = queue or WeightedFairQueue()
+        self._condition = threading.Condition()
+
+    def _try_acquire(self, tokens: int, ticket: Optional[Ticket] = None) -> Tuple[bool, Optional[float]]:
+        """Returns (acquired, wait seconds), None waits for a release. Caller holds the lock."""
+        if ticket is not None and self._queue.head() is not ticket:
+            return False, None
+        wait = max(
+            self._blocked_until - self._clock(),
+            self._requests.wait_time(1),
+            self._tokens.wait_time(tokens)
+        )
+        if wait > 0:
+            return False, wait
+        if self._in_flight >= int(self.limit):
+            return False, None
+        self._requests.consume(1)
+        self._tokens.consume(tokens)
+        self._in_flight += 1
+        if ticket is not None:
+            self._queue.remove(ticket)
+            # The next ticket in line may be able to start right away
+            self._condition.notify_all()
+        return True, 0.0
+
+    def _publish(self) -> None:
+        for priority in self._queue.priorities():
+            metrics.set_gauge("shipmentbot_limiter_queue_depth", self._queue.depth(priority), priority=priority)
+        metrics.set_gauge("shipmentbot_limiter_in_flight", self._in_flight)
+        metrics.set_gauge("shipmentbot_limiter_concurrency_limit", int(self.limit))
+
+    def acquire(self, tokens: int = 0, priority: Optional[str] = None) -> None:
+        """
+        Blocks the current thread until the call may start.
+
+        Args:
+            tokens: Estimated tokens of the call, charged to the TPM bucket
+            priority: Priority class, the class of the current request if None
+        """
+        started = time.perf_counter()
+        with self._condition:
+            ticket = self._queue.enqueue(priority or current_priority())
+            self._publish()
+            try:
+                while True:
+                    acquired, wait = self._try_acquire(tokens, ticket)
+                    if acquired:
+                        break
+                    self._condition.wait(min(wait, _SYNC_POLL_INTERVAL) if wait is not None else _SYNC_POLL_INTERVAL)
+            finally:
+                self._queue.remove(ticket, admitted=False)
+                self._publish()
+        metrics.observe("shipmentbot_limiter_wait_seconds", time.perf_counter() - started, priority=ticket.priority)
+
+    async def aacquire(self, tokens: int = 0, priority: Optional[str] = None) -> None:
+        """
+        Waits without blocking the event loop until the call may start.
+
+        Args:
+            tokens: Estimated tokens of the call, charged to the TPM bucket
+            priority: Priority class, the class of the current request if None
+        """
+        started = time.perf_counter()
+        with self._condition:
+            ticket = self._queue.enqueue(priority or current_priority())
+            self._publish()
+        try:
+            while True:
+                with self._condition:
+                    acquired, wait = self._try_acquire(tokens, ticket)
+                if acquired:
+                    break
+                await asyncio.sleep(min(wait, _SYNC_POLL_INTERVAL) if wait is not None else _ASYNC_POLL_INTERVAL)
+        finally:
+            with self._condition:
+                self._queue.remove(ticket, admitted=False)
+                self._condition.notify_all()
+                self._publish()
+        metrics.observe("shipmentbot_limiter_wait_seconds", time.perf_counter() - started, priority=ticket.priority)
+
+    def release(self, error: Optional[BaseException] = None) -> None:
+        """
+        Ends a call and adapts the concurrency limit.
+
+        Args:
+            error: The exception of the call, None on success
+        """
+        overloaded, retry_after = classify_error(error) if error is not None else (False, None)
+        with self._condition:
+            self._in_flight -= 1
+            if overloaded:
+                self.limit = max(self.min_concurrency, self.limit * self.decrease_factor)
+                if retry_after:
+                    self._blocked_until = max(self._blocked_until, self._clock() + retry_after)
+                metrics.inc("shipmentbot_limiter_backoffs_total")
+            elif error is None:
+                # Additive increase: about +1 per window of `limit` successful calls
+                self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+            self._publish()
+            self._condition.notify_all()
+
+    def call(self, func: Callable[[], Any], tokens: int = 0) -> Any:
+        """
+        Executes a blocking call within the limits.
+
+        Args:
+            func: The LLM call
+            tokens: Estimated tokens of the call
+
+        Returns:
+            The result of func
+        """
+        self.acquire(tokens)
+        try:
+            result = func()
+        except BaseException as e:
+            self.release(e)
+            raise
+        self.release()
+        return result
+
+    async def acall(self, func: Callable[[], Awaitable[Any]], tokens: int = 0) -> Any:
+        """
+        Async variant of call.
+
+        Args:
+            func: Returns the awaitable of the LLM call
+            tokens: Estimated tokens of the call
+
+        Returns:
+            The result of the awaitable
+        """
+        await self.aacquire(tokens)
+        try:
+            result = await func()
+        except BaseException as e:
+            self.release(e)
+            raise
+        self.release()
+        return result
+
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of the limiter state.
+
+        Returns:
+            A dictionary with concurrency limit, calls in flight and waiting calls
+        """
+        with self._condition:
+            return {
+                "concurrency_limit": int(self.limit),
+                "in_flight": self._in_flight,
+                "waiting": self._queue.depth(),
+                "blocked_for_s": round(max(0.0, self._blocked_until - self._clock()), 3)
+            }
@@ -0,0 +1,192 @@
+"""
+Extraction result cache for Shipmentbot.
+
+This file provides a content-addressed cache for extraction results. The key
+is derived from the normalized input text, the prompt version and the model
+configuration. Results are kept in a bounded in-memory LRU tier and in an
+optional persistent SQLite tier, both with TTL eviction.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from graph.config import RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_TTL, RESULT_CACHE_PATH
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalizes an inquiry text for cache lookups.
+
+    Args:
+        text: The raw inquiry text
+
+    Returns:
+        The text with unified unicode forms and collapsed whitespace
+    """
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def build_cache_key(text: str, prompt_version: str, **model_config: Any) -> str:
+    """
+    Builds the content-addressed cache key for an extraction.
+
+    Args:
+        text: The raw inquiry text
+        prompt_version: Version of the extraction prompt
+        **model_config: Model parameters that influence the result (model, temperature, ...)
+
+    Returns:
+        A hex digest identifying the extraction
+    """
+    payload = json.dumps(
+        {"text": normalize_text(text), "prompt_version": prompt_version, "model": model_config},
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Two-tier (memory LRU + SQLite) cache for extraction results."""
+
+    def __init__(
+        self,
+        max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+        ttl: float = RESULT_CACHE_TTL,
+        db_path: Optional[str] = RESULT_CACHE_PATH,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        Args:
+            max_entries: Maximum number of entries in the memory tier
+            ttl: Seconds until an entry expires
+            db_path: Path of the SQLite file, None or "" disables the disk tier
+            clock: Time source, injectable for tests
+        """
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._db_path = db_path or None
+        self._clock = clock
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0}
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Looks up a cached result.
+
+        Args:
+            key: The cache key
+
+        Returns:
+            A fresh copy of the cached result or None
+        """
+        now = self._clock()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return json.loads(value)
+                del self._memory[key]
+
+            connection = self._connect()
+            if connection is not None:
+                row = connection.execute(
+                    "SELECT value, expires_at FROM results WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    self._remember(key, row[0], row[1])
+                    self._stats["disk_hits"] += 1
+                    return json.loads(row[0])
+
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key: str, result: Dict[str, Any]) -> None:
+        """
+        Stores a result in both tiers.
+
+        Args:
+            key: The cache key
+            result: A JSON-serializable extraction result
+        """
+        value = json.dumps(result, ensure_ascii=False)
+        expires_at = self._clock() + self._ttl
+        with self._lock:
+            self._remember(key, value, expires_at)
+            connection = self._connect()
+            if connection is not None:
+                connection.execute(
+                    "INSERT OR REPLACE INTO results (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, expires_at)
+                )
+            self._stats["writes"] += 1
+
+    def evict_expired(self) -> int:
+        """
+        Removes expired entries from both tiers.
+
+        Returns:
+            The number of entries removed from the disk tier
+        """
+        now = self._clock()
+        with self._lock:
+            for key in [k for k, (_, expires_at) in self._memory.items() if expires_at <= now]:
+                del self._memory[key]
+            connection = self._connect()
+            if connection is None:
+                return 0
+            return connection.execute("DELETE FROM results WHERE expires_at <= ?", (now,)).rowcount
+
+    def clear(self) -> None:
+        """Removes all entries from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            connection = self._connect()
+            if connection is not None:
+                connection.execute("DELETE FROM results")
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns a snapshot of the cache counters.
+
+        Returns:
+            A dictionary with hit, miss and write counters and the memory tier size
+        """
+        with self._lock:
+            return dict(self._stats, memory_entries=len(self._memory))
+
+    def _remember(self, key: str, value: str, expires_at: float) -> None:
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_entries:
+            self._memory.popitem(last=False)
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        # Opened lazily so that importing the module has no file system side effects
+        if self._db_path is None:
+            return None
+        if self._connection is None:
+            directory = os.path.dirname(self._db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(
+                self._db_path, check_same_thread=False, isolation_level=None
+            )
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS results "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._connection.execute("DELETE FROM results WHERE expires_at <= ?", (self._clock(),))
+        return self._connection
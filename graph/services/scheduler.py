@@ -0,0 +1,185 @@
+"""
+Priority scheduling for Shipmentbot.
+
+This file decides which waiting LLM call is admitted next when the limiter
+is saturated. Calls belong to priority classes (interactive, bulk) that share
+the capacity by weighted fair queuing, so interactive requests overtake bulk
+jobs without starving them: a call that has waited longer than the
+starvation bound is admitted first regardless of its class.
+
+The priority of the current request is kept in a context variable, which is
+set by the shipment extractor from the graph config:
+
+    graph.invoke(state, config={"configurable": {"priority": "bulk"}})
+"""
+import contextvars
+import itertools
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Optional
+
+from graph.config import SCHEDULER_WEIGHTS, SCHEDULER_MAX_WAIT
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+# Class used for requests without a priority hint (UI and API users)
+DEFAULT_PRIORITY = INTERACTIVE
+
+_current_priority: contextvars.ContextVar[str] = contextvars.ContextVar("shipmentbot_priority", default=DEFAULT_PRIORITY)
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """
+    Parses class weights like "interactive:8,bulk:1".
+
+    Args:
+        spec: Comma-separated class:weight pairs
+
+    Returns:
+        A dictionary of class weights
+    """
+    weights = {}
+    for part in spec.split(","):
+        if ":" not in part:
+            continue
+        name, weight = part.split(":", 1)
+        weights[name.strip().lower()] = max(float(weight), 0.001)
+    return weights or {INTERACTIVE: 8.0, BULK: 1.0}
+
+
+def get_priority_from_config(config: Optional[Dict[str, Any]]) -> str:
+    """
+    Reads the priority hint from a LangGraph/LangChain config.
+
+    Args:
+        config: The RunnableConfig passed to the node, may be None
+
+    Returns:
+        The priority class, DEFAULT_PRIORITY if no hint is given
+    """
+    configurable = (config or {}).get("configurable") or {}
+    return str(configurable.get("priority") or DEFAULT_PRIORITY).lower()
+
+
+def current_priority() -> str:
+    """Returns the priority class of the current request."""
+    return _current_priority.get()
+
+
+@contextmanager
+def priority_scope(priority: str) -> Iterator[None]:
+    """
+    Sets the priority class for all LLM calls in the block (threads started
+    with a copied context and async tasks inherit it).
+
+    Args:
+        priority: The priority class
+    """
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class Ticket:
+    """A waiting call in the WeightedFairQueue."""
+
+    __slots__ = ("priority", "tag", "enqueued_at", "sequence")
+
+    def __init__(self, priority: str, tag: float, enqueued_at: float, sequence: int):
+        self.priority = priority
+        self.tag = tag
+        self.enqueued_at = enqueued_at
+        self.sequence = sequence
+
+
+class WeightedFairQueue:
+    """
+    Weighted fair queue of waiting calls with starvation protection.
+    Not thread-safe on its own, the limiter holds its lock while using it.
+    """
+
+    def __init__(
+        self,
+        weights: Optional[Dict[str, float]] = None,
+        max_wait: float = SCHEDULER_MAX_WAIT,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            weights: Share of each priority class, unknown classes get the lowest weight
+            max_wait: Seconds after which a waiting call is admitted before all others
+            clock: Time source, replaceable in tests
+        """
+        self.weights = weights or parse_weights(SCHEDULER_WEIGHTS)
+        self.max_wait = max_wait
+        self._clock = clock
+        self._queues: Dict[str, Deque[Ticket]] = {}
+        self._last_tag: Dict[str, float] = {}
+        self._virtual_time = 0.0
+        self._sequence = itertools.count()
+
+    def _weight(self, priority: str) -> float:
+        return self.weights.get(priority, min(self.weights.values()))
+
+    def enqueue(self, priority: str) -> Ticket:
+        """
+        Adds a waiting call.
+
+        Args:
+            priority: The priority class of the call
+
+        Returns:
+            The ticket identifying the call
+        """
+        # Virtual finish time: a class with weight w advances by 1/w per call
+        start = max(self._virtual_time, self._last_tag.get(priority, 0.0))
+        tag = start + 1.0 / self._weight(priority)
+        self._last_tag[priority] = tag
+        ticket = Ticket(priority, tag, self._clock(), next(self._sequence))
+        self._queues.setdefault(priority, deque()).append(ticket)
+        return ticket
+
+    def head(self) -> Optional[Ticket]:
+        """
+        Returns the call that is admitted next.
+
+        Returns:
+            The oldest starving ticket, otherwise the ticket with the smallest finish time
+        """
+        heads = [queue[0] for queue in self._queues.values() if queue]
+        if not heads:
+            return None
+        now = self._clock()
+        starving = [ticket for ticket in heads if now - ticket.enqueued_at >= self.max_wait]
+        if starving:
+            return min(starving, key=lambda ticket: ticket.sequence)
+        return min(heads, key=lambda ticket: (ticket.tag, ticket.sequence))
+
+    def remove(self, ticket: Ticket, admitted: bool = True) -> None:
+        """
+        Removes a ticket after it was admitted or abandoned (e.g. cancelled).
+
+        Args:
+            ticket: The ticket returned by enqueue
+            admitted: Whether the call was admitted, only then the virtual time advances
+        """
+        queue = self._queues.get(ticket.priority)
+        if queue is None or ticket not in queue:
+            return
+        queue.remove(ticket)
+        if admitted:
+            self._virtual_time = max(self._virtual_time, ticket.tag - 1.0 / self._weight(ticket.priority))
+
+    def depth(self, priority: Optional[str] = None) -> int:
+        """Returns the number of waiting calls, of one class or in total."""
+        if priority is not None:
+            return len(self._queues.get(priority, ()))
+        return sum(len(queue) for queue in self._queues.values())
+
+    def priorities(self) -> list:
+        """Returns all classes that have been seen so far."""
+        return list(self._queues)
@@ -3,18 +3,65 @@ Shipment Graph Definition.
 
 This file defines the LangGraph for the extraction of shipment data.
 """
+import argparse
+import threading
 from langgraph.graph import StateGraph, END, START
-from typing import TypedDict, Optional, List, Dict, Any, Union, Callable
-from langgraph.checkpoint.memory import MemorySaver
+from typing import TypedDict, Optional, List, Dict, Any, Union, Callable, Annotated
+from langchain_core.runnables import RunnableLambda
+
+from graph.services.metrics import timed_node
+from graph.services.checkpointer import create_checkpointer
 
 # Import of the Shipment Extractor
-from graph.nodes.shipment_extractor import process_shipment
+from graph.nodes.shipment_extractor import process_shipment, aprocess_shipment
+
+# Import of the conversation history handling (message window, follow-ups)
+from graph.nodes.conversation_history import (
+    manage_history,
+    amanage_history,
+    route_follow_up,
+    remember_extraction,
+    aremember_extraction
+)
+
+# Import of the Input Compactor
+from graph.nodes.input_compactor import compact_input, acompact_input
+
+# Import of the rule-based Fast Extractor
+from graph.nodes.fast_extractor import fast_extract, afast_extract, route_after_fast_extractor
+
+# Import of the Model Router
+from graph.nodes.model_router import route_model, aroute_model
+
+# Import of the Splitter for multi-shipment inquiries
+from graph.nodes.shipment_splitter import (
+    split_shipment,
+    asplit_shipment,
+    route_segments,
+    extract_segment,
+    aextract_segment,
+    merge_segments,
+    amerge_segments,
+    reduce_segment_results
+)
 
 # Definition of the state type with precise type annotations
 class ShipmentState(TypedDict):
     messages: List[str]  # More precise than Sequence
     extracted_data: Optional[Dict[str, Any]]  # Explicitly Optional
     message: Optional[str]  # Explicitly Optional
+    degraded: Optional[bool]  # True if the result was created without the LLM (circuit breaker open)
+    partial: Optional[bool]  # True if some segments of the inquiry could not be extracted
+    failed_segments: Optional[List[int]]  # Indices of the segments missing from a partial result
+    compacted_input: Optional[str]  # Latest message without quotes, signatures and boilerplate
+    compaction: Optional[Dict[str, int]]  # Estimated tokens before and after input compaction
+    fast_path_confidence: Optional[float]  # Confidence of the rule-based extraction
+    model_tier: Optional[str]  # Model tier selected by the router (small or large)
+    segments: List[str]  # Independent shipment segments of the latest message
+    segment_results: Annotated[List[Dict[str, Any]], reduce_segment_results]  # Results of the parallel branches
+    history_summary: Optional[str]  # Shipment-relevant lines of messages trimmed from the window
+    follow_up: Optional[bool]  # True if the latest message refines the previous extraction
+    last_shipment: Optional[Dict[str, Any]]  # Latest successful extraction of the thread
 
 def validate_state(state: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -39,14 +86,51 @@ def validate_state(state: Dict[str, Any]) -> Dict[str, Any]:
     if "message" not in validated_state:
         validated_state["message"] = None
     
+    # Every turn starts as a regular (not degraded) extraction of the new message
+    validated_state["degraded"] = False
+    validated_state["partial"] = False
+    validated_state["failed_segments"] = None
+    validated_state["compacted_input"] = None
+    # Routing results of the previous turn must not carry over into a follow-up
+    validated_state["fast_path_confidence"] = None
+    validated_state["model_tier"] = None
+    
     return validated_state
 
-def create_shipment_graph(with_checkpointer: bool = False) -> Callable:
+async def avalidate_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Async variant of validate_state, so that graph.ainvoke needs no thread hop.
+    
+    Args:
+        state: The state to validate
+        
+    Returns:
+        A validated state with all required fields
+    """
+    return validate_state(state)
+
+def create_node(name: str, func: Callable, afunc: Callable) -> RunnableLambda:
+    """
+    Creates a graph node with a sync and a native async implementation,
+    both recorded in shipmentbot_node_duration_seconds.
+    
+    Args:
+        name: Name of the node
+        func: Sync implementation
+        afunc: Async implementation
+        
+    Returns:
+        A runnable that can be added to the graph
+    """
+    return RunnableLambda(timed_node(name, func), afunc=timed_node(name, afunc), name=name)
+
+def build_shipment_graph(with_checkpointer: bool = False) -> Callable:
     """
-    Creates a LangGraph for the extraction of shipment data.
+    Builds and compiles a new LangGraph for the extraction of shipment data.
+    Prefer create_shipment_graph, which returns a cached instance.
     
     Args:
-        with_checkpointer: Whether to use a memory checkpointer for persistence
+        with_checkpointer: Whether to use a checkpointer for persistence
         
     Returns:
         A compiled LangGraph that can be used for shipment data extraction
@@ -55,29 +139,124 @@ def create_shipment_graph(with_checkpointer: bool = False) -> Callable:
     graph = StateGraph(ShipmentState)
     
     # Add the validation function as a separate node
-    graph.add_node("validate", validate_state)
+    # Each node has a sync and a native async implementation
+    graph.add_node("validate", create_node("validate", validate_state, avalidate_state))
+    
+    # Add the input compactor, which strips quotes, signatures and boilerplate
+    graph.add_node("compactor", create_node("compactor", compact_input, acompact_input))
+    
+    # Add the history node, which trims the message window and detects follow-ups on the compacted text
+    graph.add_node("history", create_node("history", manage_history, amanage_history))
+    
+    # Add the rule-based fast extractor, which skips the LLM for simple inputs
+    graph.add_node("fast_extractor", create_node("fast_extractor", fast_extract, afast_extract))
+    
+    # Add the splitter, which fans out multi-shipment inquiries to parallel extractions
+    graph.add_node("splitter", create_node("splitter", split_shipment, asplit_shipment))
+    graph.add_node("segment_extractor", create_node("segment_extractor", extract_segment, aextract_segment))
+    graph.add_node("merge_segments", create_node("merge_segments", merge_segments, amerge_segments))
+    
+    # Add the model router, which selects the model tier per request
+    graph.add_node("model_router", create_node("model_router", route_model, aroute_model))
     
     # Add the shipment extractor as a node
-    graph.add_node("shipment_extractor", process_shipment)
+    graph.add_node("shipment_extractor", create_node("shipment_extractor", process_shipment, aprocess_shipment))
+    
+    # Add the final node, which keeps the result as the base for follow-up messages
+    graph.add_node("remember", create_node("remember", remember_extraction, aremember_extraction))
     
     # Define the edges - with validation as the first step
     graph.add_edge(START, "validate")
-    graph.add_edge("validate", "shipment_extractor")
-    graph.add_edge("shipment_extractor", END)
+    graph.add_edge("validate", "compactor")
+    graph.add_edge("compactor", "history")
+    # Follow-ups refine the previous extraction, so they skip the fast path and the splitter
+    graph.add_conditional_edges(
+        "history",
+        route_follow_up,
+        {"follow_up": "model_router", "new_inquiry": "fast_extractor"}
+    )
+    # Only low-confidence inputs are sent to Claude
+    graph.add_conditional_edges(
+        "fast_extractor",
+        route_after_fast_extractor,
+        {"done": "remember", "shipment_extractor": "splitter"}
+    )
+    # Several segments run as parallel branches, a single one goes to the extractor
+    graph.add_conditional_edges("splitter", route_segments, ["model_router", "segment_extractor"])
+    graph.add_edge("model_router", "shipment_extractor")
+    graph.add_edge("segment_extractor", "merge_segments")
+    graph.add_edge("merge_segments", "remember")
+    graph.add_edge("shipment_extractor", "remember")
+    graph.add_edge("remember", END)
     
-    # Create a checkpointer for persistence, if desired
-    checkpointer = MemorySaver() if with_checkpointer else None
+    # Create a checkpointer for persistence, if desired (memory by default, CHECKPOINT_BACKEND=sqlite for SQLite)
+    checkpointer = create_checkpointer() if with_checkpointer else None
     
     # Compile the graph
-    compiled_graph = graph.compile(checkpointer=checkpointer)
-    
-    # Try to visualize the graph
-    try:
-        png_data = compiled_graph.get_graph().draw_mermaid_png()
-        with open("workflow_graph.png", "wb") as f:
-            f.write(png_data)
-        print("Workflow diagram has been saved as 'workflow_graph.png'.")
-    except Exception as e:
-        print(f"Visualization could not be created: {e}")
-    
-    return compiled_graph 
\ No newline at end of file
+    return graph.compile(checkpointer=checkpointer)
+
+
+# Compiled graphs per configuration, shared by all callers in the process
+_graph_cache: Dict[Any, Callable] = {}
+_graph_cache_lock = threading.Lock()
+
+
+def create_shipment_graph(with_checkpointer: bool = False) -> Callable:
+    """
+    Returns the compiled LangGraph for the extraction of shipment data.
+    The graph is compiled once per configuration and reused afterwards,
+    so repeated calls (e.g. Streamlit reruns) do no compilation or I/O.
+    
+    Args:
+        with_checkpointer: Whether to use a checkpointer for persistence
+        
+    Returns:
+        A compiled LangGraph that can be used for shipment data extraction
+    """
+    key = (with_checkpointer,)
+    with _graph_cache_lock:
+        compiled_graph = _graph_cache.get(key)
+        if compiled_graph is None:
+            compiled_graph = build_shipment_graph(with_checkpointer=with_checkpointer)
+            _graph_cache[key] = compiled_graph
+        return compiled_graph
+
+
+def clear_graph_cache() -> None:
+    """Discards all cached compiled graphs."""
+    with _graph_cache_lock:
+        _graph_cache.clear()
+
+
+def render_graph_diagram(output_path: str = "workflow_graph.png") -> str:
+    """
+    Renders the workflow diagram as PNG.
+    This uses the remote Mermaid rendering service and is therefore an
+    explicit step that is never executed on the request path.
+    
+    Args:
+        output_path: Path of the PNG file to write
+        
+    Returns:
+        The path of the written file
+    """
+    png_data = build_shipment_graph().get_graph().draw_mermaid_png()
+    with open(output_path, "wb") as f:
+        f.write(png_data)
+    return output_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shipmentbot graph utilities")
+    parser.add_argument("--render", action="store_true", help="Render the workflow diagram as PNG")
+    parser.add_argument("--output", default="workflow_graph.png", help="Output path of the diagram")
+    args = parser.parse_args()
+    
+    if args.render:
+        try:
+            path = render_graph_diagram(args.output)
+            print(f"Workflow diagram has been saved as '{path}'.")
+        except Exception as e:
+            print(f"Visualization could not be created: {e}")
+    else:
+        parser.print_help()
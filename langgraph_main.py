@@ -15,7 +15,7 @@ load_dotenv()
 if "LANGCHAIN_PROJECT" not in os.environ:
     os.environ["LANGCHAIN_PROJECT"] = os.getenv("LANGSMITH_PROJECT", "Shipmentbot")
 
-# Erstelle den Graph mit Persistenz für LangGraph Platform
+# Erstelle den Graph mit Persistenz für LangGraph Platform (MemorySaver, SQLite mit CHECKPOINT_BACKEND=sqlite)
 graph = create_shipment_graph(with_checkpointer=True)
 
 # Diese Variable wird von LangGraph Platform erkannt, um den Graph zu verwenden
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+"""
+Checkpointer-Benchmark für den Shipmentbot.
+
+Dieses Skript führt einen kleinen Konversationsgraphen mit vielen Threads
+und mehreren Turns pro Thread einmal mit MemorySaver und einmal mit dem
+SqliteCheckpointSaver aus und vergleicht Schreibdurchsatz, Python-Heap
+(tracemalloc), Anzahl gespeicherter Checkpoints und Größe der Datenbank.
+
+Verwendung:
+    python -m tests.benchmarks.checkpointer_benchmark --threads 200 --turns 10
+"""
+import argparse
+import json
+import operator
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Annotated, List, TypedDict
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import StateGraph, START, END
+
+from graph.services.checkpointer import SqliteCheckpointSaver
+
+MESSAGE = "Ich benötige einen Transport für 3 Europaletten, 120x80x100cm, je 250kg, stapelbar."
+
+
+class ConversationState(TypedDict):
+    messages: Annotated[List[str], operator.add]
+    extracted_data: dict
+
+
+def answer(state):
+    """Ersetzt die Extraktion durch eine konstante Antwort, gemessen wird nur die Persistenz."""
+    return {"extracted_data": {"items": [{"quantity": 3}], "turns": len(state["messages"])}}
+
+
+def build_graph(checkpointer):
+    graph = StateGraph(ConversationState)
+    graph.add_node("answer", answer)
+    graph.add_edge(START, "answer")
+    graph.add_edge("answer", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+def run_saver(name, saver, threads, turns):
+    """
+    Führt alle Turns mit einem Saver aus.
+
+    Args:
+        name: Bezeichnung im Bericht
+        saver: Der zu messende Checkpointer
+        threads: Anzahl Konversationen
+        turns: Turns pro Konversation
+
+    Returns:
+        Ein Dictionary mit den Messwerten
+    """
+    app = build_graph(saver)
+    tracemalloc.start()
+    start = time.perf_counter()
+    for turn in range(turns):
+        for thread in range(threads):
+            app.invoke({"messages": [MESSAGE]}, {"configurable": {"thread_id": f"thread-{thread}"}})
+    if isinstance(saver, SqliteCheckpointSaver):
+        saver.flush()
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    if isinstance(saver, SqliteCheckpointSaver):
+        stored = saver.stats()["checkpoints"]
+    else:
+        stored = sum(len(checkpoints) for namespaces in saver.storage.values() for checkpoints in namespaces.values())
+    invocations = threads * turns
+    return {
+        "saver": name,
+        "invocations": invocations,
+        "elapsed_s": round(elapsed, 3),
+        "invocations_per_s": round(invocations / elapsed, 1) if elapsed else None,
+        "checkpoints_stored": stored,
+        "python_heap_mb": round(current / (1024 * 1024), 2),
+        "python_heap_peak_mb": round(peak / (1024 * 1024), 2)
+    }
+
+
+def run_benchmark(threads, turns, max_checkpoints_per_thread=5, batch_size=32, reports_dir=None):
+    """
+    Vergleicht MemorySaver mit dem SqliteCheckpointSaver.
+
+    Args:
+        threads: Anzahl Konversationen
+        turns: Turns pro Konversation
+        max_checkpoints_per_thread: Aufbewahrungsgrenze des SQLite-Savers
+        batch_size: Schreibvorgänge pro Transaktion des SQLite-Savers
+        reports_dir: Zielverzeichnis, None schreibt keine Datei
+
+    Returns:
+        Ein Dictionary mit Konfiguration und Ergebnissen pro Saver
+    """
+    results = [run_saver("memory", MemorySaver(), threads, turns)]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "checkpoints.sqlite3")
+        saver = SqliteCheckpointSaver(
+            db_path=db_path,
+            max_checkpoints_per_thread=max_checkpoints_per_thread,
+            batch_size=batch_size,
+            maintenance_interval=0
+        )
+        result = run_saver("sqlite", saver, threads, turns)
+        saver.compact()
+        saver.close()
+        result["db_size_mb"] = round(os.path.getsize(db_path) / (1024 * 1024), 2)
+        results.append(result)
+
+    benchmark = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": {
+            "threads": threads,
+            "turns": turns,
+            "max_checkpoints_per_thread": max_checkpoints_per_thread,
+            "batch_size": batch_size
+        },
+        "results": results
+    }
+
+    if reports_dir is not None:
+        os.makedirs(reports_dir, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(reports_dir, f"checkpointer_benchmark_{timestamp}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(benchmark, f, indent=2)
+        benchmark["report_path"] = path
+    return benchmark
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checkpointer-Benchmark: MemorySaver gegen SQLite")
+    parser.add_argument("--threads", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--max-per-thread", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--reports-dir", default=os.path.join(PROJECT_ROOT, "tests", "reports"))
+    args = parser.parse_args()
+
+    benchmark = run_benchmark(
+        args.threads,
+        args.turns,
+        max_checkpoints_per_thread=args.max_per_thread,
+        batch_size=args.batch_size,
+        reports_dir=args.reports_dir
+    )
+    for result in benchmark["results"]:
+        print(
+            f"{result['saver']:>6}  invocations={result['invocations']}  "
+            f"throughput={result['invocations_per_s']} inv/s  "
+            f"checkpoints={result['checkpoints_stored']}  "
+            f"heap={result['python_heap_mb']} MB (peak {result['python_heap_peak_mb']} MB)"
+            + (f"  db={result['db_size_mb']} MB" if "db_size_mb" in result else "")
+        )
+    print(f"\nBenchmark-Ergebnisse wurden gespeichert: {benchmark['report_path']}")
+
+
+if __name__ == "__main__":
+    main()
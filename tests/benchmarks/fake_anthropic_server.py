@@ -0,0 +1,238 @@
+"""
+Lokaler Ersatz für die Anthropic Messages API.
+
+Der Server beantwortet POST /v1/messages mit einer strukturierten
+Tool-Use-Antwort im Format der Messages API. Der Inhalt wird deterministisch
+mit dem regelbasierten Fast Extractor aus der Benutzernachricht erzeugt.
+Latenz, Jitter und Fehlerrate sind konfigurierbar. Die Message Batches API
+(/v1/messages/batches) wird ebenfalls nachgebildet: Ein Batch ist nach
+`batch_polls` Statusabfragen beendet, die Ergebnisse werden als JSONL geliefert.
+"""
+import json
+import itertools
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from graph.nodes.fast_extractor import extract_with_rules
+from graph.models.shipment_models import Shipment
+
+
+def _user_text(body: Dict[str, Any]) -> str:
+    """Extrahiert den Text der letzten Benutzernachricht aus dem Request."""
+    for message in reversed(body.get("messages", [])):
+        if message.get("role") != "user":
+            continue
+        content = message.get("content")
+        if isinstance(content, str):
+            return content
+        return "".join(block.get("text", "") for block in content if isinstance(block, dict))
+    return ""
+
+
+def canned_shipment(text: str) -> Dict[str, Any]:
+    """
+    Erzeugt eine deterministische strukturierte Antwort für einen Text.
+
+    Args:
+        text: Der Text der Benutzernachricht
+
+    Returns:
+        Die Tool-Eingabe im Format des Shipment-Modells
+    """
+    result = extract_with_rules(text)
+    shipment = result.shipment or Shipment(message="Please provide more details about the shipment.")
+    return json.loads(shipment.model_dump_json())
+
+
+class FakeAnthropicServer:
+    """HTTP-Server mit Threads, der die Anthropic Messages API nachbildet."""
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = 42,
+        batch_polls: int = 1,
+        host: str = "127.0.0.1",
+        port: int = 0
+    ):
+        """
+        Args:
+            latency_ms: Mittlere Antwortzeit in Millisekunden
+            jitter_ms: Maximale zufällige Abweichung der Antwortzeit
+            error_rate: Anteil der Requests, die mit 529 (overloaded) beantwortet werden
+            seed: Seed für reproduzierbare Latenzen und Fehler
+            batch_polls: Anzahl der Statusabfragen, bei denen ein Batch noch in Bearbeitung ist
+            host: Adresse, an die der Server gebunden wird
+            port: Port, 0 wählt einen freien Port
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.requests = 0
+        self.batch_polls = batch_polls
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self._batch_ids = itertools.count(1)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._cached_prefixes = set()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        """Basis-URL für ANTHROPIC_API_URL."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeAnthropicServer":
+        """Startet den Server in einem Hintergrund-Thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stoppt den Server."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeAnthropicServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _next_delay_and_error(self):
+        with self._lock:
+            self.requests += 1
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+            failed = self._random.random() < self.error_rate
+        return max(0.0, self.latency_ms + jitter) / 1000, failed
+
+    def _cache_usage(self, body: Dict[str, Any]) -> Dict[str, int]:
+        """Bildet das Prompt-Caching nach: Tools und System-Prompt bis zum cache_control-Block."""
+        system = body.get("system")
+        if not isinstance(system, list) or not any("cache_control" in block for block in system):
+            return {"cache_creation_input_tokens": 0, "cache_read_input_tokens": 0}
+        prefix = json.dumps([body.get("tools"), system], sort_keys=True)
+        tokens = len(prefix) // 4
+        with self._lock:
+            cached = prefix in self._cached_prefixes
+            self._cached_prefixes.add(prefix)
+        return {"cache_creation_input_tokens": 0 if cached else tokens, "cache_read_input_tokens": tokens if cached else 0}
+
+    def _message(self, body: Dict[str, Any], message_id: int) -> Dict[str, Any]:
+        """Erzeugt die Tool-Use-Antwort der Messages API für einen Request."""
+        text = _user_text(body)
+        tool_name = (body.get("tools") or [{"name": "Shipment"}])[0]["name"]
+        return {
+            "id": f"msg_fake_{message_id}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "fake"),
+            "content": [{
+                "type": "tool_use",
+                "id": f"toolu_fake_{message_id}",
+                "name": tool_name,
+                "input": canned_shipment(text)
+            }],
+            "stop_reason": "tool_use",
+            "stop_sequence": None,
+            "usage": dict(self._cache_usage(body), input_tokens=max(1, len(text) // 4), output_tokens=50)
+        }
+
+    def create_batch(self, requests: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Legt einen Batch an, die Ergebnisse werden sofort berechnet und nach batch_polls Abfragen geliefert."""
+        batch_id = f"msgbatch_fake_{next(self._batch_ids)}"
+        results = []
+        for index, request in enumerate(requests):
+            with self._lock:
+                failed = self._random.random() < self.error_rate
+            if failed:
+                result = {"type": "errored", "error": {"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}}}
+            else:
+                result = {"type": "succeeded", "message": self._message(request["params"], index)}
+            results.append({"custom_id": request["custom_id"], "result": result})
+        self.batches[batch_id] = {"results": results, "polls": 0}
+        return self._batch_object(batch_id)
+
+    def _batch_object(self, batch_id: str) -> Dict[str, Any]:
+        batch = self.batches[batch_id]
+        ended = batch["polls"] > self.batch_polls
+        succeeded = sum(1 for entry in batch["results"] if entry["result"]["type"] == "succeeded")
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {
+                "processing": 0 if ended else len(batch["results"]),
+                "succeeded": succeeded if ended else 0,
+                "errored": len(batch["results"]) - succeeded if ended else 0,
+                "canceled": 0,
+                "expired": 0
+            },
+            "created_at": "2024-01-01T00:00:00Z",
+            "expires_at": "2024-01-02T00:00:00Z",
+            "ended_at": "2024-01-01T00:01:00Z" if ended else None,
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": f"{self.base_url}/v1/messages/batches/{batch_id}/results" if ended else None
+        }
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))) or b"{}")
+                delay, failed = server._next_delay_and_error()
+                time.sleep(delay)
+
+                if self.path.startswith("/v1/messages/batches"):
+                    self._send_json(200, server.create_batch(body.get("requests", [])))
+                    return
+                if not self.path.startswith("/v1/messages"):
+                    self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+                    return
+                if failed:
+                    self._send_json(529, {"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}})
+                    return
+
+                self._send_json(200, server._message(body, server.requests))
+
+            def do_GET(self):
+                parts = self.path.split("?")[0].strip("/").split("/")
+                if parts[:3] != ["v1", "messages", "batches"] or len(parts) < 4 or parts[3] not in server.batches:
+                    self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+                    return
+                batch_id = parts[3]
+                if len(parts) == 4:
+                    server.batches[batch_id]["polls"] += 1
+                    self._send_json(200, server._batch_object(batch_id))
+                    return
+                data = "".join(json.dumps(entry) + "\n" for entry in server.batches[batch_id]["results"]).encode("utf-8")
+                self.send_response(200)
+                self.send_header("content-type", "application/binary")
+                self.send_header("content-length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
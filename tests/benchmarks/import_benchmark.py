@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+Import-Benchmark für den Shipmentbot.
+
+Dieses Skript importiert ein Modul (Standard: graph.shipment_graph) mehrfach
+in frischen Interpretern mit `python -X importtime`, misst die kumulierte
+Importzeit und prüft, dass das Anthropic SDK erst bei der ersten Verwendung
+geladen wird. langsmith selbst wird bereits von langchain_core importiert,
+der LangSmith-Client wird aber erst beim ersten Laden eines Prompts erzeugt.
+
+Verwendung:
+    python -m tests.benchmarks.import_benchmark --runs 5 --budget-ms 2500
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+# Module, die beim Import des Graphen nicht geladen werden dürfen
+LAZY_MODULES = ("anthropic", "langchain_anthropic")
+
+DEFAULT_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "2500"))
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def measure_import(module="graph.shipment_graph"):
+    """
+    Importiert ein Modul in einem frischen Interpreter.
+
+    Args:
+        module: Der Modulname
+
+    Returns:
+        Ein Dictionary mit der kumulierten Importzeit in ms und den geladenen Modulen
+    """
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="0", SHIPMENTBOT_LOAD_DOTENV="false")
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    cumulative_us = None
+    loaded = set()
+    for line in completed.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        loaded.add(match.group(4))
+        if match.group(4) == module:
+            cumulative_us = int(match.group(2))
+    return {"import_ms": round((cumulative_us or 0) / 1000, 1), "modules": loaded}
+
+
+def run_benchmark(module="graph.shipment_graph", runs=5, budget_ms=DEFAULT_BUDGET_MS):
+    """
+    Misst die Importzeit über mehrere Läufe.
+
+    Args:
+        module: Der Modulname
+        runs: Anzahl der Läufe, der erste wärmt den Bytecode-Cache auf und zählt nicht
+        budget_ms: Zulässige Median-Importzeit
+
+    Returns:
+        Ein Dictionary mit Median, Einzelwerten, vorzeitig geladenen Modulen und dem Budget-Ergebnis
+    """
+    measure_import(module)
+    results = [measure_import(module) for _ in range(runs)]
+    timings = [result["import_ms"] for result in results]
+    eager = sorted(
+        name for name in set().union(*(result["modules"] for result in results))
+        if any(name == lazy or name.startswith(lazy + ".") for lazy in LAZY_MODULES)
+    )
+    median_ms = statistics.median(timings)
+    return {
+        "module": module,
+        "runs_ms": timings,
+        "median_ms": median_ms,
+        "budget_ms": budget_ms,
+        "within_budget": median_ms <= budget_ms,
+        "eager_heavy_modules": eager
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-Benchmark für den Shipment-Graph")
+    parser.add_argument("--module", default="graph.shipment_graph")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    args = parser.parse_args()
+
+    benchmark = run_benchmark(args.module, args.runs, args.budget_ms)
+    print(f"{benchmark['module']}: median={benchmark['median_ms']} ms  runs={benchmark['runs_ms']}  "
+          f"budget={benchmark['budget_ms']} ms")
+    if benchmark["eager_heavy_modules"]:
+        print(f"Vorzeitig geladen: {', '.join(benchmark['eager_heavy_modules'])}")
+    if not benchmark["within_budget"] or benchmark["eager_heavy_modules"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
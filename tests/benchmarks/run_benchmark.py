@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+"""
+Benchmark-Runner für den Shipmentbot.
+
+Dieses Skript startet einen lokalen Ersatz für die Anthropic Messages API,
+führt die echte Pipeline aus create_shipment_graph über data/shipments.csv
+mit mehreren Nebenläufigkeitsstufen aus und speichert Durchsatz,
+p50/p95/p99-Latenz und Speicherverbrauch als JSON in tests/reports.
+
+Verwendung:
+    python -m tests.benchmarks.run_benchmark --concurrency 1 4 16 --latency-ms 200 --jitter-ms 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+from datetime import datetime
+
+# Offline-Konfiguration, muss vor dem Import von graph.config gesetzt werden
+os.environ["LANGSMITH_TRACING"] = "false"
+os.environ["RESULT_CACHE_PATH"] = ""
+os.environ.setdefault("ANTHROPIC_API_KEY", "sk-ant-benchmark")
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from langchain_core.prompts import PromptTemplate
+
+from graph.batch import run_batch
+from graph.config import DEFAULT_PROMPT_NAME
+from graph.nodes import shipment_extractor
+from graph.services.metrics import metrics
+from tests.benchmarks.fake_anthropic_server import FakeAnthropicServer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCHMARK_PROMPT = "Extract the shipment data from the following text:\n\n{input}"
+
+
+def peak_rss_mb():
+    """Liefert den bisherigen Spitzenwert des Arbeitsspeichers in MB (None ohne resource-Modul)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux liefert KB, macOS Bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 2)
+
+
+def cache_tokens():
+    """Summiert die gelesenen und geschriebenen Prompt-Cache-Tokens über alle Modelle."""
+    histograms = metrics.snapshot()["histograms"]
+    return {
+        kind: sum(series["sum"] for series in histograms.get(f"shipmentbot_llm_cache_{kind}_tokens", []))
+        for kind in ("read", "write")
+    }
+
+
+def prepare_offline_pipeline(base_url):
+    """
+    Richtet die Pipeline für den lokalen Server ein.
+
+    Args:
+        base_url: Basis-URL des FakeAnthropicServer
+    """
+    os.environ["ANTHROPIC_API_URL"] = base_url
+    shipment_extractor.chain_pool.clear()
+    shipment_extractor.prompt_registry.put(
+        DEFAULT_PROMPT_NAME, PromptTemplate.from_template(BENCHMARK_PROMPT)
+    )
+
+
+def run_benchmark(input_path, concurrency_levels, latency_ms=0.0, jitter_ms=0.0,
+                  error_rate=0.0, limit=None, reports_dir=None):
+    """
+    Führt den Benchmark für alle Nebenläufigkeitsstufen aus.
+
+    Args:
+        input_path: CSV-Datei mit den Anfragen
+        concurrency_levels: Liste der Nebenläufigkeitsstufen
+        latency_ms: Mittlere Antwortzeit des lokalen Servers
+        jitter_ms: Maximale Abweichung der Antwortzeit
+        error_rate: Anteil der Antworten mit 529 (overloaded)
+        limit: Maximale Anzahl Zeilen pro Stufe
+        reports_dir: Zielverzeichnis, None schreibt keine Datei
+
+    Returns:
+        Ein Dictionary mit Konfiguration und Ergebnissen pro Stufe
+    """
+    results = []
+    with FakeAnthropicServer(latency_ms=latency_ms, jitter_ms=jitter_ms, error_rate=error_rate) as server:
+        prepare_offline_pipeline(server.base_url)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for concurrency in concurrency_levels:
+                # Jede Stufe startet ohne zwischengespeicherte Ergebnisse
+                shipment_extractor.result_cache.clear()
+                requests_before = server.requests
+                cache_before = cache_tokens()
+                report = asyncio.run(run_batch(
+                    input_path,
+                    os.path.join(tmp_dir, f"results_{concurrency}.jsonl"),
+                    concurrency=concurrency,
+                    resume=False,
+                    limit=limit
+                ))
+                results.append({
+                    "concurrency": concurrency,
+                    "rows": report["processed"] + report["failed"],
+                    "failed": report["failed"],
+                    "llm_requests": server.requests - requests_before,
+                    "cache_tokens": {key: value - cache_before[key] for key, value in cache_tokens().items()},
+                    "elapsed_s": report["elapsed_s"],
+                    "throughput_rows_per_s": report["throughput_rows_per_s"],
+                    "latency": report["latency"],
+                    "peak_rss_mb": peak_rss_mb()
+                })
+
+    benchmark = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "input": os.path.relpath(input_path, PROJECT_ROOT),
+        "server": {"latency_ms": latency_ms, "jitter_ms": jitter_ms, "error_rate": error_rate},
+        "results": results
+    }
+
+    if reports_dir is not None:
+        os.makedirs(reports_dir, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(reports_dir, f"benchmark_{timestamp}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(benchmark, f, indent=2)
+        benchmark["report_path"] = path
+    return benchmark
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline-Benchmark für den Shipment-Graph")
+    parser.add_argument("--input", default=os.path.join(PROJECT_ROOT, "data", "shipments.csv"))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--reports-dir", default=os.path.join(PROJECT_ROOT, "tests", "reports"))
+    args = parser.parse_args()
+
+    benchmark = run_benchmark(
+        args.input,
+        args.concurrency,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        limit=args.limit,
+        reports_dir=args.reports_dir
+    )
+    for result in benchmark["results"]:
+        latency = result["latency"]
+        print(
+            f"concurrency={result['concurrency']:>3}  rows={result['rows']}  "
+            f"throughput={result['throughput_rows_per_s']} rows/s  "
+            f"p50={latency['p50_ms']} ms  p95={latency['p95_ms']} ms  p99={latency['p99_ms']} ms  "
+            f"peak_rss={result['peak_rss_mb']} MB"
+        )
+    print(f"\nBenchmark-Ergebnisse wurden gespeichert: {benchmark['report_path']}")
+
+
+if __name__ == "__main__":
+    main()
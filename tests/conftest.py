@@ -7,6 +7,10 @@ import pytest
 import os
 import sys
 
+# Prozessweite Caches in Tests nur im Speicher halten (muss vor dem Import von graph.config stehen)
+os.environ["RESULT_CACHE_PATH"] = ""
+os.environ["CHECKPOINT_PATH"] = ""
+
 
 @pytest.fixture(scope="session", autouse=True)
 def setup_test_environment():
@@ -32,6 +36,26 @@ def setup_test_environment():
     pass  # Hier könnten Cleanup-Schritte stehen
 
 
+@pytest.fixture(autouse=True)
+def reset_shared_caches():
+    """
+    Leert die prozessweiten Caches nach jedem Test, damit gemockte
+    Prompts, LLM-Clients, Chains oder Graphen nicht in andere Tests gelangen.
+    """
+    yield
+    from graph.nodes.shipment_extractor import (
+        prompt_registry, chain_pool, result_cache, near_duplicate_index, llm_hedger, llm_breaker
+    )
+    from graph.shipment_graph import clear_graph_cache
+    prompt_registry.invalidate()
+    chain_pool.clear()
+    result_cache.clear()
+    near_duplicate_index.clear()
+    llm_hedger.reset()
+    llm_breaker.reset()
+    clear_graph_cache()
+
+
 @pytest.fixture
 def test_data():
     """
@@ -0,0 +1,35 @@
+"""
+Integrationstest für den Benchmark-Harness.
+
+Dieser Test führt die echte Pipeline (ChatAnthropic mit Structured Output)
+gegen den lokalen Ersatz der Anthropic Messages API aus.
+"""
+import json
+import os
+import pytest
+
+from tests.benchmarks.run_benchmark import run_benchmark, PROJECT_ROOT
+
+
+def test_benchmark_runs_real_pipeline_offline(tmp_path, monkeypatch):
+    """Test, ob der Benchmark ohne Netzwerk läuft und einen JSON-Bericht schreibt."""
+    monkeypatch.delenv("ANTHROPIC_API_URL", raising=False)
+
+    benchmark = run_benchmark(
+        os.path.join(PROJECT_ROOT, "data", "shipments.csv"),
+        concurrency_levels=[1, 4],
+        limit=6,
+        reports_dir=str(tmp_path)
+    )
+
+    assert [r["concurrency"] for r in benchmark["results"]] == [1, 4]
+    for result in benchmark["results"]:
+        assert result["rows"] == 6
+        assert result["failed"] == 0
+        assert result["llm_requests"] > 0
+        # Der statische Prompt-Teil wird einmal geschrieben und danach aus dem Cache gelesen
+        assert result["cache_tokens"]["read"] > 0
+        assert result["latency"]["p99_ms"] >= result["latency"]["p50_ms"]
+
+    with open(benchmark["report_path"], encoding="utf-8") as f:
+        assert json.load(f)["results"][0]["concurrency"] == 1
@@ -0,0 +1,29 @@
+"""
+Integrationstest für die Importzeit des Graphen.
+
+Dieser Test importiert graph.shipment_graph in frischen Interpretern und
+prüft das Zeitbudget (IMPORT_TIME_BUDGET_MS) sowie, dass das Anthropic SDK
+erst bei der ersten Verwendung geladen wird.
+"""
+from tests.benchmarks.import_benchmark import run_benchmark
+from graph.nodes import shipment_extractor
+
+
+def test_graph_import_is_lazy_and_within_budget():
+    """Test, ob der Import des Graphen keine schweren Abhängigkeiten lädt und im Budget bleibt."""
+    benchmark = run_benchmark(runs=3)
+
+    assert benchmark["eager_heavy_modules"] == []
+    assert benchmark["within_budget"], f"median {benchmark['median_ms']} ms > budget {benchmark['budget_ms']} ms"
+
+
+def test_langsmith_client_is_created_on_first_use(monkeypatch):
+    """Test, ob der LangSmith-Client nicht beim Import, sondern beim ersten Prompt-Abruf erzeugt wird."""
+    created = []
+    monkeypatch.setattr(shipment_extractor, "_client", None)
+    monkeypatch.setattr(shipment_extractor, "Client", lambda **kwargs: created.append(kwargs) or object())
+
+    first = shipment_extractor.get_langsmith_client()
+
+    assert shipment_extractor.get_langsmith_client() is first
+    assert len(created) == 1
@@ -0,0 +1,199 @@
+"""
+Integrationstests für den Message-Batches-Modus.
+
+Diese Tests führen run_message_batch gegen den lokalen Ersatz der Anthropic
+API aus und prüfen, dass die Ergebnisse den Eingabezeilen zugeordnet werden
+und denen der interaktiven Extraktion entsprechen.
+"""
+import json
+import pytest
+from unittest.mock import patch
+
+from langchain_core.prompts import PromptTemplate
+
+from graph.batch import run_message_batch, format_report
+from graph.models.shipment_models import Shipment
+from graph.nodes import shipment_extractor
+from graph.nodes.model_router import MODEL_TIERS, DEFAULT_TIER
+from graph.services.message_batches import MessageBatchClient, MessageBatchTimeoutError
+from tests.benchmarks.fake_anthropic_server import FakeAnthropicServer
+
+PROMPT = PromptTemplate.from_template("Extract the shipment data from the following text:\n\n{input}")
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / "shipments.csv"
+    path.write_text(
+        'Sendung\n"3 Paletten 120x80x100 cm, 450 kg"\n""\n"2 Pakete 40x30x20 cm je 5 kg"\n"1 Gitterbox 200 kg"\n',
+        encoding="utf-8"
+    )
+    return path
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    """Prompt und Caches für einen Lauf ohne Netzwerk."""
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "sk-ant-test")
+    shipment_extractor.result_cache.clear()
+    shipment_extractor.chain_pool.clear()
+    with patch('graph.nodes.shipment_extractor.load_prompt', return_value=PROMPT):
+        yield
+    shipment_extractor.result_cache.clear()
+    shipment_extractor.chain_pool.clear()
+
+
+def read_records(path):
+    return {record["row"]: record for record in map(json.loads, path.read_text(encoding="utf-8").splitlines())}
+
+
+def run(server, csv_file, output, **kwargs):
+    client = MessageBatchClient(api_key="sk-ant-test", base_url=server.base_url)
+    return run_message_batch(str(csv_file), str(output), client=client, poll_interval=0.01, timeout=5, **kwargs)
+
+
+def test_results_are_mapped_back_to_rows(tmp_path, csv_file, offline):
+    """Test, ob alle Zeilen in einem Batch-Job extrahiert und ihren Zeilen zugeordnet werden."""
+    output = tmp_path / "results.jsonl"
+    with FakeAnthropicServer(batch_polls=2) as server:
+        report = run(server, csv_file, output)
+
+    records = read_records(output)
+    assert report["batches"] == 1
+    assert report["processed"] == 3 and report["skipped"] == 1
+    assert sorted(records) == [0, 2, 3]
+    assert records[0]["input"].startswith("3 Paletten")
+    assert records[0]["extracted_data"]["items"][0]["quantity"] == 3
+    assert not (tmp_path / "results.jsonl.batches").exists()
+    assert "batch jobs: 1" in format_report(report)
+
+
+def test_batch_results_match_the_interactive_extraction(tmp_path, csv_file, offline, monkeypatch):
+    """Test, ob Batch- und interaktive Ergebnisse austauschbar sind und der Ergebnis-Cache gefüllt wird."""
+    output = tmp_path / "results.jsonl"
+    with FakeAnthropicServer() as server:
+        run(server, csv_file, output)
+        monkeypatch.setenv("ANTHROPIC_API_URL", server.base_url)
+        shipment_extractor.chain_pool.clear()
+        interactive = shipment_extractor.extract_shipment_data(
+            shipment_extractor.get_request_chain(PROMPT), "2 Pakete 40x30x20 cm je 5 kg"
+        )
+        requests_before = server.requests
+        report = run(server, csv_file, tmp_path / "again.jsonl", resume=False)
+
+    assert read_records(output)[2]["extracted_data"] == interactive["extracted_data"]
+    assert report["cached"] == 3 and report["batches"] == 0
+    assert server.requests == requests_before
+
+
+def test_limit_and_chunking(tmp_path, csv_file, offline):
+    """Test, ob große Läufe auf mehrere Batch-Jobs verteilt werden."""
+    output = tmp_path / "results.jsonl"
+    with FakeAnthropicServer() as server:
+        report = run(server, csv_file, output, max_requests=1, limit=2)
+
+    assert report["batches"] == 2
+    assert sorted(read_records(output)) == [0, 2]
+
+
+def test_failed_requests_are_submitted_again(tmp_path, csv_file, offline):
+    """Test, ob fehlgeschlagene Batch-Requests als Fehler geschrieben und beim Fortsetzen erneut gesendet werden."""
+    output = tmp_path / "results.jsonl"
+    with FakeAnthropicServer(error_rate=1.0) as server:
+        failed = run(server, csv_file, output)
+    errors = read_records(output)
+    with FakeAnthropicServer() as server:
+        resumed = run(server, csv_file, output)
+
+    assert failed["failed"] == 3
+    assert "Overloaded" in errors[0]["error"]
+    assert resumed["processed"] == 3 and resumed["resumed"] == 0
+    assert "extracted_data" in read_records(output)[0]
+
+
+def test_near_identical_rows_are_submitted_once(tmp_path, offline):
+    """Test, ob von fast gleichen Zeilen nur die erste gesendet wird und alle das Ergebnis erhalten."""
+    shipment_extractor.near_duplicate_index.clear()
+    inquiry = "Bitte um Angebot, Referenz 4711:\n3 Europaletten 120x80x150 cm, je 450 kg\nAbholung in Hamburg"
+    csv_file = tmp_path / "shipments.csv"
+    csv_file.write_text(
+        f'Sendung\n"{inquiry}"\n"Guten Tag,\n{inquiry.replace("4711", "4712")}"\n"{inquiry.replace("450", "460")}"\n',
+        encoding="utf-8"
+    )
+    output = tmp_path / "results.jsonl"
+    with FakeAnthropicServer() as server:
+        report = run(server, csv_file, output)
+        submitted = [entry["custom_id"] for batch in server.batches.values() for entry in batch["results"]]
+
+    records = read_records(output)
+    assert submitted == ["row-0", "row-2"]
+    assert report["near_duplicates"] == 1 and report["processed"] == 3
+    assert records[1]["extracted_data"] == records[0]["extracted_data"]
+    assert records[2]["extracted_data"]["items"][0]["weight"] != records[0]["extracted_data"]["items"][0]["weight"]
+
+
+def test_resume_downloads_submitted_jobs(tmp_path, csv_file, offline):
+    """Test, ob ein nach dem Absenden abgebrochener Lauf die Ergebnisse herunterlädt, statt neu zu senden."""
+    output = tmp_path / "results.jsonl"
+    with FakeAnthropicServer(batch_polls=100) as server:
+        with pytest.raises(MessageBatchTimeoutError):
+            run_message_batch(str(csv_file), str(output), poll_interval=0.01, timeout=0.05,
+                              client=MessageBatchClient(api_key="sk-ant-test", base_url=server.base_url))
+        assert (tmp_path / "results.jsonl.batches").read_text().strip() == "msgbatch_fake_1"
+
+        server.batch_polls = 0
+        report = run(server, csv_file, output)
+
+    assert report["batches"] == 0 and report["processed"] == 3
+    assert sorted(read_records(output)) == [0, 2, 3]
+
+
+class DroppingClient(MessageBatchClient):
+    """Liefert die Ergebnisse eines Batches ohne die angegebenen custom_ids."""
+
+    def __init__(self, dropped, **kwargs):
+        super().__init__(**kwargs)
+        self.dropped = dropped
+
+    def results(self, batch_id):
+        return ((custom_id, result) for custom_id, result in super().results(batch_id) if custom_id not in self.dropped)
+
+
+def test_rows_without_a_result_are_written_as_errors(tmp_path, offline):
+    """Test, ob eine Zeile ohne Batch-Ergebnis und ihre fast gleichen Zeilen als Fehler geschrieben werden."""
+    shipment_extractor.near_duplicate_index.clear()
+    inquiry = "Bitte um Angebot, Referenz 4711:\n3 Europaletten 120x80x150 cm, je 450 kg\nAbholung in Hamburg"
+    csv_file = tmp_path / "shipments.csv"
+    csv_file.write_text(
+        f'Sendung\n"{inquiry}"\n"Guten Tag,\n{inquiry.replace("4711", "4712")}"\n"1 Gitterbox 200 kg"\n',
+        encoding="utf-8"
+    )
+    output = tmp_path / "results.jsonl"
+    with FakeAnthropicServer() as server:
+        client = DroppingClient({"row-0"}, api_key="sk-ant-test", base_url=server.base_url)
+        report = run_message_batch(str(csv_file), str(output), client=client, poll_interval=0.01, timeout=5)
+        resumed = run(server, csv_file, output)
+
+    assert report["failed"] == 2 and report["processed"] == 1
+    assert resumed["resumed"] == 1 and resumed["processed"] == 2
+    records = read_records(output)
+    assert sorted(records) == [0, 1, 2]
+    assert records[1]["extracted_data"] == records[0]["extracted_data"]
+
+
+def test_batch_params_match_the_chat_model_payload(offline):
+    """Test, ob die Batch-Params dem Request von with_structured_output(Shipment) entsprechen."""
+    tier = MODEL_TIERS[DEFAULT_TIER]
+    llm = shipment_extractor.create_llm(tier.model, shipment_extractor.LLM_TEMPERATURE, tier.max_tokens, tier.timeout)
+    if not hasattr(llm, "_get_request_payload"):
+        pytest.skip("ChatAnthropic exposes no request payload")
+    for caching in (True, False):
+        with patch('graph.nodes.shipment_extractor.ANTHROPIC_PROMPT_CACHING', caching):
+            prompt = shipment_extractor.build_cacheable_prompt(PROMPT) if caching else PROMPT
+            expected = llm._get_request_payload(
+                prompt.invoke({"input": "3 Paletten"}),
+                **llm.bind_tools([Shipment], tool_choice=Shipment.__name__).kwargs
+            )
+            expected.update(expected.pop("extra_body", None) or {})
+
+            assert shipment_extractor.build_batch_params(PROMPT, "3 Paletten") == expected
@@ -224,4 +224,20 @@ def test_shipment_graph_error_handling(mock_compiled_graph):
         assert result["extracted_data"] is None
         assert "message" in result
         assert "Fehler bei der Extraktion" in result["message"]
-        mock_compiled_graph.invoke.assert_called_once_with(test_input) 
\ No newline at end of file
+        mock_compiled_graph.invoke.assert_called_once_with(test_input) 
+
+def test_shipment_graph_is_compiled_once_per_configuration(mock_compiled_graph):
+    """
+    Test, ob der kompilierte Graph pro Konfiguration wiederverwendet wird
+    und beim Erstellen kein Diagramm gerendert wird.
+    """
+    with patch('langgraph.graph.StateGraph.compile', return_value=mock_compiled_graph) as mock_compile:
+        first = create_shipment_graph()
+        second = create_shipment_graph()
+        
+        assert first is second
+        mock_compile.assert_called_once()
+        mock_compiled_graph.get_graph.assert_not_called()
+        
+        create_shipment_graph(with_checkpointer=True)
+        assert mock_compile.call_count == 2
@@ -0,0 +1,175 @@
+"""
+Unit tests for the batch runner.
+
+These tests run the batch runner with a fake graph over a small CSV file.
+"""
+import asyncio
+import json
+import pytest
+
+from graph.batch import run_batch, iter_csv_rows, load_completed_rows
+
+
+class FakeGraph:
+    """Fake compiled graph that echoes the input and fails for marked rows."""
+
+    def __init__(self):
+        self.calls = []
+        self.configs = []
+
+    async def ainvoke(self, state, config=None):
+        text = state["messages"][-1]
+        self.calls.append(text)
+        self.configs.append(config)
+        if "FAIL" in text:
+            raise ConnectionError("API unavailable")
+        if "PARTIAL" in text:
+            return {"extracted_data": {"items": [], "shipment_notes": text}, "message": "Segment 2: Timeout",
+                    "partial": True, "failed_segments": [1]}
+        if "TIMEOUT" in text:
+            return {"extracted_data": None, "message": "Error during extraction: Request timeout"}
+        return {"extracted_data": {"items": [], "shipment_notes": text}, "message": "ok"}
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / "shipments.csv"
+    path.write_text(
+        'Sendung\n"3 Paletten"\n"Zeile mit\nUmbruch"\n""\n"FAIL"\n"2 Pakete"\n',
+        encoding="utf-8"
+    )
+    return path
+
+
+def read_records(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_iter_csv_rows_handles_multiline_fields(csv_file):
+    """Test that quoted multi-line fields are read as one row."""
+    rows = list(iter_csv_rows(str(csv_file)))
+    assert rows[1] == (1, "Zeile mit\nUmbruch")
+    assert len(rows) == 5
+
+
+def test_run_batch_writes_results_and_report(csv_file, tmp_path):
+    """Test that all rows are processed and a report is returned."""
+    output = tmp_path / "results.jsonl"
+    graph = FakeGraph()
+    report = asyncio.run(run_batch(str(csv_file), str(output), concurrency=2, graph=graph))
+
+    records = read_records(output)
+    assert sorted(r["row"] for r in records) == [0, 1, 3, 4]
+    assert report["processed"] == 3
+    assert report["failed"] == 1
+    assert report["skipped"] == 1
+    assert report["latency"]["count"] == 4
+    assert "p99_ms" in report["latency"]
+    assert all(config["configurable"]["priority"] == "bulk" for config in graph.configs)
+
+
+def test_run_batch_resumes_after_crash(csv_file, tmp_path):
+    """Test that completed rows are skipped and a torn last line is repaired."""
+    output = tmp_path / "results.jsonl"
+    output.write_text(
+        json.dumps({"row": 0, "extracted_data": {}, "message": "ok"}) + "\n" + '{"row": 1, "extr',
+        encoding="utf-8"
+    )
+
+    graph = FakeGraph()
+    asyncio.run(run_batch(str(csv_file), str(output), graph=graph))
+
+    assert "3 Paletten" not in graph.calls
+    assert load_completed_rows(str(output)) == {0, 1, 4}
+
+
+def test_error_responses_are_failures_and_retried_on_resume(tmp_path):
+    """Test that a graph error response (no extracted data) is written as an error and processed again."""
+    csv_path = tmp_path / "shipments.csv"
+    csv_path.write_text('Sendung\n"3 Paletten"\n"TIMEOUT 2 Pakete"\n', encoding="utf-8")
+    output = tmp_path / "results.jsonl"
+
+    report = asyncio.run(run_batch(str(csv_path), str(output), graph=FakeGraph()))
+    records = {r["row"]: r for r in read_records(output)}
+
+    assert report["processed"] == 1 and report["failed"] == 1
+    assert records[1]["error"] == "Error during extraction: Request timeout"
+    assert load_completed_rows(str(output)) == {0}
+
+    csv_path.write_text('Sendung\n"3 Paletten"\n"2 Pakete"\n', encoding="utf-8")
+    graph = FakeGraph()
+    asyncio.run(run_batch(str(csv_path), str(output), graph=graph))
+
+    assert graph.calls == ["2 Pakete"]
+    assert load_completed_rows(str(output)) == {0, 1}
+
+
+def test_rows_without_extracted_data_are_not_completed(tmp_path):
+    """Test that error responses written by older runs are processed again."""
+    output = tmp_path / "results.jsonl"
+    output.write_text(json.dumps({"row": 0, "extracted_data": None, "message": "Error"}) + "\n", encoding="utf-8")
+
+    assert load_completed_rows(str(output)) == set()
+
+
+def test_degraded_rows_are_processed_again(csv_file, tmp_path):
+    """Test that results created while Claude was unavailable are re-queued on resume."""
+    output = tmp_path / "results.jsonl"
+    output.write_text(
+        json.dumps({"row": 0, "extracted_data": {}, "message": "ok", "degraded": True}) + "\n",
+        encoding="utf-8"
+    )
+
+    assert load_completed_rows(str(output)) == set()
+
+
+def test_partial_rows_are_failures_and_retried_on_resume(tmp_path):
+    """Test that a row with failed segments is not completed and processed again."""
+    csv_path = tmp_path / "shipments.csv"
+    csv_path.write_text('Sendung\n"3 Paletten"\n"PARTIAL Box 1 - Box 2"\n', encoding="utf-8")
+    output = tmp_path / "results.jsonl"
+
+    report = asyncio.run(run_batch(str(csv_path), str(output), graph=FakeGraph()))
+    records = {r["row"]: r for r in read_records(output)}
+
+    assert report["processed"] == 1 and report["failed"] == 1
+    assert records[1]["partial"] is True and records[1]["failed_segments"] == [1]
+    assert load_completed_rows(str(output)) == {0}
+
+
+def test_near_identical_rows_are_extracted_once(tmp_path):
+    """Test that concurrent near-identical rows wait for the first one and reuse its result."""
+    class SlowGraph(FakeGraph):
+        async def ainvoke(self, state, config=None):
+            await asyncio.sleep(0.05)
+            return await super().ainvoke(state, config)
+
+    inquiry = "Bitte um Angebot, Referenz 4711:\n3 Europaletten 120x80x150 cm, je 450 kg\nAbholung in Hamburg"
+    csv_path = tmp_path / "shipments.csv"
+    csv_path.write_text(
+        f'Sendung\n"{inquiry}"\n"Guten Tag,\n{inquiry.replace("4711", "4712")}"\n"{inquiry.replace("450", "460")}"\n',
+        encoding="utf-8"
+    )
+    output = tmp_path / "results.jsonl"
+    graph = SlowGraph()
+
+    report = asyncio.run(run_batch(str(csv_path), str(output), concurrency=3, graph=graph))
+    records = {r["row"]: r for r in read_records(output)}
+
+    assert graph.calls == [inquiry, inquiry.replace("450", "460")]
+    assert report["processed"] == 3 and report["near_duplicates"] == 1
+    assert records[1]["extracted_data"] == records[0]["extracted_data"]
+
+
+def test_followers_of_a_failed_row_are_extracted_themselves(tmp_path):
+    """Test that a near-identical row is extracted on its own if the first row of its cluster failed."""
+    inquiry = "3 Europaletten 120x80x150 cm, je 450 kg, Abholung in Hamburg, Lieferung nach Berlin"
+    csv_path = tmp_path / "shipments.csv"
+    csv_path.write_text(f'Sendung\n"FAIL {inquiry}"\n"{inquiry}"\n', encoding="utf-8")
+    output = tmp_path / "results.jsonl"
+    graph = FakeGraph()
+
+    report = asyncio.run(run_batch(str(csv_path), str(output), concurrency=2, graph=graph))
+
+    assert graph.calls == ["FAIL " + inquiry, inquiry]
+    assert report["processed"] == 1 and report["failed"] == 1 and report["near_duplicates"] == 0
@@ -0,0 +1,60 @@
+"""
+Unit tests for the LLM cassette.
+
+These tests verify recording, replay and the behaviour on misses.
+"""
+import pytest
+from unittest.mock import MagicMock, patch
+
+from graph.services.cassette import Cassette, CassetteMissError, request_fingerprint
+from graph.models.shipment_models import Shipment, ShipmentItem
+from graph.nodes import shipment_extractor
+
+
+def test_recorded_response_is_replayed_without_live_call(tmp_path):
+    """Test that a recorded response is served from the file in replay mode."""
+    path = str(tmp_path / "cassette.jsonl")
+    fingerprint = request_fingerprint({"model": "claude"}, {"input": "3 Paletten"})
+    shipment = Shipment(items=[ShipmentItem(quantity=3)], message="ok")
+
+    Cassette(path, "record", response_model=Shipment).call(fingerprint, lambda: shipment)
+
+    live_call = MagicMock()
+    replayed = Cassette(path, "replay", response_model=Shipment).call(fingerprint, live_call)
+
+    live_call.assert_not_called()
+    assert replayed == shipment
+
+
+def test_strict_replay_fails_loudly_on_miss(tmp_path):
+    """Test that replay mode raises instead of calling the LLM."""
+    cassette = Cassette(str(tmp_path / "cassette.jsonl"), "replay")
+
+    with pytest.raises(CassetteMissError):
+        cassette.call("unknown", MagicMock())
+
+
+def test_replay_or_record_falls_through_and_records(tmp_path):
+    """Test that a miss in replay_or_record mode calls the LLM once and records it."""
+    cassette = Cassette(str(tmp_path / "cassette.jsonl"), "replay_or_record")
+    live_call = MagicMock(return_value={"items": []})
+
+    assert cassette.call("fp", live_call) == {"items": []}
+    assert cassette.call("fp", live_call) == {"items": []}
+    live_call.assert_called_once()
+    assert cassette.stats() == {"replays": 1, "misses": 1, "recordings": 1}
+
+
+def test_unknown_mode_is_rejected(tmp_path):
+    """Test that a typo in LLM_CASSETTE_MODE is reported."""
+    with pytest.raises(ValueError):
+        Cassette(str(tmp_path / "cassette.jsonl"), "replayy")
+
+
+def test_replay_miss_propagates_through_process_shipment(tmp_path):
+    """Test that process_shipment does not hide a cassette miss as extraction error."""
+    with patch.object(shipment_extractor, "llm_cassette", Cassette(str(tmp_path / "c.jsonl"), "replay")), \
+         patch('graph.nodes.shipment_extractor.load_prompt', return_value="prompt"), \
+         patch('graph.nodes.shipment_extractor.get_request_chain', return_value=MagicMock()):
+        with pytest.raises(CassetteMissError):
+            shipment_extractor.process_shipment({"messages": ["3 Paletten"]})
@@ -0,0 +1,70 @@
+"""
+Unit tests for the chain pool.
+
+These tests verify that LLM clients and chains are built once and reused.
+"""
+import pytest
+from unittest.mock import MagicMock, patch
+
+from graph.services.chain_pool import ChainPool, ChainKey
+from graph.nodes import shipment_extractor
+
+
+def make_key(version="v1", model="claude"):
+    return ChainKey(prompt_version=version, model=model, temperature=0.0, max_tokens=1024, timeout=10)
+
+
+def test_chain_is_built_once_per_key():
+    """Test that the factory is only called for the first lookup."""
+    pool = ChainPool()
+    factory = MagicMock(return_value="chain")
+
+    assert pool.get_chain(make_key(), factory) == "chain"
+    assert pool.get_chain(make_key(), factory) == "chain"
+
+    factory.assert_called_once()
+    assert pool.stats()["chain_hits"] == 1
+
+
+def test_new_prompt_version_replaces_old_chain():
+    """Test that a new prompt version rebuilds and evicts the old chain."""
+    pool = ChainPool()
+    pool.get_chain(make_key("v1"), lambda: "chain v1")
+    pool.get_chain(make_key("v1", model="other"), lambda: "chain other")
+
+    assert pool.get_chain(make_key("v2"), lambda: "chain v2") == "chain v2"
+    assert pool.stats()["chains"] == 2
+
+
+def test_patch_chain_does_not_evict_shipment_chain():
+    """Test that chains with a different output are kept side by side."""
+    pool = ChainPool()
+    pool.get_chain(make_key(), lambda: "shipment chain")
+    pool.get_chain(make_key()._replace(output="patch"), lambda: "patch chain")
+
+    assert pool.get_chain(make_key(), lambda: "rebuilt") == "shipment chain"
+    assert pool.stats()["chains"] == 2
+
+
+def test_llm_client_is_shared_between_chains():
+    """Test that chains with the same model configuration share one LLM client."""
+    pool = ChainPool()
+    factory = MagicMock(return_value="llm")
+
+    pool.get_llm(make_key("v1").llm_key(), factory)
+    pool.get_llm(make_key("v2").llm_key(), factory)
+
+    factory.assert_called_once()
+
+
+def test_get_extraction_chain_reuses_pooled_chain():
+    """Test that the extractor does not rebuild the chain for the same prompt version."""
+    with patch.object(shipment_extractor, "chain_pool", ChainPool()), \
+         patch.object(shipment_extractor, "create_llm", return_value=MagicMock()) as mock_llm, \
+         patch.object(shipment_extractor, "create_extraction_chain", return_value="chain") as mock_chain:
+        first = shipment_extractor.get_extraction_chain("prompt", "v1")
+        second = shipment_extractor.get_extraction_chain("prompt", "v1")
+
+        assert first == second == "chain"
+        mock_llm.assert_called_once()
+        mock_chain.assert_called_once()
@@ -0,0 +1,138 @@
+"""
+Unit tests for the SQLite checkpointer.
+
+These tests verify persistence across instances, batched writes, the
+per-thread retention limit, TTL eviction and compaction of idle threads.
+"""
+import operator
+from typing import Annotated, List, TypedDict
+
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import StateGraph, START, END
+
+from graph.services.checkpointer import SqliteCheckpointSaver, create_checkpointer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CounterState(TypedDict):
+    messages: Annotated[List[str], operator.add]
+    turns: int
+
+
+def build_app(saver):
+    graph = StateGraph(CounterState)
+    graph.add_node("count", lambda state: {"turns": len(state["messages"])})
+    graph.add_edge(START, "count")
+    graph.add_edge("count", END)
+    return graph.compile(checkpointer=saver)
+
+
+def run_turns(app, thread_id, turns):
+    config = {"configurable": {"thread_id": thread_id}}
+    for turn in range(turns):
+        result = app.invoke({"messages": [f"message {turn}"]}, config)
+    return result
+
+
+def test_state_survives_a_new_instance(tmp_path):
+    """Test that the conversation state is persisted in the SQLite file."""
+    db_path = str(tmp_path / "checkpoints.sqlite3")
+    saver = SqliteCheckpointSaver(db_path=db_path)
+    run_turns(build_app(saver), "t1", 2)
+    saver.close()
+
+    reopened = SqliteCheckpointSaver(db_path=db_path)
+    result = run_turns(build_app(reopened), "t1", 1)
+
+    assert result["messages"] == ["message 0", "message 1", "message 0"]
+    assert result["turns"] == 3
+    assert reopened._connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    reopened.close()
+
+
+def test_writes_are_buffered_until_the_batch_is_full():
+    """Test that writes are committed in batches."""
+    saver = SqliteCheckpointSaver(db_path=None, batch_size=4, flush_interval=60)
+    config = {"configurable": {"thread_id": "t1", "checkpoint_ns": "", "checkpoint_id": "1"}}
+    saver.put_writes(config, [("a", 1), ("b", 2), ("c", 3)], task_id="task")
+
+    assert len(saver._pending) == 3
+    saver.put_writes(config, [("d", 4)], task_id="task-2")
+
+    assert saver._pending == []
+    assert saver._connection.execute("SELECT COUNT(*) FROM writes").fetchone()[0] == 4
+    saver.close()
+
+
+def test_retention_keeps_latest_checkpoints_per_thread():
+    """Test that each thread keeps only the configured number of checkpoints."""
+    saver = SqliteCheckpointSaver(db_path=None, max_checkpoints_per_thread=3)
+    app = build_app(saver)
+    run_turns(app, "t1", 4)
+    run_turns(app, "t2", 1)
+    config = {"configurable": {"thread_id": "t1"}}
+
+    assert len(list(saver.list(config))) == 3
+    assert app.get_state(config).values["turns"] == 4
+    assert saver.stats()["threads"] == 2
+    saver.close()
+
+
+def test_ttl_evicts_threads_without_recent_writes():
+    """Test that idle threads are deleted after the TTL."""
+    clock = FakeClock()
+    saver = SqliteCheckpointSaver(db_path=None, ttl=100, maintenance_interval=0, clock=clock)
+    app = build_app(saver)
+    run_turns(app, "old", 1)
+    clock.now += 60
+    run_turns(app, "new", 1)
+    clock.now += 60
+
+    assert saver.evict_expired() == 1
+    assert saver.get_tuple({"configurable": {"thread_id": "old"}}) is None
+    assert saver.get_tuple({"configurable": {"thread_id": "new"}}) is not None
+    saver.close()
+
+
+def test_compaction_reduces_idle_threads_to_latest_checkpoint():
+    """Test that idle threads keep only their latest checkpoint and state."""
+    clock = FakeClock()
+    saver = SqliteCheckpointSaver(db_path=None, compact_after=30, maintenance_interval=0, clock=clock)
+    app = build_app(saver)
+    run_turns(app, "idle", 3)
+    clock.now += 60
+    run_turns(app, "active", 2)
+    active_before = len(list(saver.list({"configurable": {"thread_id": "active"}})))
+
+    assert saver.compact() > 0
+    assert len(list(saver.list({"configurable": {"thread_id": "idle"}}))) == 1
+    assert len(list(saver.list({"configurable": {"thread_id": "active"}}))) == active_before
+    assert app.get_state({"configurable": {"thread_id": "idle"}}).values["turns"] == 3
+    saver.close()
+
+
+def test_delete_thread_drops_buffered_writes():
+    """Test that deleting a thread also discards its pending writes."""
+    saver = SqliteCheckpointSaver(db_path=None, batch_size=100, flush_interval=60)
+    config = {"configurable": {"thread_id": "t1", "checkpoint_ns": "", "checkpoint_id": "1"}}
+    saver.put_writes(config, [("a", 1)], task_id="task")
+    saver.delete_thread("t1")
+
+    assert saver.stats() == {"threads": 0, "checkpoints": 0, "writes": 0, "pending": 0}
+    saver.close()
+
+
+def test_create_checkpointer_selects_backend():
+    """Test that CHECKPOINT_BACKEND selects the saver and SQLite is opt-in."""
+    assert isinstance(create_checkpointer("memory"), MemorySaver)
+    assert isinstance(create_checkpointer(), MemorySaver)
+    saver = create_checkpointer("sqlite")
+    assert isinstance(saver, SqliteCheckpointSaver)
+    saver.close()
@@ -0,0 +1,136 @@
+"""
+Unit tests for the circuit breaker.
+
+These tests verify opening on a high failure rate, failing fast, the
+half-open probe and the degraded results of the shipment extractor.
+"""
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from graph.services.circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+from graph.nodes import shipment_extractor
+from graph.nodes.shipment_extractor import process_shipment, aprocess_shipment
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def failing():
+    raise TimeoutError("timeout")
+
+
+def open_breaker(clock=None):
+    breaker = CircuitBreaker(enabled=True, failure_rate=0.5, window=10, min_calls=4, open_seconds=30, clock=clock or FakeClock())
+    for _ in range(4):
+        with pytest.raises(TimeoutError):
+            breaker.call(failing)
+    return breaker
+
+
+def test_breaker_opens_on_failure_rate_and_fails_fast():
+    """Test that calls are rejected without executing them once the breaker is open."""
+    breaker = open_breaker()
+    func = MagicMock()
+
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.call(func)
+    func.assert_not_called()
+
+
+def test_successes_keep_breaker_closed():
+    """Test that a failure rate below the threshold does not open the breaker."""
+    breaker = CircuitBreaker(enabled=True, failure_rate=0.5, window=10, min_calls=4)
+    for _ in range(3):
+        breaker.call(lambda: "ok")
+    with pytest.raises(TimeoutError):
+        breaker.call(failing)
+
+    assert breaker.state == CLOSED
+
+
+def test_content_errors_are_not_failures():
+    """Test that invalid responses do not count as an unhealthy API."""
+    breaker = CircuitBreaker(enabled=True, failure_rate=0.5, window=10, min_calls=2)
+    for _ in range(4):
+        with pytest.raises(ValueError):
+            breaker.call(lambda: (_ for _ in ()).throw(ValueError("invalid json")))
+
+    assert breaker.state == CLOSED
+
+
+def test_half_open_probe_closes_or_reopens():
+    """Test that a trial call after the cool-down decides the next state."""
+    clock = FakeClock()
+    breaker = open_breaker(clock)
+    clock.now += 30
+    assert breaker.state == HALF_OPEN
+
+    with pytest.raises(TimeoutError):
+        breaker.call(failing)
+    assert breaker.state == OPEN
+
+    clock.now += 30
+    assert asyncio.run(breaker.acall(lambda: asyncio.sleep(0, result="ok"))) == "ok"
+    assert breaker.state == CLOSED
+
+
+def test_only_limited_trial_calls_in_half_open():
+    """Test that concurrent requests are rejected while the probe is running."""
+    clock = FakeClock()
+    breaker = open_breaker(clock)
+    clock.now += 30
+
+    trial = breaker.before_call()
+    assert trial
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.after_call(trial)
+    assert breaker.state == CLOSED
+
+
+def test_open_breaker_serves_degraded_rule_based_result():
+    """Test that the extractor falls back to the rules and flags the response."""
+    chain = MagicMock()
+    with patch.object(shipment_extractor, "llm_breaker", open_breaker()), \
+         patch('graph.nodes.shipment_extractor.load_prompt', return_value="prompt"), \
+         patch('graph.nodes.shipment_extractor.get_request_chain', return_value=chain):
+        result = process_shipment({"messages": ["3 Paletten nach Wien, bitte um Angebot"]})
+
+    chain.invoke.assert_not_called()
+    assert result["degraded"] is True
+    assert result["extracted_data"]["items"][0]["quantity"] == 3
+
+
+def test_open_breaker_without_fallback_returns_flagged_error():
+    """Test that a degraded error response is flagged for re-queueing."""
+    with patch.object(shipment_extractor, "llm_breaker", open_breaker()), \
+         patch('graph.nodes.shipment_extractor.load_prompt', return_value="prompt"), \
+         patch('graph.nodes.shipment_extractor.get_request_chain', return_value=MagicMock()):
+        result = asyncio.run(aprocess_shipment({"messages": ["Wir brauchen einen Transport"]}))
+
+    assert result["degraded"] is True
+    assert result["extracted_data"] is None
+
+
+def test_open_breaker_keeps_the_previous_shipment_of_a_follow_up():
+    """Test that a correction is not replaced by a rule extraction of the short message alone."""
+    previous = {"items": [{"name": "Maschinenteile", "quantity": 3, "length": 120, "width": 80, "weight": 250}],
+                "shipment_notes": None, "message": "ok"}
+    state = {"messages": ["doch 4 Paletten"], "follow_up": True, "last_shipment": previous}
+    with patch.object(shipment_extractor, "llm_breaker", open_breaker()), \
+         patch('graph.nodes.shipment_extractor.load_prompt', return_value="prompt"), \
+         patch('graph.nodes.shipment_extractor.get_request_chain', return_value=MagicMock()):
+        result = process_shipment(state)
+        async_result = asyncio.run(aprocess_shipment(state))
+
+    assert result["degraded"] is True and async_result["degraded"] is True
+    assert result["extracted_data"] == previous
+    assert async_result["extracted_data"] == previous
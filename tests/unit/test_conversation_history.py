@@ -0,0 +1,143 @@
+"""
+Unit tests for the conversation history handling.
+
+These tests verify the message window, the bounded summary of trimmed
+messages and the follow-up mode in a checkpointed thread.
+"""
+from unittest.mock import patch
+
+from langgraph.checkpoint.memory import MemorySaver
+
+from graph.nodes.conversation_history import (
+    summarize_messages,
+    trim_messages,
+    manage_history,
+    route_follow_up,
+    get_extraction_input,
+    remember_extraction
+)
+from graph.shipment_graph import build_shipment_graph
+from graph.models.shipment_models import Shipment, ShipmentItem
+
+PREVIOUS = {"items": [{"load_carrier": 1, "name": "Maschinenteile", "quantity": 3, "weight": 250}],
+            "shipment_notes": None, "message": "ok"}
+
+
+def test_window_keeps_latest_messages_and_summarizes_the_rest():
+    """Test that trimmed messages only survive with their shipment-relevant lines."""
+    messages = ["Hallo zusammen,\n3 Paletten 120x80 cm", "Danke!", "4 Paletten", "Abholung Montag"]
+
+    kept, summary = trim_messages(messages, max_messages=2)
+
+    assert kept == ["4 Paletten", "Abholung Montag"]
+    assert summary == "3 Paletten 120x80 cm"
+
+
+def test_summary_is_bounded():
+    """Test that the summary drops its oldest lines once it is too long."""
+    summary = None
+    for turn in range(50):
+        summary = summarize_messages([f"{turn} Paletten"], summary, max_chars=40)
+
+    assert len(summary) <= 40
+    assert summary.endswith("49 Paletten")
+
+
+def test_short_message_after_extraction_is_a_follow_up():
+    """Test that a short message in a thread with a previous extraction is a follow-up."""
+    update = manage_history({"messages": ["3 Paletten", "doch 4 Paletten"], "last_shipment": PREVIOUS})
+
+    assert update["follow_up"] is True
+    assert route_follow_up(update) == "follow_up"
+    assert manage_history({"messages": ["3 Paletten"]})["follow_up"] is False
+    assert manage_history({"messages": ["x" * 1000], "last_shipment": PREVIOUS})["follow_up"] is False
+
+
+def test_follow_up_input_contains_previous_shipment_and_new_message_only():
+    """Test that the LLM receives the previous Shipment instead of the conversation."""
+    state = {"messages": ["3 Paletten Maschinenteile", "doch 4 Paletten"], "follow_up": True, "last_shipment": PREVIOUS}
+
+    text = get_extraction_input(state)
+
+    assert '"quantity":3' in text
+    assert text.endswith("doch 4 Paletten")
+    assert "3 Paletten Maschinenteile" not in text
+    assert get_extraction_input({**state, "follow_up": False}) == "doch 4 Paletten"
+
+
+def test_follow_up_input_contains_the_history_summary():
+    """Test that the summary of trimmed messages is sent along with a follow-up."""
+    state = {"messages": ["doch 4 Paletten"], "follow_up": True, "last_shipment": PREVIOUS,
+             "history_summary": "Abholung 12.05. in 80331 München"}
+
+    text = get_extraction_input(state)
+
+    assert "Abholung 12.05. in 80331 München" in text
+    assert text.endswith("doch 4 Paletten")
+    assert "Earlier messages" not in get_extraction_input({**state, "history_summary": None})
+
+
+def test_follow_up_is_detected_on_the_compacted_text():
+    """Test that a short reply above a long quoted chain is still a follow-up."""
+    reply = "doch 4 Paletten\n\nAm 12.05.2024 um 10:00 schrieb Kunde <kunde@example.com>:\n" + "> alter Text\n" * 100
+    state = {"messages": [reply], "compacted_input": "doch 4 Paletten", "last_shipment": PREVIOUS}
+
+    assert len(reply) > 500
+    assert manage_history(state)["follow_up"] is True
+
+
+def test_degraded_results_are_not_remembered():
+    """Test that only successful, non-degraded and complete extractions become the follow-up base."""
+    assert remember_extraction({"extracted_data": PREVIOUS}) == {"last_shipment": PREVIOUS}
+    assert remember_extraction({"extracted_data": PREVIOUS, "degraded": True}) == {}
+    assert remember_extraction({"extracted_data": PREVIOUS, "partial": True}) == {}
+    assert remember_extraction({"extracted_data": None}) == {}
+
+
+def test_checkpointed_thread_stays_bounded_and_sends_follow_ups():
+    """Test the message window and the follow-up input across turns of one thread."""
+    inputs = []
+
+    class RecordingChain:
+        def invoke(self, data):
+            inputs.append(data["input"])
+            return Shipment(items=[ShipmentItem(name="Maschinenteile", quantity=len(inputs))], message="ok")
+
+    with patch('graph.nodes.shipment_extractor.load_prompt', return_value="prompt"), \
+         patch('graph.nodes.shipment_extractor.get_request_chain', return_value=RecordingChain()), \
+         patch('graph.shipment_graph.create_checkpointer', return_value=MemorySaver()), \
+         patch('graph.nodes.conversation_history.HISTORY_MAX_MESSAGES', 2), \
+         patch('graph.nodes.shipment_patcher.FOLLOW_UP_MODE', "full"):
+        app = build_shipment_graph(with_checkpointer=True)
+        config = {"configurable": {"thread_id": "t1"}}
+        messages = []
+        for text in ["Ich brauche einen Transport für Maschinenteile", "doch 2 Stück", "doch 3 Stück"]:
+            messages.append(text)
+            result = app.invoke({"messages": list(messages), "extracted_data": None, "message": None}, config)
+
+    assert len(inputs) == 3
+    assert inputs[0] == "Ich brauche einen Transport für Maschinenteile"
+    assert '"quantity":2' in inputs[2] and inputs[2].endswith("doch 3 Stück")
+    assert result["messages"] == ["doch 2 Stück", "doch 3 Stück"]
+    assert result["last_shipment"]["items"][0]["quantity"] == 3
+
+
+def test_routing_results_of_the_previous_turn_are_reset():
+    """Test that fast path confidence and model tier do not carry over into the next turn."""
+    class RecordingChain:
+        def invoke(self, data):
+            return Shipment(items=[ShipmentItem(name="Maschinenteile", quantity=2)], message="ok")
+
+    with patch('graph.nodes.shipment_extractor.load_prompt', return_value="prompt"), \
+         patch('graph.nodes.shipment_extractor.get_request_chain', return_value=RecordingChain()), \
+         patch('graph.shipment_graph.create_checkpointer', return_value=MemorySaver()), \
+         patch('graph.nodes.shipment_patcher.FOLLOW_UP_MODE', "full"):
+        app = build_shipment_graph(with_checkpointer=True)
+        config = {"configurable": {"thread_id": "t2"}}
+        first = app.invoke({"messages": ["3 Europaletten 120x80x100 cm je 200 kg nicht stapelbar"],
+                            "extracted_data": None, "message": None}, config)
+        second = app.invoke({"messages": ["doch 2 Stück"], "extracted_data": None, "message": None}, config)
+
+    assert first["fast_path_confidence"] is not None
+    assert second["fast_path_confidence"] is None
+    assert second["extracted_data"]["items"][0]["quantity"] == 2
@@ -0,0 +1,127 @@
+"""
+Unit tests for the rule-based fast extractor.
+
+These tests verify the patterns, the confidence score and the routing.
+"""
+import os
+
+import pytest
+
+from graph.batch import iter_csv_rows
+from graph.config import FAST_PATH_MIN_CONFIDENCE
+from graph.nodes.fast_extractor import (
+    extract_with_rules,
+    fast_extract,
+    route_after_fast_extractor
+)
+from graph.models.shipment_models import LoadCarrierType
+from tests.benchmarks.run_benchmark import PROJECT_ROOT
+
+CORPUS = dict(iter_csv_rows(os.path.join(PROJECT_ROOT, "data", "shipments.csv")))
+
+
+def test_formulaic_german_input_is_extracted_with_full_confidence():
+    """Test a complete single-item inquiry in German."""
+    result = extract_with_rules(
+        "34 Paletten Luftreiniger 120 x 80 x 120 cm, Gewicht pro Palette 150 kg, stapelbar"
+    )
+    item = result.shipment.items[0]
+
+    assert result.confidence == 1.0
+    assert item.load_carrier == LoadCarrierType.PALLET
+    assert item.quantity == 34
+    assert (item.length, item.width, item.height) == (120, 80, 120)
+    assert item.weight == 150
+    assert item.stackable is True
+
+
+def test_units_and_separators_are_normalized():
+    """Test mm dimensions, tonnes and German decimal separators."""
+    result = extract_with_rules("1 Gitterbox 1200 x 800 x 970 mm, 1,2 t, nicht stapelbar")
+    item = result.shipment.items[0]
+
+    assert item.load_carrier == LoadCarrierType.EURO_PALLET_CAGE
+    assert (item.length, item.width, item.height) == (120, 80, 97)
+    assert item.weight == 1200
+    assert item.stackable is False
+
+
+def test_incomplete_input_has_low_confidence():
+    """Test that missing dimensions and weight keep the input on the LLM path."""
+    result = extract_with_rules("Ich benötige einen Transport für 3 Paletten.")
+
+    assert result.confidence == 0.5
+    assert "dimensions" in result.missing_fields
+
+
+def test_multiple_items_are_not_handled():
+    """Test that inquiries with several items are left to the precise extractor."""
+    result = extract_with_rules("2 Paletten 120x80x80, je 350kg 2 Kartons 40x40x40, je 15kg")
+
+    assert result.shipment is None
+    assert result.confidence == 0.0
+
+
+def test_ambiguous_total_weight_lowers_confidence():
+    """Test that a weight for several pieces without 'je/pro' is not trusted."""
+    result = extract_with_rules("2 Paletten 120 x 80 x 100, Gewicht: 200 kg")
+
+    assert result.confidence < 1.0
+
+
+def test_fast_extract_node_and_routing():
+    """Test that only confident results are written and routed to the end."""
+    confident = fast_extract({"messages": ["13 pallets 120x100x120 cm, 1500 kg each"]})
+    assert confident["extracted_data"]["items"][0]["quantity"] == 13
+    assert route_after_fast_extractor(confident) == "done"
+
+    uncertain = fast_extract({"messages": ["Vinyl 2 Paletten - nicht stapelbar!!"]})
+    assert "extracted_data" not in uncertain
+    assert route_after_fast_extractor(uncertain) == "shipment_extractor"
+
+
+def test_labelled_gross_weight_in_the_corpus_takes_the_fast_path():
+    """Test that gross and chargeable weights are told apart and the volume is explained."""
+    result = extract_with_rules(CORPUS[3])
+    item = result.shipment.items[0]
+
+    assert CORPUS[3].startswith("Commodity :machine parts Quantity :13 pallets Gross weight :1500 kgs")
+    assert result.confidence >= FAST_PATH_MIN_CONFIDENCE
+    assert item.name == "machine parts"
+    assert (item.load_carrier, item.quantity) == (LoadCarrierType.PALLET, 13)
+    assert (item.length, item.width, item.height) == (120, 100, 120)
+    assert item.weight == round(1500 / 13)
+
+
+def test_total_weight_in_the_corpus_takes_the_fast_path():
+    """Test a single euro pallet with a 'Gesamtgewicht' label directly followed by the next field."""
+    result = extract_with_rules(CORPUS[4])
+    item = result.shipment.items[0]
+
+    assert result.confidence >= FAST_PATH_MIN_CONFIDENCE
+    assert item.name == "Verpackungsmaterial"
+    assert (item.load_carrier, item.quantity) == (LoadCarrierType.PALLET, 1)
+    assert (item.length, item.width, item.height) == (120, 120, 200)
+    assert item.weight == 71
+
+
+def test_space_is_read_as_thousands_separator_of_a_weight():
+    """Test that '8 954kg' is 8954 kg and not 954 kg."""
+    result = extract_with_rules(CORPUS[54])
+
+    assert "poids 8 954kg" in CORPUS[54]
+    assert result.shipment.items[0].quantity == 33
+    assert result.shipment.items[0].weight == 8954
+
+
+def test_number_after_dimensions_is_not_the_quantity():
+    """Test that the trailing '*4' of '89*89*96*4 Box' is not read as 4 packages."""
+    result = extract_with_rules(CORPUS[43])
+    item = result.shipment.items[0]
+
+    assert "89*89*96*4 Box" in CORPUS[43]
+    assert (item.load_carrier, item.quantity) == (LoadCarrierType.PALLET, 1)
+    assert (item.length, item.width, item.height) == (89, 89, 96)
+    assert item.weight == 1909
+    # The unexplained 4 keeps the inquiry on the LLM path
+    assert result.confidence < FAST_PATH_MIN_CONFIDENCE
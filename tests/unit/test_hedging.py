@@ -0,0 +1,172 @@
+"""
+Unit tests for hedged requests.
+
+These tests verify the hedge delay, the budget cap and that the first
+response wins in the sync and async call paths.
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from graph.services.hedging import Hedger
+
+
+def _warm_hedger(**kwargs) -> Hedger:
+    hedger = Hedger(enabled=True, latency_percentile=95, min_delay=0.05, min_samples=5, **kwargs)
+    for _ in range(20):
+        hedger.record_latency(0.01, "model")
+    return hedger
+
+
+def test_no_hedging_without_enough_samples():
+    """Test that hedging only starts after min_samples latencies."""
+    hedger = Hedger(enabled=True, min_samples=5, min_delay=0.0)
+    assert hedger.hedge_delay("model") is None
+    for latency in (0.1, 0.2, 0.3, 0.4, 1.0):
+        hedger.record_latency(latency, "model")
+    assert hedger.hedge_delay("model") == 1.0
+
+
+def test_disabled_hedger_never_hedges():
+    """Test that the default configuration keeps single calls."""
+    hedger = Hedger(enabled=False, min_samples=0)
+    assert hedger.hedge_delay() is None
+
+
+def test_slow_primary_is_hedged_and_backup_wins():
+    """Test that a backup call is started after the delay and its result is used."""
+    hedger = _warm_hedger(max_ratio=1.0)
+    calls = []
+    lock = threading.Lock()
+
+    def func():
+        with lock:
+            calls.append(len(calls))
+            index = calls[-1]
+        time.sleep(0.5 if index == 0 else 0.0)
+        return f"call {index}"
+
+    started = time.perf_counter()
+    assert hedger.call(func, "model") == "call 1"
+    assert time.perf_counter() - started < 0.4
+    assert hedger.stats()["hedge_wins"] == 1
+
+
+def test_budget_cap_limits_hedge_ratio():
+    """Test that no more than max_ratio of the calls are hedged."""
+    hedger = _warm_hedger(max_ratio=0.25)
+
+    async def slow():
+        await asyncio.sleep(0.08)
+        return "ok"
+
+    async def run():
+        return [await hedger.acall(slow, "model") for _ in range(8)]
+
+    assert asyncio.run(run()) == ["ok"] * 8
+    stats = hedger.stats()
+    assert stats["hedged"] <= 0.25 * stats["calls"]
+    assert stats["budget_exhausted"] > 0
+
+
+def test_budget_only_counts_recent_calls():
+    """Test that a long quiet history does not fund a burst of hedges."""
+    now = [0.0]
+    hedger = _warm_hedger(max_ratio=0.5, budget_window=10.0, clock=lambda: now[0])
+    for _ in range(100):
+        hedger._start_call()
+    assert hedger._acquire_hedge()
+
+    now[0] = 60.0
+    hedger._start_call()
+    assert not hedger._acquire_hedge()
+    hedger._start_call()
+    assert hedger._acquire_hedge()
+
+
+def test_own_timeout_error_of_the_primary_is_not_hedged():
+    """Test that a primary failing fast with TimeoutError is raised instead of hedged."""
+    hedger = _warm_hedger(max_ratio=1.0)
+    calls = []
+
+    def func():
+        calls.append(1)
+        raise TimeoutError("read timeout")
+
+    with pytest.raises(TimeoutError):
+        hedger.call(func, "model")
+    assert len(calls) == 1
+    assert hedger.stats()["hedged"] == 0
+
+
+def test_async_loser_is_cancelled():
+    """Test that the slower call is cancelled once the first response arrives."""
+    hedger = _warm_hedger(max_ratio=1.0)
+    cancelled = []
+    started = []
+
+    async def func():
+        index = len(started)
+        started.append(index)
+        try:
+            await asyncio.sleep(1.0 if index == 0 else 0.01)
+            return index
+        except asyncio.CancelledError:
+            cancelled.append(index)
+            raise
+
+    async def run():
+        result = await hedger.acall(func, "model")
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(run()) == 1
+    assert cancelled == [0]
+
+
+def test_error_of_one_call_waits_for_the_other():
+    """Test that a failing hedge does not hide a successful primary response."""
+    hedger = _warm_hedger(max_ratio=1.0)
+    started = []
+
+    async def func():
+        index = len(started)
+        started.append(index)
+        if index == 1:
+            raise ConnectionError("backup failed")
+        await asyncio.sleep(0.1)
+        return "primary"
+
+    assert asyncio.run(hedger.acall(func, "model")) == "primary"
+
+
+def test_all_calls_failing_raises_first_error():
+    """Test that the error is propagated (and retried by tenacity) if both calls fail."""
+    hedger = _warm_hedger(max_ratio=1.0)
+
+    def func():
+        time.sleep(0.1)
+        raise TimeoutError("slow")
+
+    with pytest.raises(TimeoutError):
+        hedger.call(func, "model")
+
+
+def test_time_queued_for_a_thread_does_not_trigger_a_hedge():
+    """Test that the hedge delay starts when the primary runs, not when it is submitted."""
+    hedger = _warm_hedger(max_ratio=1.0, max_workers=1)
+    busy = hedger._get_executor().submit(time.sleep, 0.2)
+
+    assert hedger.call(lambda: time.sleep(0.01) or "ok", "model") == "ok"
+    assert busy.done()
+    assert hedger.stats()["hedged"] == 0
+
+
+def test_pool_is_sized_to_the_limiter_concurrency():
+    """Test that sync calls are not throttled by the default executor size."""
+    from graph.config import LIMITER_MAX_CONCURRENCY
+
+    assert Hedger().max_workers == LIMITER_MAX_CONCURRENCY
+    assert _warm_hedger()._get_executor()._max_workers == LIMITER_MAX_CONCURRENCY
@@ -0,0 +1,113 @@
+"""
+Unit tests for the input compactor.
+
+These tests verify that e-mail noise is removed while every line with
+numbers and units is preserved.
+"""
+from unittest.mock import patch
+
+from langchain_core.prompts import PromptTemplate
+
+from graph.models.shipment_models import Shipment, ShipmentItem
+from graph.nodes.input_compactor import compact_text, compact_input, get_latest_input, strip_html, has_measure
+from graph.shipment_graph import build_shipment_graph
+
+
+def test_signature_and_disclaimer_are_removed():
+    """Test that the signature block and legal footer do not reach the LLM."""
+    text = (
+        "Hallo zusammen,\n"
+        "bitte um Angebot für 3 Europaletten, 120x80x150 cm, je 400 kg.\n"
+        "\n\n\n"
+        "Mit freundlichen Grüßen\n"
+        "Max Muster\n"
+        "Tel. +49 40 123456\n"
+        "Muster GmbH, Sitz der Gesellschaft: Hamburg\n"
+    )
+
+    result = compact_text(text)
+
+    assert result.text == "bitte um Angebot für 3 Europaletten, 120x80x150 cm, je 400 kg."
+    assert result.tokens_saved > 0
+
+
+def test_quoted_history_is_removed():
+    """Test that everything below a reply header is dropped."""
+    text = (
+        "Anbei die Maße: 2 Paletten 120x80x100 cm\n"
+        "Am 12.03.2025 um 10:15 schrieb Dispo <dispo@example.com>:\n"
+        "> Können Sie uns die Maße schicken?\n"
+        "> Danke und Gruß"
+    )
+
+    assert compact_text(text).text == "Anbei die Maße: 2 Paletten 120x80x100 cm"
+
+
+def test_lines_with_numbers_and_units_survive_everywhere():
+    """Test the guard: measurements in signature or quote are never removed."""
+    text = (
+        "Bitte Angebot.\n"
+        "Viele Grüße\n"
+        "PS: zusätzlich 1 Gitterbox 450 kg\n"
+        "-----Original Message-----\n"
+        "> ursprünglich 5 Paletten à 300 kg"
+    )
+
+    compacted = compact_text(text).text
+
+    assert "1 Gitterbox 450 kg" in compacted
+    assert "5 Paletten à 300 kg" in compacted
+
+
+def test_html_is_converted_to_plain_text():
+    """Test that tags and entities are removed but comparisons are kept."""
+    html = "<p>Gewicht &lt; 2 t</p><p>Ma&szlig;e 120x80 cm<br>Gesamt < 3 t</p>"
+
+    assert strip_html(html).split("\n")[:3] == ["Gewicht < 2 t", "Maße 120x80 cm", "Gesamt < 3 t"]
+
+
+def test_guard_requires_unit():
+    """Test that phone numbers are not treated as measurements."""
+    assert has_measure("3 Paletten")
+    assert has_measure("120 x 80")
+    assert not has_measure("Tel. +49 40 123456")
+
+
+def test_empty_result_falls_back_to_original():
+    """Test that an inquiry consisting only of noise is not emptied."""
+    assert compact_text("Hallo,\n").text == "Hallo,"
+
+
+def test_node_keeps_the_message_and_reports_savings():
+    """Test that the node stores the compacted text next to the unchanged messages."""
+    state = {"messages": ["older", "3 Paletten\n\n\n\nBest regards\nJohn"]}
+
+    update = compact_input(state)
+
+    assert "messages" not in update
+    assert update["compacted_input"] == "3 Paletten"
+    assert get_latest_input({**state, **update}) == "3 Paletten"
+    assert get_latest_input(state) == state["messages"][-1]
+    assert update["compaction"]["tokens_saved"] == update["compaction"]["original_tokens"] - update["compaction"]["compacted_tokens"]
+    assert update["compaction"]["tokens_saved"] > 0
+
+
+def test_graph_extracts_the_compacted_text_but_keeps_the_original_message():
+    """Test that the LLM sees the compacted input while the state keeps what the user wrote."""
+    class RecordingChain:
+        def __init__(self):
+            self.inputs = []
+
+        def invoke(self, data):
+            self.inputs.append(data["input"])
+            return Shipment(items=[ShipmentItem(name="Kiste")], message="ok")
+
+    message = "Bitte Angebot für Maschinenteile und Ersatzteile\n\n\n\nMit freundlichen Grüßen\nMax Muster"
+    chain = RecordingChain()
+    with patch('graph.nodes.shipment_extractor.load_prompt', return_value=PromptTemplate.from_template("{input}")), \
+         patch('graph.nodes.shipment_extractor.get_request_chain', return_value=chain):
+        result = build_shipment_graph().invoke({"messages": [message]})
+
+    assert chain.inputs == ["Bitte Angebot für Maschinenteile und Ersatzteile"]
+    assert result["messages"] == [message]
+    assert result["compacted_input"] == chain.inputs[0]
@@ -0,0 +1,171 @@
+"""
+Unit tests for item streaming.
+
+These tests verify that complete items are emitted exactly once while the
+structured output is generated, and that graph.stream delivers them through
+stream_mode="custom" before the final state.
+"""
+import asyncio
+from unittest.mock import patch
+
+from graph.models.shipment_models import Shipment, ShipmentItem
+from graph.nodes.shipment_extractor import astream_chain_with_retry, stream_chain_with_retry
+from graph.services.item_stream import ItemEmitter, create_item_emitter
+from graph.shipment_graph import build_shipment_graph
+
+TEXT = "Bitte Angebot für Maschinenteile und Ersatzteile, Details folgen"
+
+
+def partials(count):
+    """Growing partial Shipments like the streaming structured output parser yields them."""
+    items = []
+    for index in range(count):
+        items.append(ShipmentItem(name=f"Pos {index}"))
+        yield Shipment(items=list(items))
+        items[-1] = ShipmentItem(name=f"Pos {index}", quantity=index + 1)
+        yield Shipment(items=list(items))
+
+
+class StreamingChain:
+    def __init__(self, count=3):
+        self.count = count
+
+    def stream(self, data):
+        yield None
+        yield from partials(self.count)
+
+    async def astream(self, data):
+        for partial in partials(self.count):
+            await asyncio.sleep(0)
+            yield partial
+
+
+def test_emitter_holds_back_the_item_that_may_still_change():
+    """Test that only items followed by another item are emitted before the end."""
+    events = []
+    emitter = ItemEmitter(events.append)
+    for partial in partials(2):
+        emitter.feed(partial)
+
+    assert [event["item"] for event in events] == [{"load_carrier": None, "name": "Pos 0", "quantity": 1, "length": None,
+                                                    "width": None, "height": None, "weight": None, "stackable": None}]
+    emitter.finish(Shipment(items=[ShipmentItem(name="Pos 0", quantity=1), ShipmentItem(name="Pos 1", quantity=2)]))
+
+    assert [event["index"] for event in events] == [0, 1]
+    assert events[1]["item"]["quantity"] == 2
+
+
+def test_reset_is_only_sent_after_emitted_items():
+    """Test that a repeated extraction tells the consumer to discard its items."""
+    events = []
+    emitter = ItemEmitter(events.append, segment=1)
+    emitter.reset()
+    emitter.finish({"items": [{"name": "Kiste"}]})
+    emitter.reset()
+
+    assert [event["event"] for event in events] == ["shipment_item", "shipment_reset"]
+    assert events[1]["segment"] == 1
+    assert emitter.emitted == 0
+
+
+def test_no_emitter_without_stream_items():
+    """Test that streaming is opt-in per request."""
+    assert create_item_emitter(None) is None
+    assert create_item_emitter({"configurable": {"stream_items": True}}) is None  # outside a graph run
+
+
+def run_stream(chain, stream_items=True):
+    with patch('graph.nodes.shipment_extractor.load_prompt', return_value="prompt"), \
+         patch('graph.nodes.shipment_extractor.get_request_chain', return_value=chain):
+        graph = build_shipment_graph()
+        return list(graph.stream(
+            {"messages": [TEXT]},
+            config={"configurable": {"stream_items": stream_items}},
+            stream_mode=["custom", "values"]
+        ))
+
+
+def test_graph_streams_items_before_the_final_state():
+    """Test that each item arrives once through the custom stream, ahead of the result."""
+    chunks = run_stream(StreamingChain(3))
+
+    items = [chunk for mode, chunk in chunks if mode == "custom" and chunk["event"] == "shipment_item"]
+    final = [chunk for mode, chunk in chunks if mode == "values"][-1]
+    first_item_position = next(i for i, (mode, _) in enumerate(chunks) if mode == "custom")
+    extracted_position = next(i for i, (mode, chunk) in enumerate(chunks) if mode == "values" and chunk.get("extracted_data"))
+
+    assert [item["index"] for item in items] == [0, 1, 2]
+    assert [item["item"]["quantity"] for item in items] == [1, 2, 3]
+    assert first_item_position < extracted_position
+    assert len(final["extracted_data"]["items"]) == 3
+
+
+def test_graph_without_stream_items_invokes_the_chain():
+    """Test that the regular call is used when the caller does not ask for items."""
+    class InvokeChain:
+        def invoke(self, data):
+            return Shipment(items=[ShipmentItem(name="Kiste")], message="ok")
+
+    chunks = run_stream(InvokeChain(), stream_items=False)
+
+    assert not [chunk for mode, chunk in chunks if mode == "custom"]
+    assert chunks[-1][1]["extracted_data"]["items"][0]["name"] == "Kiste"
+
+
+def test_async_graph_streams_items():
+    """Test that graph.astream emits the items through the native async path."""
+    async def collect():
+        graph = build_shipment_graph()
+        return [chunk async for chunk in graph.astream(
+            {"messages": [TEXT]},
+            config={"configurable": {"stream_items": True}},
+            stream_mode="custom"
+        )]
+
+    with patch('graph.nodes.shipment_extractor.load_prompt', return_value="prompt"), \
+         patch('graph.nodes.shipment_extractor.get_request_chain', return_value=StreamingChain(2)):
+        events = asyncio.run(collect())
+
+    assert [(event["event"], event["index"]) for event in events] == [("shipment_item", 0), ("shipment_item", 1)]
+
+
+async def _no_sleep(seconds):
+    pass
+
+
+class FlakyStreamingChain(StreamingChain):
+    """Fails after the first item of the first stream, like a dropped connection."""
+
+    def __init__(self, count=2):
+        super().__init__(count)
+        self.attempts = 0
+
+    def stream(self, data):
+        self.attempts += 1
+        for index, partial in enumerate(partials(self.count)):
+            if self.attempts == 1 and index == 3:
+                raise ConnectionError("stream interrupted")
+            yield partial
+
+    async def astream(self, data):
+        for partial in self.stream(data):
+            await asyncio.sleep(0)
+            yield partial
+
+
+def test_retried_stream_resets_the_emitted_items():
+    """Test that a stream failing after one item is retried with a reset before the items are sent again."""
+    for run in (
+        lambda emitter: stream_chain_with_retry(FlakyStreamingChain(), {"input": TEXT}, emitter),
+        lambda emitter: asyncio.run(astream_chain_with_retry(FlakyStreamingChain(), {"input": TEXT}, emitter))
+    ):
+        events = []
+        emitter = ItemEmitter(events.append)
+        with patch.object(stream_chain_with_retry.retry, 'sleep', lambda seconds: None), \
+             patch.object(astream_chain_with_retry.retry, 'sleep', _no_sleep):
+            result = run(emitter)
+        emitter.finish(result)
+
+        assert [(event["event"], event.get("index")) for event in events] == [
+            ("shipment_item", 0), ("shipment_reset", None), ("shipment_item", 0), ("shipment_item", 1)
+        ]
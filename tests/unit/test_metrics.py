@@ -0,0 +1,71 @@
+"""
+Unit tests for the in-process metrics.
+
+These tests verify histograms, spans, the sinks and the token usage callback.
+"""
+import asyncio
+import json
+import pytest
+from types import SimpleNamespace
+
+from graph.services.metrics import (
+    MetricsRegistry,
+    JsonLinesSink,
+    PrometheusTextSink,
+    timed_node,
+    metrics
+)
+from graph.nodes.shipment_extractor import UsageMetricsCallback, extract_token_usage
+
+
+def test_span_records_stage_duration():
+    """Test that a span is recorded in the stage histogram."""
+    registry = MetricsRegistry()
+    with registry.span("llm_call"):
+        pass
+
+    histogram = registry.histogram("shipmentbot_stage_duration_seconds", stage="llm_call")
+    assert histogram["count"] == 1
+    assert histogram["buckets"]["30.0"] == 1
+
+
+def test_prometheus_and_jsonl_sinks(tmp_path):
+    """Test that both sinks export the recorded metrics."""
+    jsonl_path = tmp_path / "metrics.jsonl"
+    prom_path = tmp_path / "metrics.prom"
+    registry = MetricsRegistry(sinks=[JsonLinesSink(str(jsonl_path)), PrometheusTextSink(str(prom_path))])
+
+    registry.inc("shipmentbot_llm_retries_total", attempt=1)
+    registry.observe("shipmentbot_node_duration_seconds", 0.02, node="validate")
+    registry.export()
+
+    events = [json.loads(line) for line in jsonl_path.read_text().splitlines()]
+    assert [e["name"] for e in events] == ["shipmentbot_llm_retries_total", "shipmentbot_node_duration_seconds"]
+
+    text = prom_path.read_text()
+    assert 'shipmentbot_llm_retries_total{attempt="1"} 1.0' in text
+    assert 'shipmentbot_node_duration_seconds_bucket{node="validate",le="0.025"} 1' in text
+    assert 'shipmentbot_node_duration_seconds_count{node="validate"} 1' in text
+
+
+def test_timed_node_supports_sync_and_async():
+    """Test that sync and async nodes are timed under the same node label."""
+    before = (metrics.histogram("shipmentbot_node_duration_seconds", node="test_node") or {}).get("count", 0)
+
+    async def anode(state):
+        return {"message": "async"}
+
+    assert timed_node("test_node", lambda state: {"message": "sync"})({}) == {"message": "sync"}
+    assert asyncio.run(timed_node("test_node", anode)({})) == {"message": "async"}
+    assert metrics.histogram("shipmentbot_node_duration_seconds", node="test_node")["count"] == before + 2
+
+
+def test_token_usage_is_read_from_llm_result():
+    """Test that input and output tokens are read from the Anthropic response."""
+    message = SimpleNamespace(usage_metadata={"input_tokens": 812, "output_tokens": 64})
+    response = SimpleNamespace(generations=[[SimpleNamespace(message=message)]], llm_output={})
+
+    assert extract_token_usage(response) == {"input_tokens": 812, "output_tokens": 64}
+
+    UsageMetricsCallback("test-model").on_llm_end(response)
+    assert metrics.histogram("shipmentbot_llm_input_tokens", model="test-model")["sum"] >= 812
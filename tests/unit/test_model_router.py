@@ -0,0 +1,105 @@
+"""
+Unit tests for the model router.
+
+These tests verify the tier selection and the escalation from the small
+to the large tier.
+"""
+import asyncio
+from unittest.mock import MagicMock, patch
+
+from graph.nodes.model_router import (
+    RoutingPolicy,
+    select_tier,
+    route_model,
+    needs_escalation,
+    SMALL_TIER,
+    LARGE_TIER
+)
+from graph.nodes.shipment_extractor import process_shipment, aprocess_shipment
+from graph.models.shipment_models import Shipment, ShipmentItem
+from graph.services.metrics import metrics
+
+POLICY = RoutingPolicy(enabled=True, max_chars=200, max_items=2, min_confidence=0.25)
+
+
+def test_short_simple_inquiry_uses_small_tier():
+    """Test that a one-liner the fast path partially understood goes to the small model."""
+    assert select_tier("3 Paletten nach Wien", 0.5, POLICY) == {"tier": "small", "reason": "simple"}
+
+
+def test_long_inquiry_uses_large_tier():
+    """Test that long tenders go to the large model."""
+    assert select_tier("3 Paletten " * 50, 0.5, POLICY)["reason"] == "length"
+
+
+def test_many_items_use_large_tier():
+    """Test that inquiries with several items go to the large model."""
+    text = "2 Paletten 120x80x100, 1 Gitterbox 120x100x90, 3 Kartons 60x40x40"
+    assert select_tier(text, 0.5, POLICY) == {"tier": "large", "reason": "items"}
+
+
+def test_unrecognized_format_uses_large_tier():
+    """Test that inputs the rules could not read at all go to the large model."""
+    assert select_tier("Wir brauchen einen Transport", 0.0, POLICY)["reason"] == "confidence"
+
+
+def test_disabled_policy_uses_default_tier():
+    """Test that routing can be switched off."""
+    assert select_tier("3 Paletten", 0.5, RoutingPolicy(enabled=False))["tier"] == "large"
+
+
+def test_route_model_node_stores_tier():
+    """Test that the node writes the tier to the state."""
+    with patch('graph.nodes.model_router.RoutingPolicy', return_value=POLICY):
+        assert route_model({"messages": ["3 Paletten"], "fast_path_confidence": 0.5}) == {"model_tier": "small"}
+
+
+def test_needs_escalation():
+    """Test that errors and empty shipments are escalated."""
+    assert needs_escalation({"extracted_data": None, "message": "Error"})
+    assert needs_escalation({"extracted_data": {"items": []}})
+    assert not needs_escalation({"extracted_data": {"items": [{"quantity": 1}]}})
+
+
+def _chains_by_tier(small_result, large_result):
+    chains = {SMALL_TIER.name: MagicMock(), LARGE_TIER.name: MagicMock()}
+    chains[SMALL_TIER.name].invoke.return_value = small_result
+    chains[LARGE_TIER.name].invoke.return_value = large_result
+
+    async def ainvoke_small(data):
+        return small_result
+
+    async def ainvoke_large(data):
+        return large_result
+
+    chains[SMALL_TIER.name].ainvoke = ainvoke_small
+    chains[LARGE_TIER.name].ainvoke = ainvoke_large
+    return chains, lambda prompt_template, tier=None: chains[(tier or LARGE_TIER).name]
+
+
+def test_empty_small_result_escalates_to_large_tier():
+    """Test that an empty Shipment from the small model is repeated with the large model."""
+    large = Shipment(items=[ShipmentItem(quantity=3)], message="ok")
+    chains, get_chain = _chains_by_tier(Shipment(items=[], message="empty"), large)
+    before = metrics.counter_value("shipmentbot_model_escalations_total", from_tier="small", to_tier="large")
+
+    with patch('graph.nodes.shipment_extractor.load_prompt', return_value="prompt"), \
+         patch('graph.nodes.shipment_extractor.get_request_chain', side_effect=get_chain):
+        result = process_shipment({"messages": ["3 Paletten"], "model_tier": "small"})
+
+    assert result["extracted_data"]["items"][0]["quantity"] == 3
+    chains[SMALL_TIER.name].invoke.assert_called_once()
+    assert metrics.counter_value("shipmentbot_model_escalations_total", from_tier="small", to_tier="large") == before + 1
+    assert metrics.histogram("shipmentbot_model_tier_duration_seconds", tier="small", model=SMALL_TIER.model)["count"] >= 1
+
+
+def test_valid_small_result_is_not_escalated():
+    """Test that a good small model result is used as is."""
+    small = Shipment(items=[ShipmentItem(quantity=3)], message="small")
+    chains, get_chain = _chains_by_tier(small, Shipment(items=[], message="large"))
+
+    with patch('graph.nodes.shipment_extractor.load_prompt', return_value="prompt"), \
+         patch('graph.nodes.shipment_extractor.get_request_chain', side_effect=get_chain):
+        result = asyncio.run(aprocess_shipment({"messages": ["3 Paletten"], "model_tier": "small"}))
+
+    assert result["message"] == "small"
@@ -0,0 +1,152 @@
+"""
+Unit tests for the near-duplicate index.
+
+These tests verify that inquiries differing only in greetings or reference
+numbers are matched, that different numbers are never reused, that
+the index stays bounded, and that the extractor node reuses the result of a
+near-identical inquiry without calling the LLM.
+"""
+import pytest
+from unittest.mock import patch
+
+from langchain_core.prompts import PromptTemplate
+
+from graph.models.shipment_models import Shipment, ShipmentItem
+from graph.nodes import shipment_extractor
+from graph.services.near_duplicates import MAX_SHINGLES, NearDuplicateIndex, _shingles, numeric_tokens
+
+INQUIRY = (
+    "Bitte um Angebot für folgende Sendung, Referenz 4711-2024:\n"
+    "3 Europaletten 120x80x150 cm, je 450 kg, nicht stapelbar\n"
+    "2 Gitterboxen 124x84x97 cm, 300 kg\n"
+    "Abholung in Hamburg, Lieferung nach München."
+)
+VARIANT = "Guten Tag,\n" + INQUIRY.replace("Bitte", "bitte").replace("4711", "4712")
+OTHER_WEIGHT = VARIANT.replace("450 kg", "460 kg")
+
+
+def test_variant_with_other_greeting_and_reference_is_found():
+    """Test that a new greeting line and another reference number still match."""
+    index = NearDuplicateIndex()
+    index.add(index.fingerprint(INQUIRY), "first")
+
+    assert index.find(index.fingerprint(VARIANT)) == "first"
+    assert index.find(index.fingerprint("1 Paket 40x30x20 cm, 5 kg nach Berlin")) is None
+
+
+def test_different_measure_numbers_are_never_reused():
+    """Test that a similar text with another weight is extracted again."""
+    index = NearDuplicateIndex()
+    index.add(index.fingerprint(INQUIRY), "first")
+
+    assert index.find(index.fingerprint(OTHER_WEIGHT)) is None
+
+
+def test_only_reference_numbers_are_left_out():
+    """Test that every number is compared except the values of reference or ID labels."""
+    assert numeric_tokens("Ref 4711\n3 Paletten je 450,5 kg\nAnzahl Gasflaschen: 2") == ("3", "450.5", "2")
+    assert numeric_tokens("Anfrage Nr. 99812, Auftragsnummer: A-2024/17, #5531") == ()
+    assert numeric_tokens("Please order 3 pallets") == ("3",)
+
+
+def test_different_unitless_quantities_are_never_reused():
+    """Test that a quantity line without a unit blocks the reuse."""
+    inquiry = INQUIRY + "\nAnzahl Gasflaschen: 2\nMenge: 4"
+    index = NearDuplicateIndex()
+    index.add(index.fingerprint(inquiry), "first")
+
+    assert index.find(index.fingerprint(inquiry.replace("Gasflaschen: 2", "Gasflaschen: 6"))) is None
+    assert index.find(index.fingerprint(inquiry.replace("Menge: 4", "Menge: 9"))) is None
+    assert index.find(index.fingerprint(inquiry.replace("4711", "4712"))) == "first"
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Bitte um Angebot 1200 kg Stahlträger, Abholung in Hamburg, Lieferung nach München",
+     "Bitte um Angebot 1800 kg Stahlträger, Abholung in Hamburg, Lieferung nach München"),
+    ("Order 2400 kg steel beams, pickup in Hamburg, delivery to Munich",
+     "Order 1600 kg steel beams, pickup in Hamburg, delivery to Munich"),
+    ("Auftrag 1500 Stück Kartons, Abholung in Hamburg, Lieferung nach München",
+     "Auftrag 2500 Stück Kartons, Abholung in Hamburg, Lieferung nach München"),
+    ("Anfrage 1200x800x1500 mm Kiste, Abholung in Hamburg, Lieferung nach München",
+     "Anfrage 1000x800x1500 mm Kiste, Abholung in Hamburg, Lieferung nach München"),
+])
+def test_quantities_after_ambiguous_labels_are_never_reused(first, second):
+    """Test that a quantity after 'Angebot', 'Order', 'Auftrag' or 'Anfrage' is not taken as a reference."""
+    index = NearDuplicateIndex()
+    index.add(index.fingerprint(first), "first")
+
+    assert index.find(index.fingerprint(second)) is None
+
+
+def test_ambiguous_labels_need_a_number_marker():
+    """Test that 'Auftrag'/'Order' only label a reference with Nr/No/#/: in front of the value."""
+    assert numeric_tokens("Auftrag Nr. 88123, Order no. 123456, Anfrage: A-99812") == ()
+    assert numeric_tokens("Auftrag Nr. 1500 Stück") == ("1500",)
+
+
+def test_scopes_are_separated():
+    """Test that results of another prompt version or model are not reused."""
+    index = NearDuplicateIndex()
+    index.add(index.fingerprint(INQUIRY), "first", scope="v1:large")
+
+    assert index.find(index.fingerprint(VARIANT), scope="v2:large") is None
+    assert index.find(index.fingerprint(VARIANT), scope="v1:large") == "first"
+
+
+def test_index_is_bounded_and_evicts_least_recently_used():
+    """Test that the oldest unused text is evicted together with its buckets."""
+    index = NearDuplicateIndex(max_entries=2)
+    index.add(index.fingerprint(INQUIRY), "first")
+    index.add(index.fingerprint("1 Paket 40x30x20 cm, 5 kg nach Berlin"), "second")
+    index.find(index.fingerprint(VARIANT))  # first is now the most recently used
+    index.add(index.fingerprint("4 Kisten 60x40x40 cm, 80 kg nach Wien"), "third")
+
+    assert len(index) == 2
+    assert index.find(index.fingerprint(VARIANT)) == "first"
+    assert index.find(index.fingerprint("1 Paket 40x30x20 cm, 5 kg nach Berlin")) is None
+    assert all(bucket for bucket in index._buckets.values())
+
+
+def test_bands_must_divide_the_signature():
+    """Test that an invalid LSH configuration is rejected."""
+    with pytest.raises(ValueError):
+        NearDuplicateIndex(num_perm=100, bands=32)
+
+
+class CountingChain:
+    def __init__(self):
+        self.inputs = []
+
+    def invoke(self, data):
+        self.inputs.append(data["input"])
+        return Shipment(items=[ShipmentItem(name="Europalette", quantity=3)], message="ok")
+
+
+def test_extractor_reuses_the_result_of_a_near_duplicate():
+    """Test that process_shipment calls the LLM once for a cluster of near-identical inquiries."""
+    chain = CountingChain()
+    shipment_extractor.result_cache.clear()
+    shipment_extractor.near_duplicate_index.clear()
+    with patch('graph.nodes.shipment_extractor.load_prompt', return_value=PromptTemplate.from_template("{input}")), \
+         patch('graph.nodes.shipment_extractor.get_request_chain', return_value=chain):
+        first = shipment_extractor.process_shipment({"messages": [INQUIRY]})
+        variant = shipment_extractor.process_shipment({"messages": [VARIANT]})
+        other = shipment_extractor.process_shipment({"messages": [OTHER_WEIGHT]})
+        unitless = shipment_extractor.process_shipment({"messages": [INQUIRY + "\nAnzahl Gasflaschen: 2"]})
+        other_unitless = shipment_extractor.process_shipment({"messages": [INQUIRY + "\nAnzahl Gasflaschen: 6"]})
+
+    assert chain.inputs == [INQUIRY, OTHER_WEIGHT, INQUIRY + "\nAnzahl Gasflaschen: 2", INQUIRY + "\nAnzahl Gasflaschen: 6"]
+    assert unitless["extracted_data"] is not None and other_unitless["extracted_data"] is not None
+    assert variant == first
+    assert other["extracted_data"] is not None
+
+
+def test_long_texts_are_sampled_to_a_bounded_shingle_set():
+    """Test that the signature of a long text is computed from at most MAX_SHINGLES shingles."""
+    text = " ".join(a + b + c for a in "abcdefgh" for b in "ijklmnop" for c in "qrstuvwx")
+    index = NearDuplicateIndex()
+
+    assert len(_shingles(text)) == MAX_SHINGLES
+    assert index.find(index.fingerprint(text)) is None
+    index.add(index.fingerprint(text), "long")
+    assert index.find(index.fingerprint("Guten Tag,\n" + text)) == "long"
@@ -0,0 +1,120 @@
+"""
+Unit tests for Anthropic prompt caching.
+
+These tests verify that the static instructions are sent as a system prefix
+with cache_control, that the user's text is the only variable part, and that
+cache read and write tokens are recorded per request.
+"""
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableLambda
+
+from graph.nodes.shipment_extractor import (
+    UsageMetricsCallback,
+    build_cacheable_prompt,
+    create_extraction_chain,
+    extract_cache_usage
+)
+from graph.services.metrics import metrics
+
+INSTRUCTIONS = "Extract the shipment data from the following text:\n\n"
+
+
+class RecordingLLM:
+    """Stands in for ChatAnthropic and records the messages sent to the structured LLM."""
+
+    def __init__(self):
+        self.calls = []
+
+    def with_structured_output(self, schema):
+        return RunnableLambda(lambda messages: self.calls.append(messages) or schema())
+
+
+def test_static_instructions_are_a_cached_system_prefix():
+    """Test that the text before {input} is marked with cache_control and the input is the user message."""
+    prompt = build_cacheable_prompt(PromptTemplate.from_template(INSTRUCTIONS + "{input}"))
+
+    system, human = prompt.invoke({"input": "3 Paletten, 120x80x100 cm"})
+
+    assert isinstance(system, SystemMessage)
+    assert system.content == [{"type": "text", "text": INSTRUCTIONS, "cache_control": {"type": "ephemeral"}}]
+    assert isinstance(human, HumanMessage)
+    assert human.content == "3 Paletten, 120x80x100 cm"
+
+
+def test_system_prefix_does_not_depend_on_the_input():
+    """Test that two inquiries share an identical prefix, so the second one is read from the cache."""
+    prompt = build_cacheable_prompt(PromptTemplate.from_template(INSTRUCTIONS + "{input}\n\nAnswer in JSON."))
+
+    first = asyncio.run(prompt.ainvoke({"input": "1 Kiste"}))
+    second = prompt.invoke({"input": "2 Gitterboxen"})
+
+    assert first[0] == second[0]
+    assert second[1].content == "2 Gitterboxen\n\nAnswer in JSON."
+
+
+def test_instructions_after_the_input_are_cached():
+    """Test that a prompt starting with {input} caches the instructions that follow it."""
+    system, human = build_cacheable_prompt(PromptTemplate.from_template("{input}\n\nExtract the shipment.")).invoke(
+        {"input": "1 Kiste"}
+    )
+
+    assert system.content[0]["text"] == "\n\nExtract the shipment."
+    assert human.content == "1 Kiste"
+
+
+def test_prompts_with_other_variables_are_unchanged():
+    """Test that templates that cannot be split are sent as before."""
+    template = PromptTemplate.from_template("Customer {customer}:\n{input}")
+
+    assert build_cacheable_prompt(template) is template
+    assert build_cacheable_prompt(PromptTemplate.from_template("{input}")).invoke({"input": "x"}).to_string() == "x"
+
+
+def test_extraction_chain_sends_the_cacheable_prefix():
+    """Test that create_extraction_chain sends system and user message to the structured LLM."""
+    llm = RecordingLLM()
+
+    create_extraction_chain(PromptTemplate.from_template(INSTRUCTIONS + "{input}"), llm=llm).invoke({"input": "1 Kiste"})
+
+    system, human = llm.calls[0]
+    assert system.content[0]["cache_control"] == {"type": "ephemeral"}
+    assert human.content == "1 Kiste"
+
+
+def test_prompt_caching_can_be_disabled():
+    """Test that ANTHROPIC_PROMPT_CACHING=false sends the formatted prompt as one user message."""
+    llm = RecordingLLM()
+
+    with patch('graph.nodes.shipment_extractor.ANTHROPIC_PROMPT_CACHING', False):
+        create_extraction_chain(PromptTemplate.from_template(INSTRUCTIONS + "{input}"), llm=llm).invoke({"input": "1 Kiste"})
+
+    assert llm.calls[0].to_string() == INSTRUCTIONS + "1 Kiste"
+
+
+def test_cache_usage_is_read_from_llm_result():
+    """Test that cache read and write tokens are read from usage_metadata and recorded per model."""
+    message = SimpleNamespace(usage_metadata={
+        "input_tokens": 1300, "output_tokens": 64,
+        "input_token_details": {"cache_read": 1200, "cache_creation": 0}
+    })
+    response = SimpleNamespace(generations=[[SimpleNamespace(message=message)]], llm_output={})
+
+    assert extract_cache_usage(response) == {"cache_read_tokens": 1200, "cache_write_tokens": 0}
+
+    UsageMetricsCallback("cache-model").on_llm_end(response)
+    assert metrics.histogram("shipmentbot_llm_cache_read_tokens", model="cache-model")["sum"] >= 1200
+    assert metrics.histogram("shipmentbot_llm_cache_write_tokens", model="cache-model")["count"] >= 1
+
+
+def test_cache_usage_falls_back_to_llm_output():
+    """Test that the raw Anthropic usage fields are used without usage_metadata."""
+    response = SimpleNamespace(generations=[], llm_output={
+        "usage": {"input_tokens": 40, "cache_creation_input_tokens": 1500, "cache_read_input_tokens": 0}
+    })
+
+    assert extract_cache_usage(response) == {"cache_read_tokens": 0, "cache_write_tokens": 1500}
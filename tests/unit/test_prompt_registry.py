@@ -0,0 +1,73 @@
+"""
+Unit tests for the prompt registry.
+
+These tests verify caching, background refresh and stale-while-revalidate.
+"""
+import pytest
+from unittest.mock import MagicMock
+
+from graph.services.prompt_registry import PromptRegistry, prompt_fingerprint
+
+
+class FakeClock:
+    """Manually advanced time source."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_prompt_is_loaded_once_and_served_from_memory():
+    """Test that repeated lookups only call the loader once."""
+    loader = MagicMock(return_value="prompt v1")
+    registry = PromptRegistry(loader=loader, ttl=60, clock=FakeClock())
+
+    assert registry.get("shipment") == "prompt v1"
+    assert registry.get("shipment") == "prompt v1"
+
+    loader.assert_called_once_with("shipment")
+    stats = registry.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
+    assert registry.get_version("shipment") == prompt_fingerprint("prompt v1")
+
+
+def test_failed_initial_load_is_not_cached():
+    """Test that a failed load returns None and is retried on the next call."""
+    loader = MagicMock(side_effect=[None, "prompt v1"])
+    registry = PromptRegistry(loader=loader, ttl=60, clock=FakeClock())
+
+    assert registry.get("shipment") is None
+    assert registry.get("shipment") == "prompt v1"
+    assert registry.stats()["misses"] == 2
+
+
+def test_expired_prompt_is_refreshed_and_version_changes():
+    """Test that an expired prompt is refreshed and gets a new version."""
+    clock = FakeClock()
+    loader = MagicMock(side_effect=["prompt v1", "prompt v2"])
+    registry = PromptRegistry(loader=loader, ttl=60, clock=clock)
+
+    registry.get("shipment")
+    old_version = registry.get_version("shipment")
+    clock.now = 61
+
+    assert registry.refresh("shipment") is True
+    assert registry.get("shipment") == "prompt v2"
+    assert registry.get_version("shipment") != old_version
+
+
+def test_stale_prompt_is_served_when_refresh_fails():
+    """Test stale-while-revalidate when LangSmith is unavailable."""
+    clock = FakeClock()
+    loader = MagicMock(side_effect=["prompt v1", ConnectionError("down")])
+    registry = PromptRegistry(loader=loader, ttl=60, retry_interval=10, clock=clock)
+
+    registry.get("shipment")
+    clock.now = 61
+
+    assert registry.refresh("shipment") is False
+    assert registry.get("shipment") == "prompt v1"
+    assert registry.stats()["refresh_failures"] == 1
@@ -0,0 +1,150 @@
+"""
+Unit tests for the process-wide limiter.
+
+These tests verify the token buckets, the AIMD concurrency limit,
+retry-after handling and the sharing between threads and async tasks.
+"""
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from graph.services.rate_limiter import AdaptiveLimiter, TokenBucket, classify_error
+from graph.services.metrics import metrics
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class OverloadedError(Exception):
+    def __init__(self, status_code=529, headers=None):
+        super().__init__("overloaded")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+def test_token_bucket_refills_per_minute():
+    """Test that an empty bucket reports the time until enough tokens are back."""
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock)
+    bucket.consume(60)
+
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    clock.now += 1
+    assert bucket.wait_time(1) == 0.0
+
+
+def test_tpm_bucket_blocks_when_exhausted():
+    """Test that the TPM bucket delays calls once the tokens are used up."""
+    clock = FakeClock()
+    limiter = AdaptiveLimiter(tpm=6000, clock=clock)
+    limiter.acquire(tokens=6000)
+    limiter.release()
+
+    assert limiter._try_acquire(3000) == (False, pytest.approx(30.0))
+
+
+def test_aimd_backoff_and_recovery():
+    """Test the multiplicative decrease on 429 and the additive increase on success."""
+    limiter = AdaptiveLimiter(initial_concurrency=8, min_concurrency=1, max_concurrency=16, decrease_factor=0.5)
+
+    limiter.acquire()
+    limiter.release(OverloadedError(429))
+    assert limiter.stats()["concurrency_limit"] == 4
+
+    for _ in range(5):
+        limiter.acquire()
+        limiter.release()
+    assert limiter.stats()["concurrency_limit"] == 5
+
+
+def test_retry_after_pauses_all_calls():
+    """Test that a retry-after header blocks new calls until it has passed."""
+    clock = FakeClock()
+    limiter = AdaptiveLimiter(clock=clock)
+    limiter.acquire()
+    limiter.release(OverloadedError(429, {"retry-after": "12"}))
+
+    acquired, wait = limiter._try_acquire(0)
+    assert not acquired and wait == pytest.approx(12.0)
+    clock.now += 12
+    assert limiter._try_acquire(0)[0]
+
+
+def test_classify_error():
+    """Test the detection of rate limit and overloaded responses."""
+    assert classify_error(OverloadedError(429, {"retry-after-ms": "1500"})) == (True, 1.5)
+    assert classify_error(OverloadedError(529)) == (True, None)
+    assert classify_error(ValueError("bad")) == (False, None)
+
+
+def test_concurrency_is_shared_by_threads_and_tasks():
+    """Test that threads and async tasks together never exceed the limit."""
+    limiter = AdaptiveLimiter(initial_concurrency=2, min_concurrency=2, max_concurrency=2)
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def enter():
+        with lock:
+            active.append(1)
+            peak.append(len(active))
+
+    def leave():
+        with lock:
+            active.pop()
+
+    def blocking_call():
+        enter()
+        time.sleep(0.05)
+        leave()
+
+    async def async_call():
+        enter()
+        await asyncio.sleep(0.05)
+        leave()
+
+    async def run_tasks():
+        await asyncio.gather(*(limiter.acall(async_call) for _ in range(3)))
+
+    threads = [threading.Thread(target=limiter.call, args=(blocking_call,)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    asyncio.run(run_tasks())
+    for thread in threads:
+        thread.join()
+
+    assert max(peak) <= 2
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_queue_depth_gauge_reports_waiting_calls():
+    """Test that waiting calls are visible in shipmentbot_limiter_queue_depth."""
+    limiter = AdaptiveLimiter(initial_concurrency=1, min_concurrency=1, max_concurrency=1)
+    limiter.acquire()
+    waiter = threading.Thread(target=limiter.call, args=(lambda: None,))
+    waiter.start()
+    time.sleep(0.05)
+
+    gauges = {entry["value"] for entry in metrics.snapshot()["gauges"]["shipmentbot_limiter_queue_depth"]}
+    assert limiter.stats()["waiting"] == 1
+    assert 1 in gauges
+
+    limiter.release()
+    waiter.join(timeout=1)
+    assert limiter.stats()["waiting"] == 0
+
+
+def test_retry_policy_retries_overloaded_errors():
+    """Test that 429/529 responses are retried instead of turned into errors."""
+    from graph.nodes.shipment_extractor import RETRY_POLICY
+    retry_state = SimpleNamespace(outcome=SimpleNamespace(failed=True, exception=lambda: OverloadedError(429)))
+
+    assert RETRY_POLICY["retry"](retry_state)
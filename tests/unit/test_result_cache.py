@@ -0,0 +1,80 @@
+"""
+Unit tests for the extraction result cache.
+
+These tests verify key normalization, the LRU and SQLite tiers and the
+integration into process_shipment.
+"""
+import pytest
+from unittest.mock import patch, MagicMock
+
+from graph.services.result_cache import ResultCache, build_cache_key
+from graph.models.shipment_models import Shipment, ShipmentItem, LoadCarrierType
+from graph.nodes.shipment_extractor import process_shipment
+
+
+class FakeClock:
+    """Manually advanced time source."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+RESULT = {"extracted_data": {"items": [], "shipment_notes": None, "message": "ok"}, "message": "ok"}
+
+
+def test_cache_key_ignores_whitespace_but_not_prompt_or_model():
+    """Test that only the normalized content and configuration define the key."""
+    key = build_cache_key("3  Paletten\n120x80", "v1", model="claude")
+
+    assert key == build_cache_key(" 3 Paletten 120x80 ", "v1", model="claude")
+    assert key != build_cache_key("3 Paletten 120x80", "v2", model="claude")
+    assert key != build_cache_key("3 Paletten 120x80", "v1", model="other")
+
+
+def test_memory_tier_evicts_least_recently_used():
+    """Test that the memory tier is bounded."""
+    cache = ResultCache(max_entries=2, ttl=60, db_path=None)
+    cache.set("a", RESULT)
+    cache.set("b", RESULT)
+    cache.get("a")
+    cache.set("c", RESULT)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == RESULT
+    assert cache.stats()["memory_entries"] == 2
+
+
+def test_disk_tier_survives_restart_and_expires(tmp_path):
+    """Test that results persist in SQLite and expire after the TTL."""
+    clock = FakeClock()
+    db_path = str(tmp_path / "cache.sqlite3")
+    ResultCache(ttl=60, db_path=db_path, clock=clock).set("key", RESULT)
+
+    restarted = ResultCache(ttl=60, db_path=db_path, clock=clock)
+    assert restarted.get("key") == RESULT
+    assert restarted.stats()["disk_hits"] == 1
+
+    clock.now += 61
+    assert ResultCache(ttl=60, db_path=db_path, clock=clock).get("key") is None
+
+
+def test_cache_hit_bypasses_llm_and_matches_fresh_result():
+    """Test that a repeated inquiry is served from the cache with identical data."""
+    shipment = Shipment(
+        items=[ShipmentItem(load_carrier=LoadCarrierType.PACKAGE, name="Karton", quantity=2)],
+        message="Extraction successful."
+    )
+    chain = MagicMock()
+    chain.invoke.return_value = shipment
+
+    with patch('graph.nodes.shipment_extractor.load_prompt', return_value="prompt"), \
+         patch('graph.nodes.shipment_extractor.get_request_chain', return_value=chain):
+        fresh = process_shipment({"messages": ["2 Kartons  mit Ersatzteilen"]})
+        cached = process_shipment({"messages": ["2 Kartons mit Ersatzteilen"]})
+
+    chain.invoke.assert_called_once()
+    assert cached == fresh
+    assert type(cached["extracted_data"]["items"][0]["load_carrier"]) is LoadCarrierType
@@ -0,0 +1,136 @@
+"""
+Unit tests for the priority scheduler.
+
+These tests verify weighted fair queuing, starvation protection and that
+the priority hint travels from the graph config to the limiter.
+"""
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+from graph.services.scheduler import (
+    WeightedFairQueue,
+    parse_weights,
+    get_priority_from_config,
+    priority_scope,
+    current_priority
+)
+from graph.services.rate_limiter import AdaptiveLimiter
+from graph.models.shipment_models import Shipment, ShipmentItem
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def drain(queue, count):
+    order = []
+    for _ in range(count):
+        ticket = queue.head()
+        queue.remove(ticket)
+        order.append(ticket.priority)
+    return order
+
+
+def test_interactive_overtakes_queued_bulk_calls():
+    """Test that an interactive call is admitted before a backlog of bulk calls."""
+    queue = WeightedFairQueue({"interactive": 8, "bulk": 1}, max_wait=60, clock=FakeClock())
+    for _ in range(5):
+        queue.enqueue("bulk")
+    queue.enqueue("interactive")
+
+    assert queue.head().priority == "interactive"
+
+
+def test_weighted_fair_share_under_contention():
+    """Test that both classes progress in the ratio of their weights."""
+    queue = WeightedFairQueue({"interactive": 3, "bulk": 1}, max_wait=60, clock=FakeClock())
+    for _ in range(12):
+        queue.enqueue("interactive")
+        queue.enqueue("bulk")
+
+    order = drain(queue, 8)
+
+    assert order.count("interactive") == 6
+    assert order.count("bulk") == 2
+
+
+def test_starving_call_is_admitted_first():
+    """Test that a bulk call is not starved by a steady stream of interactive calls."""
+    clock = FakeClock()
+    queue = WeightedFairQueue({"interactive": 1000, "bulk": 1}, max_wait=5, clock=clock)
+    queue.enqueue("bulk")
+    queue.enqueue("bulk")
+    for _ in range(3):
+        queue.enqueue("interactive")
+    drain(queue, 2)
+    assert queue.head().priority == "interactive"
+
+    clock.now += 5
+    assert queue.head().priority == "bulk"
+
+
+def test_abandoned_ticket_is_removed():
+    """Test that a cancelled call does not block the queue."""
+    queue = WeightedFairQueue({"interactive": 1, "bulk": 1}, clock=FakeClock())
+    ticket = queue.enqueue("bulk")
+    queue.remove(ticket, admitted=False)
+    assert queue.head() is None
+
+
+def test_priority_from_config():
+    """Test the priority hint in the graph config."""
+    assert get_priority_from_config({"configurable": {"priority": "BULK"}}) == "bulk"
+    assert get_priority_from_config(None) == "interactive"
+    assert parse_weights("interactive:4, bulk:1") == {"interactive": 4.0, "bulk": 1.0}
+
+
+def test_limiter_admits_interactive_before_waiting_bulk():
+    """Test the scheduling order at the saturated limiter."""
+    limiter = AdaptiveLimiter(initial_concurrency=1, min_concurrency=1, max_concurrency=1)
+    order = []
+
+    async def call(priority, delay):
+        await asyncio.sleep(delay)
+        with priority_scope(priority):
+            await limiter.aacquire()
+        order.append(priority)
+        await asyncio.sleep(0.02)
+        limiter.release()
+
+    async def run():
+        limiter.acquire()
+        tasks = [asyncio.create_task(call("bulk", 0)) for _ in range(3)]
+        tasks.append(asyncio.create_task(call("interactive", 0.01)))
+        await asyncio.sleep(0.05)
+        limiter.release()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert order[0] == "interactive"
+
+
+def test_graph_config_priority_reaches_the_limiter():
+    """Test that graph.invoke(..., config=...) carries the hint to shipment_extractor."""
+    from graph.shipment_graph import build_shipment_graph
+
+    seen = []
+
+    class Chain:
+        def invoke(self, data):
+            seen.append(current_priority())
+            return Shipment(items=[ShipmentItem(quantity=1)], message="ok")
+
+    with patch('graph.nodes.shipment_extractor.load_prompt', return_value="prompt"), \
+         patch('graph.nodes.shipment_extractor.get_request_chain', return_value=Chain()):
+        build_shipment_graph().invoke(
+            {"messages": ["Bitte Transport anbieten"]},
+            config={"configurable": {"priority": "bulk"}}
+        )
+
+    assert seen == ["bulk"]
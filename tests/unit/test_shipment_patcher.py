@@ -0,0 +1,158 @@
+"""
+Unit tests for the shipment patcher.
+
+These tests verify applying item patches by index, the rejection of invalid
+patches and the patch mode of the extractor for follow-up messages.
+"""
+from unittest.mock import patch
+
+import pytest
+
+from graph.models.shipment_models import Shipment, ShipmentItem, ShipmentPatch, ItemChange, ItemOperation
+from graph.nodes.shipment_patcher import apply_shipment_patch, build_patch_input, uses_patch_mode
+from graph.nodes.shipment_extractor import process_shipment
+
+PREVIOUS = Shipment(
+    items=[
+        ShipmentItem(load_carrier=1, name="Maschinenteile", quantity=3, length=120, width=80, weight=250),
+        ShipmentItem(load_carrier=2, name="Ersatzteile", quantity=2, weight=5)
+    ],
+    shipment_notes="Abholung Montag",
+    message="ok"
+).model_dump()
+
+
+def test_update_changes_only_the_given_fields():
+    """Test that an update merges the changed fields into the existing item."""
+    change = ItemChange(operation=ItemOperation.UPDATE, index=0, item=ShipmentItem(quantity=4))
+
+    shipment = apply_shipment_patch(PREVIOUS, ShipmentPatch(item_changes=[change], message="4 Paletten"))
+
+    assert shipment.items[0].quantity == 4
+    assert shipment.items[0].weight == 250
+    assert shipment.items[1].name == "Ersatzteile"
+    assert shipment.shipment_notes == "Abholung Montag"
+    assert shipment.message == "4 Paletten"
+
+
+def test_remove_and_add_refer_to_previous_indices():
+    """Test that removals use the original indices and new items are appended."""
+    patch_ = ShipmentPatch(item_changes=[
+        ItemChange(operation=ItemOperation.ADD, item=ShipmentItem(name="Kiste", quantity=1)),
+        ItemChange(operation=ItemOperation.REMOVE, index=0),
+        ItemChange(operation=ItemOperation.UPDATE, index=1, item=ShipmentItem(weight=6))
+    ])
+
+    shipment = apply_shipment_patch(PREVIOUS, patch_)
+
+    assert [(item.name, item.weight) for item in shipment.items] == [("Ersatzteile", 6), ("Kiste", None)]
+
+
+def test_invalid_index_is_rejected():
+    """Test that a patch referring to an unknown item raises ValueError."""
+    change = ItemChange(operation=ItemOperation.REMOVE, index=5)
+
+    with pytest.raises(ValueError):
+        apply_shipment_patch(PREVIOUS, ShipmentPatch(item_changes=[change]))
+
+
+def test_patch_input_numbers_the_previous_items():
+    """Test that the LLM sees the previous items with their indices."""
+    text = build_patch_input(PREVIOUS, "doch 4 Paletten")
+
+    assert '0: {"load_carrier":1,"name":"Maschinenteile"' in text
+    assert '1: {"load_carrier":2,"name":"Ersatzteile"' in text
+    assert text.endswith("doch 4 Paletten")
+
+
+def test_only_follow_ups_use_patch_mode():
+    """Test that patch mode needs a follow-up with a previous extraction."""
+    assert uses_patch_mode({"follow_up": True, "last_shipment": PREVIOUS})
+    assert not uses_patch_mode({"follow_up": False, "last_shipment": PREVIOUS})
+    assert not uses_patch_mode({"follow_up": True, "last_shipment": None})
+
+
+class PatchChain:
+    def __init__(self, patch_):
+        self.patch = patch_
+        self.inputs = []
+
+    def invoke(self, data):
+        self.inputs.append(data["input"])
+        return self.patch
+
+
+def run_follow_up(patch_chain, full_result):
+    state = {"messages": ["doch 4 Paletten"], "follow_up": True, "last_shipment": PREVIOUS}
+    full_chain = PatchChain(full_result)
+
+    def get_chain(prompt_template, tier=None, output="shipment"):
+        return patch_chain if output == "patch" else full_chain
+
+    with patch('graph.nodes.shipment_extractor.load_prompt', return_value="prompt"), \
+         patch('graph.nodes.shipment_extractor.get_request_chain', side_effect=get_chain):
+        return process_shipment(state), full_chain
+
+
+def test_follow_up_is_applied_as_patch():
+    """Test that a follow-up only asks for the changes and applies them locally."""
+    chain = PatchChain(ShipmentPatch(item_changes=[
+        ItemChange(operation=ItemOperation.UPDATE, index=0, item=ShipmentItem(quantity=4))
+    ]))
+
+    result, full_chain = run_follow_up(chain, None)
+
+    assert result["extracted_data"]["items"][0]["quantity"] == 4
+    assert len(result["extracted_data"]["items"]) == 2
+    assert full_chain.inputs == []
+
+
+def test_invalid_patch_falls_back_to_full_extraction():
+    """Test that an invalid patch is replaced by a full follow-up extraction."""
+    chain = PatchChain(ShipmentPatch(item_changes=[ItemChange(operation=ItemOperation.REMOVE, index=9)]))
+    full = Shipment(items=[ShipmentItem(name="Maschinenteile", quantity=4)], message="ok")
+
+    result, full_chain = run_follow_up(chain, full)
+
+    assert result["extracted_data"]["items"] == [full.items[0].model_dump()]
+    assert full_chain.inputs[0].startswith("Previous extraction (JSON)")
+
+
+def test_explicit_null_clears_a_field():
+    """Test that a field returned as null is cleared, while omitted fields are kept."""
+    patch_ = ShipmentPatch.model_validate({"item_changes": [
+        {"operation": "update", "index": 0, "item": {"weight": None, "quantity": 4}}
+    ]})
+
+    shipment = apply_shipment_patch(PREVIOUS, patch_)
+
+    assert shipment.items[0].weight is None
+    assert shipment.items[0].quantity == 4
+    assert shipment.items[0].length == 120
+
+
+def test_new_inquiry_falls_back_to_full_extraction():
+    """Test that an unrelated short inquiry is not merged into the previous shipment."""
+    chain = PatchChain(ShipmentPatch(new_inquiry=True))
+    full = Shipment(items=[ShipmentItem(name="Kiste", quantity=1)], message="ok")
+
+    result, full_chain = run_follow_up(chain, full)
+
+    assert result["extracted_data"]["items"] == [full.items[0].model_dump()]
+    assert "unrelated shipment" in full_chain.inputs[0]
+    with pytest.raises(ValueError):
+        apply_shipment_patch(PREVIOUS, ShipmentPatch(new_inquiry=True))
+
+
+def test_patch_error_falls_back_to_full_extraction():
+    """Test that a failing patch call is retried as a full follow-up extraction."""
+    class FailingChain(PatchChain):
+        def invoke(self, data):
+            raise ValueError("invalid tool call")
+
+    full = Shipment(items=[ShipmentItem(name="Maschinenteile", quantity=4)], message="ok")
+
+    result, full_chain = run_follow_up(FailingChain(None), full)
+
+    assert result["extracted_data"]["items"][0]["quantity"] == 4
+    assert len(full_chain.inputs) == 1
@@ -0,0 +1,117 @@
+"""
+Unit tests for the shipment splitter.
+
+These tests verify segment detection, the fan-out via Send and the
+deterministic merge of the segment results.
+"""
+import asyncio
+from unittest.mock import patch
+
+from graph.nodes.shipment_splitter import (
+    split_segments,
+    split_shipment,
+    route_segments,
+    merge_segments,
+    reduce_segment_results
+)
+from graph.shipment_graph import build_shipment_graph
+from graph.models.shipment_models import Shipment, ShipmentItem
+
+
+def test_repeated_labels_are_split_in_order():
+    """Test that repeated block labels produce one segment per block."""
+    text = "Box 1 - 15 kg 60x40x40 cm\nBox 2 - 17 kg 60x40x50 cm\nBox 3 - 4 kg 30x30x30 cm"
+
+    assert split_segments(text) == [
+        "Box 1 - 15 kg 60x40x40 cm",
+        "Box 2 - 17 kg 60x40x50 cm",
+        "Box 3 - 4 kg 30x30x30 cm"
+    ]
+
+
+def test_bullet_lines_with_numbers_are_split():
+    """Test that bullet lists are split when every line carries numbers."""
+    text = "Bonjour,\n* 1 Godet 0.90m x 2.20m, 500kg\n* 1 Rallonge 1.10m x 3.20m, 1.5 t\nMerci"
+
+    assert split_segments(text) == ["1 Godet 0.90m x 2.20m, 500kg", "1 Rallonge 1.10m x 3.20m, 1.5 t"]
+
+
+def test_numbers_outside_the_blocks_prevent_splitting():
+    """Test that a preamble with numbers keeps the inquiry in one piece."""
+    text = "Gesamt 3 Paletten, 900 kg\nPos. 1: 120x80x100\nPos. 2: 120x80x120"
+
+    assert split_segments(text) == [text]
+
+
+def test_single_segment_routes_to_model_router():
+    """Test that an unsplit inquiry goes to the regular extraction path."""
+    update = split_shipment({"messages": ["3 Europaletten, 450 kg"]})
+
+    assert update["segments"] == []
+    assert route_segments(update) == "model_router"
+
+
+def test_segments_fan_out_with_index():
+    """Test that every segment gets its own Send with its position."""
+    sends = route_segments({"segments": ["a 1", "b 2"]})
+
+    assert [send.node for send in sends] == ["segment_extractor", "segment_extractor"]
+    assert [send.arg["segment_index"] for send in sends] == [0, 1]
+
+
+def test_reducer_resets_on_none():
+    """Test that None clears results of a previous turn."""
+    assert reduce_segment_results([{"index": 0}], None) == []
+    assert reduce_segment_results([{"index": 0}], [{"index": 1}]) == [{"index": 0}, {"index": 1}]
+
+
+def test_merge_orders_items_by_segment_index():
+    """Test that the merge is independent of the completion order."""
+    results = [
+        {"index": 1, "extracted_data": {"items": [{"name": "second"}], "shipment_notes": None}, "message": "ok"},
+        {"index": 0, "extracted_data": {"items": [{"name": "first"}], "shipment_notes": "fragile"}, "message": "ok"}
+    ]
+
+    merged = merge_segments({"segment_results": results})
+
+    assert [item["name"] for item in merged["extracted_data"]["items"]] == ["first", "second"]
+    assert merged["extracted_data"]["shipment_notes"] == "fragile"
+
+
+def test_merge_keeps_partial_results_and_reports_failed_segment():
+    """Test that one failed segment does not discard the others."""
+    results = [
+        {"index": 0, "extracted_data": None, "message": "Timeout"},
+        {"index": 1, "extracted_data": {"items": [{"name": "ok"}]}, "message": None}
+    ]
+
+    merged = merge_segments({"segment_results": results})
+
+    assert len(merged["extracted_data"]["items"]) == 1
+    assert "Segment 1: Timeout" in merged["message"]
+    assert merged["partial"] is True
+    assert merged["failed_segments"] == [0]
+    assert "partial" not in merge_segments({"segment_results": results[1:]})
+
+
+def test_graph_extracts_segments_concurrently():
+    """Test that the segments of one inquiry are extracted in parallel branches."""
+    class SlowChain:
+        async def ainvoke(self, data):
+            await asyncio.sleep(0.2)
+            return Shipment(items=[ShipmentItem(name=data["input"][:5])], message="ok")
+
+    text = "Box 1 - Kiste A\nBox 2 - Kiste B\nBox 3 - Kiste C"
+    with patch('graph.nodes.shipment_extractor.load_prompt', return_value="prompt"), \
+         patch('graph.nodes.shipment_extractor.get_request_chain', return_value=SlowChain()):
+        graph = build_shipment_graph()
+        loop = asyncio.new_event_loop()
+        try:
+            started = loop.time()
+            result = loop.run_until_complete(graph.ainvoke({"messages": [text]}))
+            elapsed = loop.time() - started
+        finally:
+            loop.close()
+
+    assert [item["name"] for item in result["extracted_data"]["items"]] == ["Box 1", "Box 2", "Box 3"]
+    assert elapsed < 0.5
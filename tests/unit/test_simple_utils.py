@@ -3,13 +3,16 @@ Unit tests for the Shipment Extractor.
 
 These tests verify the basic functionality of the shipment_extractor module.
 """
+import asyncio
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 
 from graph.nodes.shipment_extractor import (
     process_shipment, 
+    aprocess_shipment,
     create_error_response,
     extract_shipment_data,
+    aextract_shipment_data,
     invoke_chain_with_retry
 )
 from graph.models.shipment_models import Shipment, ShipmentItem, LoadCarrierType
@@ -117,4 +120,37 @@ def test_extract_shipment_data_with_timeout():
         
         # Verifications
         assert result["extracted_data"] is None
-        assert "timeout" in result["message"].lower() 
\ No newline at end of file
+        assert "timeout" in result["message"].lower() 
+
+def test_aprocess_shipment_prompt_not_found():
+    """Test that the async node returns an error when the prompt is not found."""
+    with patch('graph.nodes.shipment_extractor.load_prompt', return_value=None):
+        result = asyncio.run(aprocess_shipment({"messages": ["Test message"]}))
+        
+        assert result["extracted_data"] is None
+        assert result["message"] == ERROR_MESSAGES["prompt_not_found"]
+
+
+def test_aextract_shipment_data_uses_ainvoke():
+    """Test that the async extraction awaits the chain instead of calling invoke."""
+    chain_mock = MagicMock()
+    chain_mock.ainvoke = AsyncMock(return_value=Shipment(message="Async extraction"))
+    
+    result = asyncio.run(aextract_shipment_data(chain_mock, "Test-Input"))
+    
+    chain_mock.ainvoke.assert_awaited_once_with({"input": "Test-Input"})
+    chain_mock.invoke.assert_not_called()
+    assert result["extracted_data"]["items"] == []
+    assert result["message"] == "Async extraction"
+
+
+def test_aextract_shipment_data_with_timeout():
+    """Test that the async extraction maps a timeout to an error response."""
+    chain_mock = MagicMock()
+    
+    with patch('graph.nodes.shipment_extractor.ainvoke_chain_with_retry',
+               AsyncMock(side_effect=TimeoutError("Test-Timeout"))):
+        result = asyncio.run(aextract_shipment_data(chain_mock, "Test-Input"))
+        
+        assert result["extracted_data"] is None
+        assert "timeout" in result["message"].lower()